@@ -6,6 +6,8 @@ import os
 from pathlib import Path
 from typing import Generator
 
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
 from sqlmodel import Session, SQLModel, create_engine
 
 from app.files.model import File  # noqa: F401
@@ -29,8 +31,86 @@ engine = create_engine(
 
 
 def init_db() -> None:
-  """Create database tables if they do not exist."""
+  """Create database tables if they do not exist, and add missing columns."""
   SQLModel.metadata.create_all(engine)
+  rebuild_changed_primary_keys(engine)
+  add_missing_columns(engine)
+
+
+def rebuild_changed_primary_keys(bind: Engine) -> list[str]:
+  """
+  Recreate tables whose primary key changed, copying their rows across.
+
+  SQLite cannot alter a primary key in place: the old table is renamed, the
+  new one created, and the shared columns copied. New key columns the old
+  rows have no value for get the empty string (they are string columns with
+  that default).
+
+  Returns:
+    The rebuilt table names.
+  """
+  inspector = inspect(bind)
+  rebuilt: list[str] = []
+  for table in SQLModel.metadata.sorted_tables:
+    if not inspector.has_table(table.name):
+      continue
+    current = inspector.get_pk_constraint(table.name).get("constrained_columns") or []
+    wanted = [column.name for column in table.primary_key.columns]
+    if sorted(current) == sorted(wanted):
+      continue
+
+    existing = {column["name"] for column in inspector.get_columns(table.name)}
+    shared = [column.name for column in table.columns if column.name in existing]
+    values = [
+      f'COALESCE("{name}", \'\')' if name in wanted and name not in current else f'"{name}"'
+      for name in shared
+    ]
+    legacy = f"_legacy_{table.name}"
+    with bind.begin() as conn:
+      for index in inspector.get_indexes(table.name):
+        conn.execute(text(f'DROP INDEX IF EXISTS "{index["name"]}"'))
+      conn.execute(text(f'ALTER TABLE "{table.name}" RENAME TO "{legacy}"'))
+      table.create(conn)
+      columns = ", ".join(f'"{name}"' for name in shared)
+      conn.execute(
+        text(
+          f'INSERT OR REPLACE INTO "{table.name}" ({columns}) '
+          f'SELECT {", ".join(values)} FROM "{legacy}"'
+        )
+      )
+      conn.execute(text(f'DROP TABLE "{legacy}"'))
+    rebuilt.append(table.name)
+  return rebuilt
+
+
+def add_missing_columns(bind: Engine) -> list[str]:
+  """
+  Add model columns an existing table does not have yet, with their indexes.
+
+  `create_all` never alters existing tables, so databases created before a
+  column was introduced would fail on the first query. Added columns are
+  nullable (every column added after a table's creation is optional), and
+  running this again is a no-op.
+
+  Returns:
+    The added columns, as "table.column".
+  """
+  inspector = inspect(bind)
+  added: list[str] = []
+  with bind.begin() as conn:
+    for table in SQLModel.metadata.sorted_tables:
+      if not inspector.has_table(table.name):
+        continue
+      existing = {column["name"] for column in inspector.get_columns(table.name)}
+      missing = [column for column in table.columns if column.name not in existing]
+      for column in missing:
+        column_type = column.type.compile(dialect=bind.dialect)
+        conn.execute(text(f'ALTER TABLE "{table.name}" ADD COLUMN "{column.name}" {column_type}'))
+        added.append(f"{table.name}.{column.name}")
+      if missing:
+        for index in table.indexes:
+          index.create(conn, checkfirst=True)
+  return added
 
 
 def get_session() -> Generator[Session, None, None]:
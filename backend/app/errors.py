@@ -35,6 +35,13 @@ class ConflictError(AppError):
   default_detail = "Conflict"
 
 
+class PayloadTooLargeError(AppError):
+  """Request body exceeds a configured size limit."""
+
+  status_code = 413
+  default_detail = "Payload too large"
+
+
 class StorageError(AppError):
   """Filesystem persistence error."""
 
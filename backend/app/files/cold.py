@@ -0,0 +1,141 @@
+"""Cold storage tier: background compression of idle files."""
+
+from __future__ import annotations
+
+import os
+from datetime import timedelta
+from pathlib import Path
+
+from sqlmodel import Session
+
+from app.files.model import File, _utcnow
+from app.files.repository import FileRepository
+from app.files.schemas import ColdTierReport, FileUpdate
+from app.files.service import blob_readers, tier_lock
+from app.files.storage import FileStorage
+from app.utils.compression import (
+  FLAC,
+  IDENTITY,
+  ZSTD,
+  codec_available,
+  encode_file,
+  iter_decoded,
+  wav_layout,
+)
+from app.utils.files import safe_unlink
+from app.utils.hashing import hash_chunks
+
+COLD_AFTER = timedelta(days=int(os.getenv("NOXTOOLS_COLD_AFTER_DAYS", "21")))
+COLD_MIN_BYTES = 1024 * 1024
+# A compressed blob is kept only if it saves at least this share of the bytes.
+COLD_MIN_SAVING = 0.1
+COLD_BATCH_SIZE = 50
+PRECOMPRESSED_FORMATS = {
+  "aac",
+  "flac",
+  "gif",
+  "gz",
+  "jpeg",
+  "jpg",
+  "m4a",
+  "mkv",
+  "mov",
+  "mp3",
+  "mp4",
+  "ogg",
+  "opus",
+  "png",
+  "webm",
+  "webp",
+  "zip",
+  "zst",
+}
+
+
+class ColdStorageService:
+  """
+  Compresses files nobody has downloaded for COLD_AFTER: PCM WAV to FLAC,
+  anything else to zstd, skipping formats that are already compressed.
+
+  `File.checksum` and `File.size` keep describing the original bytes; each
+  compressed blob is decoded and checked against the checksum before the
+  plain copy is dropped, once downloads already reading it are done. Files
+  that do not shrink enough are marked "identity" so they are not retried.
+  Downloads stream cold files through the decoder, and tools that need a
+  real path thaw them back (`FileService.resolve_path`).
+  """
+
+  def __init__(
+    self,
+    session: Session,
+    *,
+    storage: FileStorage | None = None,
+    idle_after: timedelta = COLD_AFTER,
+  ) -> None:
+    self.repo = FileRepository(session)
+    self.storage = storage or FileStorage()
+    self.idle_after = idle_after
+
+  def freeze_idle(self, *, limit: int = COLD_BATCH_SIZE) -> ColdTierReport:
+    """Compress up to `limit` of the idlest eligible files."""
+    report = ColdTierReport()
+    candidates = self.repo.list_cold_candidates(
+      idle_before=_utcnow() - self.idle_after,
+      min_size=COLD_MIN_BYTES,
+      limit=limit,
+    )
+    for file in candidates:
+      try:
+        self.freeze(file, report)
+      except Exception:
+        report.errors += 1
+    return report
+
+  def freeze(self, file: File, report: ColdTierReport) -> None:
+    """Move one file to the cold tier, or mark it as not worth compressing."""
+    if _format_of(file) in PRECOMPRESSED_FORMATS:
+      self._keep_raw(file, report)
+      return
+
+    source = self.storage.resolve_path(file.path)
+    layout = wav_layout(source)
+    codecs = [codec for codec in ((FLAC, ZSTD) if layout else (ZSTD,)) if codec_available(codec)]
+    for codec in codecs:
+      staged = self.storage.staging_path(".cold")
+      try:
+        encode_file(source, staged, codec, layout=layout)
+        stored_size = staged.stat().st_size
+        if stored_size > file.size * (1 - COLD_MIN_SAVING):
+          safe_unlink(staged)
+          continue
+        if hash_chunks(iter_decoded(staged, codec)) != (file.checksum, file.size):
+          safe_unlink(staged)
+          continue
+      except (OSError, ValueError):
+        safe_unlink(staged)
+        continue
+
+      with tier_lock(file.checksum):
+        self.repo.session.refresh(file)
+        if file.storage_codec is not None:
+          safe_unlink(staged)
+          return
+        cold_path = self.storage.blob_path(file.path, codec)
+        blob_readers.reclaim(file.checksum, cold_path)
+        os.replace(staged, cold_path)
+        self.repo.update(file.id, FileUpdate(storage_codec=codec, stored_size=stored_size))
+        blob_readers.retire(file.checksum, source)
+      report.compressed += 1
+      report.saved_bytes += file.size - stored_size
+      return
+
+    if codecs:
+      self._keep_raw(file, report)
+
+  def _keep_raw(self, file: File, report: ColdTierReport) -> None:
+    self.repo.update(file.id, FileUpdate(storage_codec=IDENTITY))
+    report.kept_raw += 1
+
+
+def _format_of(file: File) -> str:
+  return (file.format or Path(file.name).suffix.lstrip(".")).lower()
@@ -0,0 +1,198 @@
+"""Storage reconciliation: orphan garbage collection and missing-blob checks."""
+
+from __future__ import annotations
+
+import os
+import threading
+from datetime import timedelta
+from itertools import islice
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, TypeVar
+
+from sqlmodel import Session
+
+from app.files.cold import ColdStorageService
+from app.files.model import _utcnow
+from app.files.repository import FileRepository, UploadSessionRepository
+from app.files.schemas import ColdTierReport, StorageReconcileReport
+from app.files.storage import DERIVED_DIRNAME, INCOMING_DIRNAME, FileStorage
+from app.utils.compression import CODEC_SUFFIXES, COLD_CODECS
+
+GC_BATCH_SIZE = 500
+# Blobs changed more recently than this are left alone: they may belong to an
+# ingest that has renamed its file into place but not inserted the row yet.
+GC_GRACE_PERIOD = timedelta(seconds=int(os.getenv("NOXTOOLS_STORAGE_GC_GRACE_SECONDS", "3600")))
+GC_INTERVAL_SECONDS = float(os.getenv("NOXTOOLS_STORAGE_GC_INTERVAL_SECONDS", str(6 * 3600)))
+MAX_REPORTED_MISSING = 100
+
+T = TypeVar("T")
+
+
+class StorageReconciler:
+  """
+  Reconciles the storage tree against the `files` table.
+
+  Both directions are walked in bounded batches, each one a short query, so
+  the table is never locked for a whole sweep:
+  - blobs no row references (and stale staging or derived data) are removed,
+    including a plain or cold copy left behind by an interrupted tier move;
+  - rows whose blob is gone are flagged with `missing_at`, and unflagged if
+    the blob comes back.
+  Anything modified within GC_GRACE_PERIOD is skipped.
+  """
+
+  def __init__(
+    self,
+    session: Session,
+    *,
+    storage: FileStorage | None = None,
+    grace: timedelta = GC_GRACE_PERIOD,
+  ) -> None:
+    self.files = FileRepository(session)
+    self.uploads = UploadSessionRepository(session)
+    self.storage = storage or FileStorage()
+    self.grace = grace
+
+  def reconcile(self) -> StorageReconcileReport:
+    """Run one full sweep and report what was reclaimed or flagged."""
+    report = StorageReconcileReport()
+    cutoff = (_utcnow() - self.grace).timestamp()
+    self._sweep_blobs(report, cutoff)
+    self._sweep_incoming(report, cutoff)
+    self._sweep_derived(report, cutoff)
+    self._check_rows(report)
+    return report
+
+  def _sweep_blobs(self, report: StorageReconcileReport, cutoff: float) -> None:
+    for batch in _batched(self.storage.iter_blobs(), GC_BATCH_SIZE):
+      report.scanned_blobs += len(batch)
+      relative = {path: self._relative(path) for path in batch}
+      cold = {path: _split_codec(key) for path, key in relative.items()}
+      codecs = self.files.codecs_for_paths(
+        [*relative.values(), *(key for key, codec in cold.values() if codec)]
+      )
+      for path, key in relative.items():
+        base, codec = cold[path]
+        if key in codecs and _current_tier(codecs[key]) is None:
+          continue
+        if codec and base in codecs and _current_tier(codecs[base]) == codec:
+          continue
+        if _settled(path, cutoff):
+          self._remove(path, report, "orphans_removed")
+
+  def _sweep_incoming(self, report: StorageReconcileReport, cutoff: float) -> None:
+    for batch in _batched(self.storage.iter_internal(INCOMING_DIRNAME), GC_BATCH_SIZE):
+      uploads = {path.stem: path for path in batch if path.suffix == ".upload"}
+      active = self.uploads.existing_ids(uploads)
+      for path in batch:
+        if path.suffix == ".upload" and path.stem in active:
+          continue
+        if _settled(path, cutoff):
+          self._remove(path, report, "staging_removed")
+
+  def _sweep_derived(self, report: StorageReconcileReport, cutoff: float) -> None:
+    for batch in _batched(self.storage.iter_internal(DERIVED_DIRNAME), GC_BATCH_SIZE):
+      referenced = self.files.existing_checksums(path.name for path in batch)
+      for path in batch:
+        if path.name not in referenced and _settled(path, cutoff):
+          self._remove(path, report, "derived_removed")
+
+  def _check_rows(self, report: StorageReconcileReport) -> None:
+    last_id: Optional[str] = None
+    while True:
+      rows = self.files.list_after(last_id, limit=GC_BATCH_SIZE)
+      if not rows:
+        return
+      last_id = rows[-1].id
+      report.scanned_rows += len(rows)
+
+      missing = [
+        row for row in rows if not self.storage.blob_path(row.path, row.storage_codec).is_file()
+      ]
+      missing_ids = {row.id for row in missing}
+      restored = [row.id for row in rows if row.missing_at and row.id not in missing_ids]
+      report.missing_files += len(missing)
+      room = MAX_REPORTED_MISSING - len(report.missing_file_ids)
+      report.missing_file_ids.extend(row.id for row in missing[:room])
+      try:
+        self.files.set_missing(missing_ids, _utcnow())
+        self.files.set_missing(restored, None)
+      except Exception:
+        report.errors += 1
+
+  def _remove(self, path: Path, report: StorageReconcileReport, counter: str) -> None:
+    reclaimed = self.storage.remove_blob(path)
+    if not reclaimed and path.exists():
+      report.errors += 1
+      return
+    setattr(report, counter, getattr(report, counter) + 1)
+    report.reclaimed_bytes += reclaimed
+
+  def _relative(self, path: Path) -> str:
+    return path.relative_to(self.storage.root).as_posix()
+
+
+class StorageGarbageCollector:
+  """
+  Background thread running storage maintenance at start-up and then every
+  `interval` seconds, each pass with its own short-lived session: a
+  StorageReconciler sweep, then a cold-tier compression batch.
+  """
+
+  def __init__(self, engine, *, interval: float = GC_INTERVAL_SECONDS) -> None:
+    self.engine = engine
+    self.interval = interval
+    self.last_report: StorageReconcileReport | None = None
+    self.last_cold_report: ColdTierReport | None = None
+    self._stop_event = threading.Event()
+    self._thread: Optional[threading.Thread] = None
+
+  def start(self) -> None:
+    if self.interval <= 0 or (self._thread and self._thread.is_alive()):
+      return
+    self._stop_event.clear()
+    self._thread = threading.Thread(target=self._run_loop, name="storage-gc", daemon=True)
+    self._thread.start()
+
+  def stop(self) -> None:
+    self._stop_event.set()
+
+  def _run_loop(self) -> None:
+    while not self._stop_event.is_set():
+      try:
+        with Session(self.engine) as session:
+          self.last_report = StorageReconciler(session).reconcile()
+          self.last_cold_report = ColdStorageService(session).freeze_idle()
+      except Exception:
+        pass
+      self._stop_event.wait(self.interval)
+
+
+def _split_codec(relative: str) -> tuple[str, str | None]:
+  """
+  Split a blob path into the plain path it may be a cold copy of and that
+  codec; legacy names can end in a codec suffix too, so both are looked up.
+  """
+  for codec, suffix in CODEC_SUFFIXES.items():
+    if relative.endswith(suffix):
+      return relative[: -len(suffix)], codec
+  return relative, None
+
+
+def _current_tier(storage_codec: str | None) -> str | None:
+  return storage_codec if storage_codec in COLD_CODECS else None
+
+
+def _settled(path: Path, cutoff: float) -> bool:
+  """Whether a file was last written or renamed before `cutoff`."""
+  try:
+    stat = path.stat()
+  except OSError:
+    return False
+  return max(stat.st_mtime, stat.st_ctime) < cutoff
+
+
+def _batched(items: Iterable[T], size: int) -> Iterator[list[T]]:
+  iterator = iter(items)
+  while batch := list(islice(iterator, size)):
+    yield batch
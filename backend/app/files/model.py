@@ -5,7 +5,7 @@ from __future__ import annotations
 from datetime import datetime, timezone
 from uuid import uuid4
 
-from sqlalchemy import Column, JSON
+from sqlalchemy import Column, Index, JSON
 from sqlmodel import Field, SQLModel
 
 
@@ -14,6 +14,11 @@ def _utcnow() -> datetime:
   return datetime.now(timezone.utc)
 
 
+def _as_utc(value: datetime) -> datetime:
+  """Attach UTC to naive timestamps read back from SQLite."""
+  return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
 class FileVariant(SQLModel):
   """Optional variant metadata for a File."""
 
@@ -56,6 +61,23 @@ class File(SQLModel, table=True):
     default_factory=_utcnow,
     description="When the file was created (UTC).",
   )
+  accessed_at: datetime | None = Field(
+    default=None,
+    index=True,
+    description="When the file was last downloaded (UTC), at coarse granularity.",
+  )
+  missing_at: datetime | None = Field(
+    default=None,
+    description="When storage reconciliation found the blob missing (UTC).",
+  )
+  storage_codec: str | None = Field(
+    default=None,
+    description='Cold-tier codec of the stored blob ("zstd", "flac"), or "identity" if kept raw.',
+  )
+  stored_size: int | None = Field(
+    default=None,
+    description="Bytes on disk when the blob is compressed (size stays the original).",
+  )
   format: str | None = Field(default=None, description="Optional container/format.")
   quality: str | int | None = Field(
     default=None,
@@ -67,5 +89,77 @@ class File(SQLModel, table=True):
     sa_column=Column(JSON),
     description="Optional variants metadata.",
   )
+  media: dict | None = Field(
+    default=None,
+    sa_column=Column(JSON),
+    description="Cached media inspection (ffprobe) result for this checksum.",
+  )
+
+  model_config = {"from_attributes": True}
+
+
+class AudioAnalysis(SQLModel, table=True):
+  """
+  Indexed audio analysis (BPM, key, duration) keyed by content checksum and
+  analyzer engine.
+
+  Rows outlive File records so re-uploading the same audio finds its analysis,
+  and each engine keeps its own row so switching engines does not evict the
+  other's cached result.
+  """
+
+  __tablename__ = "audio_analyses"
+  __table_args__ = (Index("ix_audio_analyses_key_bpm", "key", "bpm"),)
+
+  checksum: str = Field(primary_key=True, description="SHA-256 of the analyzed file.")
+  engine: str = Field(
+    default="",
+    primary_key=True,
+    description="Analyzer engine that produced the row (empty if unknown).",
+  )
+  bpm: float | None = Field(default=None, index=True, description="Tempo in beats per minute.")
+  key: str | None = Field(default=None, index=True, description='Musical key, e.g. "A Minor".')
+  duration: float | None = Field(default=None, index=True, description="Duration in seconds.")
+  version: int | None = Field(default=None, description="Engine result version of the row.")
+  analyzed_at: datetime = Field(
+    default_factory=_utcnow,
+    description="When the analysis was stored (UTC).",
+  )
+
+  model_config = {"from_attributes": True}
+
+
+class UploadSession(SQLModel, table=True):
+  """
+  Resumable chunked upload in progress.
+
+  Chunks are written in place into one staging file; `ranges` holds the
+  merged [start, end) byte ranges received so far.
+  """
+
+  __tablename__ = "upload_sessions"
+
+  id: str = Field(
+    default_factory=lambda: str(uuid4()),
+    primary_key=True,
+    description="Public upload session identifier.",
+  )
+  name: str = Field(description="Original file name.")
+  type: str = Field(description="Logical file type of the upload.")
+  size: int = Field(description="Total size in bytes announced by the client.")
+  received: int = Field(default=0, description="Bytes received so far.")
+  ranges: list[list[int]] = Field(
+    default_factory=list,
+    sa_column=Column(JSON),
+    description="Merged [start, end) byte ranges received.",
+  )
+  created_at: datetime = Field(
+    default_factory=_utcnow,
+    description="When the session was created (UTC).",
+  )
+  expires_at: datetime = Field(
+    index=True,
+    description="When the session is garbage-collected unless more chunks arrive (UTC).",
+  )
 
   model_config = {"from_attributes": True}
@@ -2,13 +2,14 @@
 
 from __future__ import annotations
 
-from typing import Optional
+from datetime import datetime
+from typing import Iterable, Optional
 
-from sqlalchemy import and_, func, or_
+from sqlalchemy import and_, func, or_, update
 from sqlmodel import Session, select
 
-from app.files.model import File
-from app.files.schemas import FileCreate, FileUpdate
+from app.files.model import AudioAnalysis, File, UploadSession, _utcnow
+from app.files.schemas import AnalysisFilter, FileCreate, FileUpdate
 
 
 class FileRepository:
@@ -81,6 +82,7 @@ class FileRepository:
     *,
     file_type: Optional[str] = None,
     query: Optional[str] = None,
+    analysis: Optional[AnalysisFilter] = None,
     offset: int = 0,
     limit: int = 50,
   ) -> list[File]:
@@ -90,41 +92,42 @@ class FileRepository:
     Args:
       file_type: Optional file type filter.
       query: Optional case-insensitive name search.
+      analysis: Optional BPM/key/duration constraints (indexed join).
       offset: Rows to skip.
       limit: Maximum rows to return.
 
     Returns:
       A list of File entities.
     """
-    stmt = select(File)
-    if file_type:
-      stmt = stmt.where(File.type == file_type)
-    if query:
-      filters = _build_query_filters(query)
-      if filters is not None:
-        stmt = stmt.where(filters)
+    stmt = _apply_filters(select(File), file_type=file_type, query=query, analysis=analysis)
     stmt = stmt.order_by(File.created_at.desc()).offset(offset).limit(limit)
     results = self.session.exec(stmt).all()
     return list(results)
 
-  def count(self, *, file_type: Optional[str] = None, query: Optional[str] = None) -> int:
+  def count(
+    self,
+    *,
+    file_type: Optional[str] = None,
+    query: Optional[str] = None,
+    analysis: Optional[AnalysisFilter] = None,
+  ) -> int:
     """
     Count files matching optional filters.
 
     Args:
       file_type: Optional file type filter.
       query: Optional case-insensitive name search.
+      analysis: Optional BPM/key/duration constraints.
 
     Returns:
       The number of matching files.
     """
-    stmt = select(func.count()).select_from(File)
-    if file_type:
-      stmt = stmt.where(File.type == file_type)
-    if query:
-      filters = _build_query_filters(query)
-      if filters is not None:
-        stmt = stmt.where(filters)
+    stmt = _apply_filters(
+      select(func.count()).select_from(File),
+      file_type=file_type,
+      query=query,
+      analysis=analysis,
+    )
     result = self.session.exec(stmt).one()
     return int(result[0] if isinstance(result, tuple) else result)
 
@@ -156,6 +159,127 @@ class FileRepository:
     self.session.refresh(file)
     return file
 
+  def touch(self, file_id: str, *, accessed_at: datetime, stale_before: datetime) -> None:
+    """
+    Set `accessed_at` unless it is already newer than `stale_before`.
+
+    A single conditional UPDATE: no row is loaded, and repeated downloads
+    within the window do not write at all.
+
+    Args:
+      file_id: Identifier of the file.
+      accessed_at: Timestamp to record.
+      stale_before: Only rows last accessed before this (or never) are updated.
+    """
+    stmt = (
+      update(File)
+      .where(File.id == file_id)
+      .where(or_(File.accessed_at.is_(None), File.accessed_at < stale_before))
+      .values(accessed_at=accessed_at)
+      # Loaded rows hold naive SQLite datetimes the in-Python evaluator cannot
+      # compare with `stale_before`; callers refresh if they need the value.
+      .execution_options(synchronize_session=False)
+    )
+    try:
+      self.session.exec(stmt)
+      self.session.commit()
+    except Exception:
+      self.session.rollback()
+      raise
+
+  def codecs_for_paths(self, paths: Iterable[str]) -> dict[str, Optional[str]]:
+    """
+    Return the storage codec of each storage-relative path referenced by a row.
+
+    Args:
+      paths: Candidate relative paths.
+
+    Returns:
+      Mapping of referenced paths (a subset of `paths`) to `storage_codec`.
+    """
+    wanted = list(set(paths))
+    if not wanted:
+      return {}
+    stmt = select(File.path, File.storage_codec).where(File.path.in_(wanted))
+    return dict(self.session.exec(stmt).all())
+
+  def list_cold_candidates(self, *, idle_before: datetime, min_size: int, limit: int) -> list[File]:
+    """
+    Fetch uncompressed files not downloaded since `idle_before`, idlest first.
+
+    Args:
+      idle_before: Files last accessed (or created) after this are skipped.
+      min_size: Smallest file worth compressing, in bytes.
+      limit: Maximum rows to return.
+
+    Returns:
+      Candidate File entities.
+    """
+    last_used = func.coalesce(File.accessed_at, File.created_at)
+    stmt = (
+      select(File)
+      .where(File.storage_codec.is_(None))
+      .where(File.missing_at.is_(None))
+      .where(File.size >= min_size)
+      .where(last_used < idle_before)
+      .order_by(last_used)
+      .limit(limit)
+    )
+    return list(self.session.exec(stmt).all())
+
+  def existing_checksums(self, checksums: Iterable[str]) -> set[str]:
+    """
+    Return which checksums are referenced by a file row.
+
+    Args:
+      checksums: Candidate SHA-256 checksums.
+
+    Returns:
+      The subset of `checksums` present in the table.
+    """
+    wanted = list(set(checksums))
+    if not wanted:
+      return set()
+    stmt = select(File.checksum).where(File.checksum.in_(wanted))
+    return set(self.session.exec(stmt).all())
+
+  def list_after(self, file_id: str | None, *, limit: int) -> list[File]:
+    """
+    Page through all files by id (keyset pagination, no offset scans).
+
+    Args:
+      file_id: Last id of the previous page, or None to start.
+      limit: Maximum rows to return.
+
+    Returns:
+      Files ordered by id.
+    """
+    stmt = select(File).order_by(File.id).limit(limit)
+    if file_id is not None:
+      stmt = stmt.where(File.id > file_id)
+    return list(self.session.exec(stmt).all())
+
+  def set_missing(self, file_ids: Iterable[str], missing_at: datetime | None) -> None:
+    """
+    Flag (or, with None, clear) rows whose blob is missing from storage.
+
+    Args:
+      file_ids: Rows to update.
+      missing_at: Timestamp to record, or None once the blob is back.
+    """
+    wanted = list(file_ids)
+    if not wanted:
+      return
+    stmt = update(File).where(File.id.in_(wanted)).values(missing_at=missing_at)
+    if missing_at is not None:
+      stmt = stmt.where(File.missing_at.is_(None))
+    try:
+      self.session.exec(stmt)
+      self.session.commit()
+    except Exception:
+      self.session.rollback()
+      raise
+
   def delete(self, file_id: str) -> bool:
     """
     Delete a file by id.
@@ -178,9 +302,139 @@ class FileRepository:
     return True
 
 
+class AudioAnalysisRepository:
+  """
+  Encapsulates database operations for checksum-keyed audio analyses.
+  """
+
+  def __init__(self, session: Session) -> None:
+    self.session = session
+
+  def get(self, checksum: str, engine: str) -> Optional[AudioAnalysis]:
+    return self.session.get(AudioAnalysis, (checksum, engine))
+
+  def list_for_checksums(self, checksums: Iterable[str]) -> dict[str, AudioAnalysis]:
+    """Fetch the most recent analysis (of any engine) per checksum."""
+    wanted = list(set(checksums))
+    if not wanted:
+      return {}
+    stmt = (
+      select(AudioAnalysis)
+      .where(AudioAnalysis.checksum.in_(wanted))
+      .order_by(AudioAnalysis.analyzed_at)
+    )
+    return {row.checksum: row for row in self.session.exec(stmt).all()}
+
+  def count(self) -> int:
+    result = self.session.exec(select(func.count()).select_from(AudioAnalysis)).one()
+    return int(result[0] if isinstance(result, tuple) else result)
+
+  def upsert(
+    self,
+    checksum: str,
+    *,
+    bpm: float | None,
+    key: str | None,
+    duration: float | None,
+    engine: str | None,
+    version: int | None = None,
+  ) -> AudioAnalysis:
+    engine = engine or ""
+    row = self.get(checksum, engine) or AudioAnalysis(checksum=checksum, engine=engine)
+    row.bpm = bpm
+    row.key = key
+    row.duration = duration
+    row.version = version
+    row.analyzed_at = _utcnow()
+    self.session.add(row)
+    try:
+      self.session.commit()
+    except Exception:
+      self.session.rollback()
+      raise
+    self.session.refresh(row)
+    return row
+
+
+class UploadSessionRepository:
+  """
+  Encapsulates database operations for resumable upload sessions.
+  """
+
+  def __init__(self, session: Session) -> None:
+    self.session = session
+
+  def get(self, session_id: str) -> Optional[UploadSession]:
+    return self.session.get(UploadSession, session_id)
+
+  def save(self, upload: UploadSession) -> UploadSession:
+    self.session.add(upload)
+    try:
+      self.session.commit()
+    except Exception:
+      self.session.rollback()
+      raise
+    self.session.refresh(upload)
+    return upload
+
+  def delete(self, upload: UploadSession) -> None:
+    self.session.delete(upload)
+    try:
+      self.session.commit()
+    except Exception:
+      self.session.rollback()
+      raise
+
+  def existing_ids(self, session_ids: Iterable[str]) -> set[str]:
+    wanted = list(set(session_ids))
+    if not wanted:
+      return set()
+    stmt = select(UploadSession.id).where(UploadSession.id.in_(wanted))
+    return set(self.session.exec(stmt).all())
+
+  def list_expired(self, *, limit: int = 100) -> list[UploadSession]:
+    stmt = (
+      select(UploadSession)
+      .where(UploadSession.expires_at < _utcnow())
+      .order_by(UploadSession.expires_at)
+      .limit(limit)
+    )
+    return list(self.session.exec(stmt).all())
+
+
 IGNORED_QUERY_TOKENS = {"label", "type"}
 
 
+def _apply_filters(
+  stmt,
+  *,
+  file_type: Optional[str],
+  query: Optional[str],
+  analysis: Optional[AnalysisFilter],
+):
+  if file_type:
+    stmt = stmt.where(File.type == file_type)
+  if query:
+    filters = _build_query_filters(query)
+    if filters is not None:
+      stmt = stmt.where(filters)
+  if analysis and analysis.active:
+    # EXISTS rather than a join: a checksum may have one row per engine.
+    matches = select(AudioAnalysis.checksum).where(AudioAnalysis.checksum == File.checksum)
+    if analysis.bpm_min is not None:
+      matches = matches.where(AudioAnalysis.bpm >= analysis.bpm_min)
+    if analysis.bpm_max is not None:
+      matches = matches.where(AudioAnalysis.bpm <= analysis.bpm_max)
+    if analysis.keys:
+      matches = matches.where(AudioAnalysis.key.in_(analysis.keys))
+    if analysis.duration_min is not None:
+      matches = matches.where(AudioAnalysis.duration >= analysis.duration_min)
+    if analysis.duration_max is not None:
+      matches = matches.where(AudioAnalysis.duration <= analysis.duration_max)
+    stmt = stmt.where(matches.exists())
+  return stmt
+
+
 def _build_query_filters(query: str):
   tokens = [token.strip() for token in (query or "").split() if token.strip()]
   if not tokens:
@@ -2,18 +2,34 @@
 
 from __future__ import annotations
 
+from pathlib import Path
 from typing import Optional
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request
 from fastapi.responses import Response
 from sqlmodel import Session
+from starlette.concurrency import run_in_threadpool
 
 from app.db import get_session
-from app.errors import NotFoundError, ValidationError
-from app.files.schemas import PaginatedFiles
-from app.files.service import FileService
-from app.utils.http import file_response
+from app.errors import NotFoundError, PayloadTooLargeError, ValidationError
+from app.files.cold import ColdStorageService
+from app.files.gc import StorageReconciler
+from app.files.schemas import (
+  ColdTierReport,
+  FileRead,
+  PaginatedFiles,
+  StorageReconcileReport,
+  UploadSessionCreate,
+  UploadSessionRead,
+)
+from app.files.service import MEDIA_FILE_TYPES, FileService, build_analysis_filter
+from app.files.storage import CHUNK_SIZE, MAX_UPLOAD_BYTES
+from app.files.uploads import CHUNK_MAX_BYTES, UploadSessionService
+from app.jobs.retention import StorageRetentionService
+from app.jobs.schemas import EvictionReport, StorageUsageRead
+from app.utils.http import cached_bytes_response, file_response
 from app.utils.images import build_image_variant
+from app.utils.peaks import DEFAULT_PEAK_BUCKETS, PEAK_VERSION, iter_levels
 
 router = APIRouter(prefix="/api/files", tags=["files"], redirect_slashes=False)
 
@@ -23,6 +39,16 @@ def get_file_service(session: Session = Depends(get_session)) -> FileService:
   return FileService(session)
 
 
+def get_upload_service(session: Session = Depends(get_session)) -> UploadSessionService:
+  """Dependency injector for UploadSessionService."""
+  return UploadSessionService(session)
+
+
+def get_retention_service(session: Session = Depends(get_session)) -> StorageRetentionService:
+  """Dependency injector for StorageRetentionService."""
+  return StorageRetentionService(session)
+
+
 @router.get("", response_model=PaginatedFiles)
 def list_files(
   q: Optional[str] = Query(
@@ -34,19 +60,224 @@ def list_files(
     alias="type",
     description="Filter by file type.",
   ),
+  bpm_min: Optional[float] = Query(default=None, ge=0, description="Minimum analyzed BPM."),
+  bpm_max: Optional[float] = Query(default=None, ge=0, description="Maximum analyzed BPM."),
+  key: Optional[str] = Query(default=None, description="Musical key, e.g. 'A minor' or 'Am'."),
+  duration_min: Optional[float] = Query(default=None, ge=0, description="Minimum duration (s)."),
+  duration_max: Optional[float] = Query(default=None, ge=0, description="Maximum duration (s)."),
   limit: int = Query(default=50, ge=1, le=200),
   offset: int = Query(default=0, ge=0),
   file_service: FileService = Depends(get_file_service),
 ) -> PaginatedFiles:
-  """List stored files with optional search and type filters."""
+  """
+  List stored files with optional search, type and audio analysis filters.
+
+  Analysis filters only match files analyzed by Noxtunizer.
+  """
+  analysis = build_analysis_filter(
+    bpm_min=bpm_min,
+    bpm_max=bpm_max,
+    key=key,
+    duration_min=duration_min,
+    duration_max=duration_max,
+  )
   items = file_service.list_files(
     file_type=file_type,
     query=q,
+    analysis=analysis,
     limit=limit,
     offset=offset,
   )
-  total = file_service.count_files(file_type=file_type, query=q)
-  return PaginatedFiles(items=items, total=total, limit=limit, offset=offset)
+  total = file_service.count_files(file_type=file_type, query=q, analysis=analysis)
+  return PaginatedFiles(
+    items=file_service.with_analysis(items),
+    total=total,
+    limit=limit,
+    offset=offset,
+  )
+
+
+@router.get("/storage", response_model=StorageUsageRead)
+def get_storage_usage(
+  retention: StorageRetentionService = Depends(get_retention_service),
+) -> StorageUsageRead:
+  """Report stored bytes per file type and per tool, with configured quotas."""
+  return retention.usage()
+
+
+@router.post("/storage/enforce", response_model=EvictionReport)
+def enforce_storage_quotas(
+  retention: StorageRetentionService = Depends(get_retention_service),
+) -> EvictionReport:
+  """Evict least-recently-downloaded job outputs until all quotas are met."""
+  return retention.enforce()
+
+
+@router.post("/storage/reconcile", response_model=StorageReconcileReport)
+def reconcile_storage(session: Session = Depends(get_session)) -> StorageReconcileReport:
+  """
+  Reconcile the storage tree with the files table now: remove orphaned blobs
+  and stale staging data, and flag rows whose blob is missing.
+  """
+  return StorageReconciler(session).reconcile()
+
+
+@router.post("/storage/compress", response_model=ColdTierReport)
+def compress_idle_files(
+  limit: int = Query(default=50, ge=1, le=1000),
+  session: Session = Depends(get_session),
+) -> ColdTierReport:
+  """Move up to `limit` idle files to the compressed cold tier now."""
+  return ColdStorageService(session).freeze_idle(limit=limit)
+
+
+@router.post("/stream", response_model=FileRead)
+async def stream_upload(
+  request: Request,
+  name: str = Query(..., min_length=1, description="Original file name."),
+  file_type: str = Query(..., alias="type", description="File type: audio, video or image."),
+  file_service: FileService = Depends(get_file_service),
+) -> FileRead:
+  """
+  Store a file sent as the raw request body (not multipart).
+
+  The body is never spooled: chunks are hashed and written to the storage
+  volume as they arrive, with the size limit enforced on the fly. Tools then
+  take the returned id through their `file_ids` field.
+  """
+  if file_type not in MEDIA_FILE_TYPES:
+    raise ValidationError(f"Type must be one of: {', '.join(sorted(MEDIA_FILE_TYPES))}")
+  content_type = request.headers.get("content-type", "").split(";")[0].strip().lower()
+  if content_type not in {"", "application/octet-stream"} and not content_type.startswith(
+    f"{file_type}/"
+  ):
+    raise ValidationError(f"Content type '{content_type}' does not match type '{file_type}'")
+  declared = request.headers.get("content-length", "")
+  if declared.isdigit() and int(declared) > MAX_UPLOAD_BYTES:
+    raise PayloadTooLargeError(f"File exceeds the maximum size ({MAX_UPLOAD_BYTES} bytes)")
+
+  writer = await run_in_threadpool(file_service.storage.open_staging, max_bytes=MAX_UPLOAD_BYTES)
+  buffer = bytearray()
+  try:
+    async for chunk in request.stream():
+      buffer += chunk
+      if len(buffer) >= CHUNK_SIZE:
+        await run_in_threadpool(writer.write, bytes(buffer))
+        buffer.clear()
+    if buffer:
+      await run_in_threadpool(writer.write, bytes(buffer))
+  except BaseException:
+    writer.abort()
+    raise
+  staged = writer.finish()
+
+  if staged.size < 1:
+    file_service.storage.discard_staged(staged)
+    raise ValidationError(f"File '{name}' is empty")
+
+  file = await run_in_threadpool(
+    lambda: file_service.create_from_staged(
+      staged,
+      file_type=file_type,
+      name=name,
+      format=Path(name).suffix.lstrip(".").lower() or None,
+    )
+  )
+  return FileRead.model_validate(file)
+
+
+@router.post("/uploads", response_model=UploadSessionRead)
+def create_upload_session(
+  payload: UploadSessionCreate,
+  upload_service: UploadSessionService = Depends(get_upload_service),
+) -> UploadSessionRead:
+  """Open a resumable upload for a file of known size."""
+  return upload_service.to_read(upload_service.create(payload))
+
+
+@router.get("/uploads/{session_id}", response_model=UploadSessionRead)
+def get_upload_session(
+  session_id: str,
+  upload_service: UploadSessionService = Depends(get_upload_service),
+) -> UploadSessionRead:
+  """Return received byte ranges so a client can resume the missing ones."""
+  return upload_service.to_read(upload_service.get(session_id))
+
+
+@router.put("/uploads/{session_id}", response_model=UploadSessionRead)
+async def put_upload_chunk(
+  session_id: str,
+  request: Request,
+  offset: int = Query(..., ge=0, description="Byte offset of the chunk in the file."),
+  upload_service: UploadSessionService = Depends(get_upload_service),
+) -> UploadSessionRead:
+  """
+  Write one chunk (raw request body) at `offset`.
+
+  Chunks may arrive in any order and in parallel; each is at most
+  `chunk_max_bytes` long.
+  """
+  declared = request.headers.get("content-length", "")
+  if declared.isdigit() and int(declared) > CHUNK_MAX_BYTES:
+    raise PayloadTooLargeError(f"Chunk exceeds the maximum size ({CHUNK_MAX_BYTES} bytes)")
+  data = bytearray()
+  async for chunk in request.stream():
+    data += chunk
+    if len(data) > CHUNK_MAX_BYTES:
+      raise PayloadTooLargeError(f"Chunk exceeds the maximum size ({CHUNK_MAX_BYTES} bytes)")
+  upload = await run_in_threadpool(upload_service.write_chunk, session_id, offset, bytes(data))
+  return upload_service.to_read(upload)
+
+
+@router.post("/uploads/{session_id}/complete", response_model=FileRead)
+def complete_upload_session(
+  session_id: str,
+  upload_service: UploadSessionService = Depends(get_upload_service),
+) -> FileRead:
+  """Store a fully received upload as a File (deduplicated by checksum)."""
+  return FileRead.model_validate(upload_service.complete(session_id))
+
+
+@router.delete("/uploads/{session_id}", status_code=204)
+def abort_upload_session(
+  session_id: str,
+  upload_service: UploadSessionService = Depends(get_upload_service),
+) -> Response:
+  """Cancel an upload and discard the received chunks."""
+  upload_service.abort(session_id)
+  return Response(status_code=204)
+
+
+@router.get("/{file_id}/peaks")
+def get_file_peaks(
+  file_id: str,
+  buckets: int = Query(
+    default=DEFAULT_PEAK_BUCKETS,
+    ge=1,
+    le=1_000_000,
+    description="Maximum number of min/max buckets to return.",
+  ),
+  file_service: FileService = Depends(get_file_service),
+) -> Response:
+  """
+  Return waveform peaks of an audio file as int8 min/max pairs.
+
+  The body is one level of app.utils.peaks: a little-endian header (magic
+  "NXPK", version, bits, sample rate, samples per bucket, bucket count)
+  followed by the interleaved pairs. Peaks never change for a file, so the
+  response carries an ETag for its checksum and level and may be cached
+  for good.
+  """
+  file = file_service.repo.get(file_id)
+  if not file:
+    raise NotFoundError("File not found")
+  content = file_service.read_peaks(file, max_buckets=buckets)
+  _start, _end, bucket_count = next(iter_levels(content))
+  return cached_bytes_response(
+    content,
+    etag=f"{file.checksum}-peaks-v{PEAK_VERSION}-{bucket_count}",
+    media_type="application/octet-stream",
+  )
 
 
 @router.get("/{file_id}/content")
@@ -63,16 +294,29 @@ def download_file_content(
   if not file:
     raise NotFoundError("File not found")
 
-  path = file_service.resolve_path(file)
-  if not path.exists() or not path.is_file():
+  if not file_service.blob_path(file).is_file():
     raise NotFoundError("File not found")
 
   if variant:
     if file.type != "image":
       raise ValidationError("Image variants are only supported for image files")
-    rendered = build_image_variant(path, variant=variant)
+    path = file_service.resolve_path(file)
+    rendered = build_image_variant(path, variant=variant, name=file.name)
     if rendered:
       content, media_type = rendered
       return Response(content=content, media_type=media_type)
 
-  return file_response(path, filename=file.name)
+  lease = file_service.lease_blob(file)
+  if not lease:
+    raise NotFoundError("File not found")
+  file_service.mark_accessed(file)
+  return file_response(
+    lease.path,
+    filename=file.name,
+    codec=lease.codec,
+    size=file.size,
+    checksum=file.checksum,
+    immutable=True,
+    on_close=lease.release,
+    thaw=lease.thaw,
+  )
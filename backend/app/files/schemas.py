@@ -5,12 +5,23 @@ from __future__ import annotations
 from datetime import datetime
 from typing import Optional
 
-from pydantic import BaseModel, ConfigDict
+from pydantic import BaseModel, ConfigDict, Field
 from sqlmodel import SQLModel
 
 from app.files.model import FileVariant
 
 
+class FileAnalysisRead(BaseModel):
+  """Indexed analysis attached to file listings."""
+
+  bpm: float | None = None
+  key: str | None = None
+  duration: float | None = None
+  engine: str | None = None
+
+  model_config = ConfigDict(from_attributes=True, extra="ignore")
+
+
 class FileCreate(SQLModel):
   """Input payload for creating a File."""
 
@@ -23,6 +34,7 @@ class FileCreate(SQLModel):
   format: str | None = None
   quality: str | int | None = None
   variants: list[FileVariant] | None = None
+  media: dict | None = None
 
   model_config = ConfigDict(extra="forbid")
 
@@ -37,9 +49,15 @@ class FileRead(SQLModel):
   size: int
   path: str
   created_at: datetime
+  accessed_at: datetime | None = None
+  missing_at: datetime | None = None
+  storage_codec: str | None = None
+  stored_size: int | None = None
   format: str | None = None
   quality: str | int | None = None
   variants: list[FileVariant] | None = None
+  media: dict | None = None
+  analysis: FileAnalysisRead | None = None
 
   model_config = ConfigDict(from_attributes=True, extra="ignore")
 
@@ -52,10 +70,30 @@ class FileUpdate(SQLModel):
   format: Optional[str] = None
   quality: str | int | None = None
   variants: Optional[list[FileVariant]] = None
+  media: Optional[dict] = None
+  storage_codec: Optional[str] = None
+  stored_size: Optional[int] = None
 
   model_config = ConfigDict(extra="forbid")
 
 
+class AnalysisFilter(BaseModel):
+  """Audio analysis constraints for file queries (all bounds inclusive)."""
+
+  bpm_min: float | None = None
+  bpm_max: float | None = None
+  keys: list[str] | None = None
+  duration_min: float | None = None
+  duration_max: float | None = None
+
+  @property
+  def active(self) -> bool:
+    return any(
+      value is not None
+      for value in (self.bpm_min, self.bpm_max, self.keys, self.duration_min, self.duration_max)
+    )
+
+
 class PaginatedFiles(BaseModel):
   """Response envelope for paginated file listings."""
 
@@ -63,3 +101,54 @@ class PaginatedFiles(BaseModel):
   total: int
   limit: int
   offset: int
+
+
+class UploadSessionCreate(BaseModel):
+  """Request payload opening a resumable upload."""
+
+  name: str = Field(min_length=1)
+  type: str
+  size: int = Field(gt=0)
+
+  model_config = ConfigDict(extra="forbid")
+
+
+class UploadSessionRead(BaseModel):
+  """Progress of a resumable upload; clients resume by sending missing ranges."""
+
+  id: str
+  name: str
+  type: str
+  size: int
+  received: int
+  ranges: list[list[int]]
+  chunk_max_bytes: int
+  expires_at: datetime
+
+  model_config = ConfigDict(from_attributes=True)
+
+
+class StorageReconcileReport(BaseModel):
+  """Outcome of one storage reconciliation sweep."""
+
+  scanned_blobs: int = 0
+  scanned_rows: int = 0
+  orphans_removed: int = 0
+  staging_removed: int = 0
+  derived_removed: int = 0
+  reclaimed_bytes: int = 0
+  missing_files: int = 0
+  missing_file_ids: list[str] = Field(
+    default_factory=list,
+    description="Ids of rows whose blob is missing (first few only).",
+  )
+  errors: int = 0
+
+
+class ColdTierReport(BaseModel):
+  """Outcome of one cold-tier compression pass."""
+
+  compressed: int = 0
+  kept_raw: int = 0
+  saved_bytes: int = 0
+  errors: int = 0
@@ -2,19 +2,199 @@
 
 from __future__ import annotations
 
+import logging
+import os
+import re
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import timedelta
+from functools import partial
 from pathlib import Path
+from typing import Callable
 from uuid import uuid4
 
 from fastapi import UploadFile
 from sqlalchemy.exc import IntegrityError
 from sqlmodel import Session
 
-from app.errors import NotFoundError, ValidationError
-from app.files.model import File, FileVariant
-from app.files.repository import FileRepository
-from app.files.schemas import FileCreate
-from app.files.storage import FileStorage
+from app.errors import NotFoundError, StorageError, ValidationError
+from app.files.model import AudioAnalysis, File, FileVariant, _as_utc, _utcnow
+from app.files.repository import AudioAnalysisRepository, FileRepository
+from app.files.schemas import AnalysisFilter, FileAnalysisRead, FileCreate, FileRead, FileUpdate
+from app.files.storage import FileStorage, StagedFile
+from app.utils.compression import COLD_CODECS, iter_decoded
 from app.utils.files import safe_unlink
+from app.utils.media import MediaInfo, probe_media
+from app.utils.peaks import DEFAULT_PEAK_BUCKETS, compute_peaks, select_level
+
+logger = logging.getLogger(__name__)
+
+MEDIA_FILE_TYPES = {"audio", "video", "image"}
+PEAKS_KIND = "peaks"
+PEAKS_WORKERS = max(1, int(os.getenv("NOXTOOLS_PEAKS_WORKERS", "1")))
+# Stored in place of peaks for audio that cannot be decoded, so it is not
+# decoded again on every request.
+UNDECODABLE_PEAKS = b""
+# Downloads refresh `File.accessed_at` at most this often, which is plenty of
+# resolution for LRU eviction and keeps hot files from writing on every hit.
+ACCESS_TOUCH_INTERVAL = timedelta(
+  seconds=int(os.getenv("NOXTOOLS_ACCESS_TOUCH_SECONDS", "3600"))
+)
+
+ENHARMONIC_TONICS = {
+  "C#": "Db",
+  "Db": "C#",
+  "D#": "Eb",
+  "Eb": "D#",
+  "F#": "Gb",
+  "Gb": "F#",
+  "G#": "Ab",
+  "Ab": "G#",
+  "A#": "Bb",
+  "Bb": "A#",
+}
+KEY_PATTERN = re.compile(r"^\s*([a-g])\s*([#b]?)\s*(m|min|minor|maj|major)?\s*$", re.IGNORECASE)
+
+_tier_locks: dict[str, threading.Lock] = {}
+_tier_locks_guard = threading.Lock()
+
+
+def tier_lock(checksum: str) -> threading.Lock:
+  """Lock serializing moves of one blob between the hot and cold tiers."""
+  with _tier_locks_guard:
+    return _tier_locks.setdefault(checksum, threading.Lock())
+
+
+class _BlobReaders:
+  """
+  Counts downloads in flight per checksum so a tier move does not delete the
+  blob a response is about to open: the old tier file is retired, and only
+  unlinked once the last reader of that checksum is done.
+  """
+
+  def __init__(self) -> None:
+    self._counts: dict[str, int] = {}
+    self._retired: dict[str, set[Path]] = {}
+    self._lock = threading.Lock()
+
+  def acquire(self, checksum: str) -> None:
+    with self._lock:
+      self._counts[checksum] = self._counts.get(checksum, 0) + 1
+
+  def release(self, checksum: str) -> None:
+    with self._lock:
+      count = self._counts.get(checksum, 0) - 1
+      if count > 0:
+        self._counts[checksum] = count
+        return
+      self._counts.pop(checksum, None)
+      retired = self._retired.pop(checksum, set())
+    for path in retired:
+      safe_unlink(path)
+
+  def retire(self, checksum: str, path: Path) -> None:
+    """Unlink `path` now, or once the checksum's current readers finish."""
+    with self._lock:
+      if self._counts.get(checksum):
+        self._retired.setdefault(checksum, set()).add(path)
+        return
+    safe_unlink(path)
+
+  def reclaim(self, checksum: str, path: Path) -> None:
+    """Cancel a pending unlink of `path` before a tier move writes it again."""
+    with self._lock:
+      self._retired.get(checksum, set()).discard(path)
+
+
+blob_readers = _BlobReaders()
+
+
+class _PeaksBuilder:
+  """
+  Computes waveform peaks on a small background pool, at most once at a time
+  per checksum, so neither uploads nor job finalization wait for a decode.
+  """
+
+  def __init__(self) -> None:
+    self._pool: ThreadPoolExecutor | None = None
+    self._pending: dict[str, Future] = {}
+    self._lock = threading.Lock()
+
+  def submit(self, storage: FileStorage, checksum: str, path: Path, codec: str | None) -> Future:
+    with self._lock:
+      future = self._pending.get(checksum)
+      if future is not None:
+        return future
+      if self._pool is None:
+        self._pool = ThreadPoolExecutor(max_workers=PEAKS_WORKERS, thread_name_prefix="peaks")
+      future = self._pool.submit(_build_peaks, storage, checksum, path, codec)
+      self._pending[checksum] = future
+    future.add_done_callback(partial(self._forget, checksum))
+    return future
+
+  def wait(self, checksum: str) -> None:
+    """Block until a pending computation for `checksum` (if any) is done."""
+    with self._lock:
+      future = self._pending.get(checksum)
+    if future is not None:
+      future.result()
+
+  def _forget(self, checksum: str, future: Future) -> None:
+    with self._lock:
+      if self._pending.get(checksum) is future:
+        del self._pending[checksum]
+
+
+peaks_builder = _PeaksBuilder()
+
+
+def _build_peaks(storage: FileStorage, checksum: str, path: Path, codec: str | None) -> None:
+  """
+  Store the peaks of the blob at `path`, or UNDECODABLE_PEAKS. Cold blobs are
+  decoded into a scratch file rather than thawed.
+  """
+  peaks_path = storage.derived_path(checksum, PEAKS_KIND)
+  with tier_lock(checksum):
+    if peaks_path.is_file() or not path.is_file():
+      return
+    blob_readers.acquire(checksum)
+  scratch = None
+  try:
+    source = path
+    if codec in COLD_CODECS:
+      scratch = storage.staging_path(".peaks")
+      with scratch.open("wb") as handle:
+        for chunk in iter_decoded(path, codec):
+          handle.write(chunk)
+      source = scratch
+    data = compute_peaks(source)
+    storage.write_bytes(peaks_path, UNDECODABLE_PEAKS if data is None else data)
+  except (OSError, ValueError, StorageError):
+    logger.warning("Could not compute waveform peaks for %s", checksum, exc_info=True)
+  finally:
+    if scratch is not None:
+      safe_unlink(scratch)
+    blob_readers.release(checksum)
+
+
+class BlobLease:
+  """
+  A stored blob pinned in its current tier until `release()`. `thaw()`
+  moves a cold blob back to the hot tier and returns the plain file, which
+  the lease keeps in place as well.
+  """
+
+  def __init__(self, file: File, path: Path, thaw: Callable[[], Path]) -> None:
+    self.file = file
+    self.path = path
+    self.codec = file.storage_codec
+    self.thaw = thaw
+    self._released = False
+
+  def release(self) -> None:
+    if not self._released:
+      self._released = True
+      blob_readers.release(self.file.checksum)
 
 
 class FileService:
@@ -27,6 +207,7 @@ class FileService:
 
   def __init__(self, session: Session, *, storage: FileStorage | None = None) -> None:
     self.repo = FileRepository(session)
+    self.analyses = AudioAnalysisRepository(session)
     self.storage = storage or FileStorage()
 
   def create_from_upload(
@@ -39,22 +220,58 @@ class FileService:
     quality: str | int | None = None,
     variants: list[FileVariant] | None = None,
   ) -> File:
-    """Persist an uploaded file with checksum-based deduplication."""
+    """
+    Persist an uploaded file with checksum-based deduplication.
+
+    The upload is read once: it is hashed while being written to a staging
+    file, which is renamed into place or dropped on a checksum hit.
+    """
+    if not file_type:
+      raise ValidationError("File type is required")
+
+    staged = self.storage.stage_stream(upload.file)
+    return self.create_from_staged(
+      staged,
+      file_type=file_type,
+      name=name or upload.filename,
+      format=format,
+      quality=quality,
+      variants=variants,
+    )
+
+  def create_from_staged(
+    self,
+    staged: StagedFile,
+    *,
+    file_type: str,
+    name: str | None = None,
+    format: str | None = None,
+    quality: str | int | None = None,
+    variants: list[FileVariant] | None = None,
+  ) -> File:
+    """
+    Persist a staged (already hashed) file with checksum-based deduplication.
+
+    The staged file is renamed into place, or dropped when its checksum is
+    already stored.
+    """
     if not file_type:
+      self.storage.discard_staged(staged)
       raise ValidationError("File type is required")
 
-    filename = self.storage.sanitize_name(name or upload.filename or "file")
-    checksum, size = self.storage.hash_stream(upload.file)
+    filename = self.storage.sanitize_name(name or "file")
+    checksum, size = staged.checksum, staged.size
 
     existing = self.repo.get_by_checksum(checksum)
     if existing:
+      self.storage.discard_staged(staged)
       return existing
 
     file_id = str(uuid4())
-    relative_path = self.storage.build_relative_path(file_id, filename)
+    relative_path = self.storage.build_relative_path(checksum)
     dest_path = self.storage.resolve_path(relative_path)
 
-    self.storage.write_stream(dest_path, upload.file)
+    self.storage.commit_staged(staged, dest_path)
 
     payload = FileCreate(
       id=file_id,
@@ -68,17 +285,7 @@ class FileService:
       variants=variants,
     )
 
-    try:
-      return self.repo.create(payload)
-    except IntegrityError:
-      self.storage.remove_path(dest_path)
-      existing = self.repo.get_by_checksum(checksum)
-      if existing:
-        return existing
-      raise
-    except Exception:
-      self.storage.remove_path(dest_path)
-      raise
+    return self._with_peaks(self._insert(payload, dest_path))
 
   def create_from_path(
     self,
@@ -89,24 +296,38 @@ class FileService:
     format: str | None = None,
     quality: str | int | None = None,
     variants: list[FileVariant] | None = None,
+    media: MediaInfo | None = None,
+    checksum: str | None = None,
+    size: int | None = None,
   ) -> File:
-    """Persist a file from disk with checksum-based deduplication."""
+    """
+    Persist a file from disk with checksum-based deduplication.
+
+    A media inspection already computed by the caller is cached on the record
+    so it is never probed again. A `checksum` computed while the file was
+    written is trusted as-is, which skips rereading it.
+    """
     if not file_type:
       raise ValidationError("File type is required")
     if not source.exists() or not source.is_file():
       raise NotFoundError("Source file not found")
 
-    checksum, size = self.storage.hash_path(source)
+    if checksum:
+      size = size if size is not None else source.stat().st_size
+    else:
+      checksum, size = self.storage.hash_path(source)
     existing = self.repo.get_by_checksum(checksum)
     if existing:
       existing_path = self.storage.resolve_path(existing.path)
       if existing_path.resolve() != source.resolve():
         safe_unlink(source)
+      if media and existing.media is None:
+        existing = self._store_media(existing, media)
       return existing
 
     file_id = str(uuid4())
     filename = self.storage.sanitize_name(name or source.name)
-    relative_path = self.storage.build_relative_path(file_id, filename)
+    relative_path = self.storage.build_relative_path(checksum)
     dest_path = self.storage.resolve_path(relative_path)
 
     self.storage.move_path(source, dest_path)
@@ -121,20 +342,134 @@ class FileService:
       format=format,
       quality=quality,
       variants=variants,
+      media=media.to_dict() if media else None,
     )
 
+    return self._with_peaks(self._insert(payload, dest_path))
+
+  def _with_peaks(self, file: File) -> File:
+    """Start computing an audio file's waveform peaks in the background."""
+    if file.type == "audio":
+      peaks_builder.submit(self.storage, file.checksum, self.blob_path(file), file.storage_codec)
+    return file
+
+  def _insert(self, payload: FileCreate, dest_path: Path) -> File:
+    """
+    Create the row for a blob already moved to `dest_path`.
+
+    Blobs are content-addressed, so when a concurrent insert of the same
+    checksum wins, its row points at this very blob and it must be kept.
+    """
     try:
       return self.repo.create(payload)
     except IntegrityError:
+      existing = self.repo.get_by_checksum(payload.checksum)
+      if existing and existing.path == payload.path:
+        return existing
       self.storage.remove_path(dest_path)
-      existing = self.repo.get_by_checksum(checksum)
       if existing:
         return existing
       raise
     except Exception:
-      self.storage.remove_path(dest_path)
+      try:
+        referenced = self.repo.get_by_checksum(payload.checksum) is not None
+      except Exception:
+        referenced = False
+      if not referenced:
+        self.storage.remove_path(dest_path)
       raise
 
+  def inspect_media(self, file: File) -> MediaInfo | None:
+    """
+    Return the media inspection for a file, probing at most once per checksum.
+
+    The ffprobe result is cached on the File record; later calls (from any
+    tool) reuse it without spawning a process.
+    """
+    cached = MediaInfo.from_dict(file.media)
+    if cached:
+      return cached
+    if file.type not in MEDIA_FILE_TYPES:
+      return None
+
+    media = probe_media(self.resolve_path(file))
+    if media:
+      self._store_media(file, media)
+    return media
+
+  def _store_media(self, file: File, media: MediaInfo) -> File:
+    try:
+      updated = self.repo.update(file.id, FileUpdate(media=media.to_dict()))
+    except Exception:
+      return file
+    return updated or file
+
+  def read_peaks(self, file: File, *, max_buckets: int = DEFAULT_PEAK_BUCKETS) -> bytes:
+    """
+    Return waveform peaks of an audio file at the finest zoom level with at
+    most `max_buckets` buckets (see app.utils.peaks for the format).
+
+    Peaks are computed in the background when an audio file is stored; a
+    request that arrives first waits for them. Files stored before that (or
+    whose computation failed) are computed on request, decoding cold blobs
+    without thawing them.
+    """
+    if file.type != "audio":
+      raise ValidationError("Waveform peaks are only available for audio files")
+    peaks_path = self.storage.derived_path(file.checksum, PEAKS_KIND)
+    peaks_builder.wait(file.checksum)
+    if not peaks_path.is_file():
+      path = self.blob_path(file)
+      if not path.is_file():
+        raise NotFoundError("File not found")
+      peaks_builder.submit(self.storage, file.checksum, path, file.storage_codec).result()
+    try:
+      data = peaks_path.read_bytes()
+    except OSError as exc:
+      raise NotFoundError("Waveform peaks are not available for this file") from exc
+    if data == UNDECODABLE_PEAKS:
+      raise ValidationError("Audio could not be decoded for waveform peaks")
+    try:
+      return select_level(data, max_buckets=max_buckets)
+    except ValueError as exc:
+      raise NotFoundError("Waveform peaks are not available for this file") from exc
+
+  def record_analysis(self, file: File, analysis: dict) -> AudioAnalysis:
+    """Index an audio analysis summary under the file's checksum."""
+    return self.analyses.upsert(
+      file.checksum,
+      bpm=analysis.get("bpm"),
+      key=analysis.get("key"),
+      duration=analysis.get("duration"),
+      engine=analysis.get("engine"),
+      version=analysis.get("analyzer_version"),
+    )
+
+  def cached_analysis(self, file: File, *, engine: str, version: int) -> AudioAnalysis | None:
+    """
+    Return the stored analysis of the file's content if `engine` at `version`
+    produced it.
+
+    Analyses are keyed by checksum and engine, so re-uploads and copies of the
+    same audio hit the cache regardless of file id or job params.
+    """
+    row = self.analyses.get(file.checksum, engine)
+    if row and row.version == version:
+      return row
+    return None
+
+  def with_analysis(self, files: list[File]) -> list[FileRead]:
+    """Attach indexed analyses to files using a single lookup."""
+    analyses = self.analyses.list_for_checksums(file.checksum for file in files)
+    items: list[FileRead] = []
+    for file in files:
+      item = FileRead.model_validate(file)
+      analysis = analyses.get(file.checksum)
+      if analysis:
+        item.analysis = FileAnalysisRead.model_validate(analysis)
+      items.append(item)
+    return items
+
   def delete_file(self, file_id: str) -> bool:
     """Delete a file record and remove its storage folder."""
     file = self.repo.get(file_id)
@@ -143,18 +478,92 @@ class FileService:
 
     deleted = self.repo.delete(file_id)
     if deleted:
+      safe_unlink(self.storage.blob_path(file.path, file.storage_codec))
       self.storage.remove_path(self.storage.resolve_path(file.path))
+      safe_unlink(self.storage.derived_path(file.checksum, PEAKS_KIND))
     return deleted
 
   def resolve_path(self, file: File) -> Path:
-    """Resolve the absolute path for a stored file."""
+    """
+    Resolve the absolute path of a stored file's original bytes, for tools
+    that need a real file; cold files are decompressed back first.
+    """
+    if file.storage_codec in COLD_CODECS:
+      file = self.thaw(file)
     return self.storage.resolve_path(file.path)
 
+  def blob_path(self, file: File) -> Path:
+    """Resolve the on-disk blob in its current tier (compressed if cold)."""
+    return self.storage.blob_path(file.path, file.storage_codec)
+
+  def lease_blob(self, file: File) -> BlobLease | None:
+    """
+    Pin a file's blob in its current tier for a download; None if it is
+    missing. The caller must `release()` the lease once the response is sent.
+    """
+    with tier_lock(file.checksum):
+      self.repo.session.refresh(file)
+      path = self.blob_path(file)
+      if not path.is_file():
+        return None
+      blob_readers.acquire(file.checksum)
+    return BlobLease(file, path, partial(self.resolve_path, file))
+
+  def thaw(self, file: File) -> File:
+    """
+    Move a cold file back to the hot tier: decode it into staging, check it
+    against the checksum, then rename it into place and drop the cold blob.
+    """
+    with tier_lock(file.checksum):
+      self.repo.session.refresh(file)
+      codec = file.storage_codec
+      if codec not in COLD_CODECS:
+        return file
+
+      cold_path = self.storage.blob_path(file.path, codec)
+      writer = self.storage.open_staging()
+      try:
+        for chunk in iter_decoded(cold_path, codec):
+          writer.write(chunk)
+      except StorageError:
+        raise
+      except Exception as exc:
+        writer.abort()
+        raise StorageError("Failed to decompress stored file") from exc
+      staged = writer.finish()
+      if staged.checksum != file.checksum:
+        self.storage.discard_staged(staged)
+        raise StorageError("Decompressed file does not match its checksum")
+
+      plain_path = self.storage.resolve_path(file.path)
+      blob_readers.reclaim(file.checksum, plain_path)
+      self.storage.commit_staged(staged, plain_path)
+      updated = self.repo.update(file.id, FileUpdate(storage_codec=None, stored_size=None))
+      blob_readers.retire(file.checksum, cold_path)
+    # Count the thaw as a use so the next cold pass does not refreeze it.
+    self.mark_accessed(updated or file)
+    return updated or file
+
+  def mark_accessed(self, file: File) -> None:
+    """
+    Record a download for least-recently-used eviction. Best-effort: at most
+    one conditional UPDATE per ACCESS_TOUCH_INTERVAL, and failures are ignored.
+    """
+    now = _utcnow()
+    stale_before = now - ACCESS_TOUCH_INTERVAL
+    if file.accessed_at and _as_utc(file.accessed_at) >= stale_before:
+      return
+    try:
+      self.repo.touch(file.id, accessed_at=now, stale_before=stale_before)
+    except Exception:
+      pass
+
   def list_files(
     self,
     *,
     file_type: str | None = None,
     query: str | None = None,
+    analysis: AnalysisFilter | None = None,
     offset: int = 0,
     limit: int = 50,
   ) -> list[File]:
@@ -162,10 +571,60 @@ class FileService:
     return self.repo.list(
       file_type=file_type,
       query=query,
+      analysis=analysis,
       offset=offset,
       limit=limit,
     )
 
-  def count_files(self, *, file_type: str | None = None, query: str | None = None) -> int:
+  def count_files(
+    self,
+    *,
+    file_type: str | None = None,
+    query: str | None = None,
+    analysis: AnalysisFilter | None = None,
+  ) -> int:
     """Count files matching optional filters."""
-    return self.repo.count(file_type=file_type, query=query)
+    return self.repo.count(file_type=file_type, query=query, analysis=analysis)
+
+
+def build_analysis_filter(
+  *,
+  bpm_min: float | None = None,
+  bpm_max: float | None = None,
+  key: str | None = None,
+  duration_min: float | None = None,
+  duration_max: float | None = None,
+) -> AnalysisFilter:
+  """
+  Validate analysis query params into an AnalysisFilter.
+
+  `key` accepts forms like "A minor", "Am", "f#" or "Bb maj"; without a scale
+  both the major and minor keys match.
+  """
+  if bpm_min is not None and bpm_max is not None and bpm_min > bpm_max:
+    raise ValidationError("bpm_min must not exceed bpm_max")
+  if duration_min is not None and duration_max is not None and duration_min > duration_max:
+    raise ValidationError("duration_min must not exceed duration_max")
+  return AnalysisFilter(
+    bpm_min=bpm_min,
+    bpm_max=bpm_max,
+    keys=_parse_key_query(key) if key else None,
+    duration_min=duration_min,
+    duration_max=duration_max,
+  )
+
+
+def _parse_key_query(value: str) -> list[str]:
+  match = KEY_PATTERN.match(value)
+  if not match:
+    raise ValidationError("Key must look like 'A minor', 'Am' or 'F# major'")
+  note, accidental, scale = match.groups()
+  tonic = note.upper() + accidental.lower()
+  tonics = [tonic, ENHARMONIC_TONICS[tonic]] if tonic in ENHARMONIC_TONICS else [tonic]
+  if not scale:
+    scales = ["Major", "Minor"]
+  elif scale.lower() in {"m", "min", "minor"}:
+    scales = ["Minor"]
+  else:
+    scales = ["Major"]
+  return [f"{name} {mode}" for name in tonics for mode in scales]
@@ -5,17 +5,78 @@ from __future__ import annotations
 import hashlib
 import os
 import shutil
+from dataclasses import dataclass
 from pathlib import Path
-from typing import BinaryIO
+from typing import BinaryIO, Iterator
+from uuid import uuid4
 
-from app.errors import StorageError
+from app.errors import PayloadTooLargeError, StorageError
+from app.utils.compression import CODEC_SUFFIXES
+from app.utils.files import safe_unlink
+from app.utils.hashing import hash_file, iter_chunks
 
 DEFAULT_STORAGE_ROOT = Path(os.getenv("NOXTOOLS_FILE_STORAGE_ROOT", "storage/files"))
 CHUNK_SIZE = 1024 * 1024
+DERIVED_DIRNAME = ".derived"
+INCOMING_DIRNAME = ".incoming"
+MAX_UPLOAD_BYTES = int(os.getenv("NOXTOOLS_MAX_UPLOAD_BYTES", str(8 * 1024**3)))
+
+
+@dataclass(frozen=True)
+class StagedFile:
+  """Bytes written to a temp file inside the storage volume, already hashed."""
+
+  path: Path
+  checksum: str
+  size: int
+
+
+class StagingWriter:
+  """
+  Incremental writer for a staging file: bytes are hashed and counted as they
+  are written, and `max_bytes` is enforced before anything past it hits disk.
+  """
+
+  def __init__(self, path: Path, *, max_bytes: int | None = None) -> None:
+    self.path = path
+    self.max_bytes = max_bytes
+    self.size = 0
+    self._hasher = hashlib.sha256()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    self._handle = path.open("wb")
+
+  def write(self, chunk: bytes | memoryview) -> None:
+    if self.max_bytes is not None and self.size + len(chunk) > self.max_bytes:
+      self.abort()
+      raise PayloadTooLargeError(f"File exceeds the maximum size ({self.max_bytes} bytes)")
+    try:
+      self._handle.write(chunk)
+    except Exception as exc:
+      self.abort()
+      raise StorageError("Failed to write file to storage") from exc
+    self._hasher.update(chunk)
+    self.size += len(chunk)
+
+  def finish(self) -> StagedFile:
+    """Close the staging file and return it with its checksum and size."""
+    self._handle.close()
+    return StagedFile(path=self.path, checksum=self._hasher.hexdigest(), size=self.size)
+
+  def abort(self) -> None:
+    """Close and delete the staging file."""
+    self._handle.close()
+    safe_unlink(self.path)
 
 
 class FileStorage:
-  """Handles physical storage for File entities."""
+  """
+  Handles physical storage for File entities.
+
+  Files are content-addressed: bytes live at `ab/cd/<sha256>` under the root
+  (two levels of fan-out keep directories small), so identical content always
+  maps to one blob and the original name is kept only in the database. Rows
+  written before this layout keep their `<file id>/<name>` paths.
+  """
 
   def __init__(self, root: Path | None = None) -> None:
     self.root = Path(root) if root else DEFAULT_STORAGE_ROOT
@@ -26,65 +87,130 @@ class FileStorage:
     cleaned = Path(name).name.strip()
     return cleaned or "file"
 
-  def build_relative_path(self, file_id: str, filename: str) -> str:
-    """Build the storage-relative path for a file."""
-    return str(Path(file_id) / filename)
+  def build_relative_path(self, checksum: str) -> str:
+    """Build the sharded, content-addressed storage-relative path for a file."""
+    return str(_shard(checksum))
 
   def resolve_path(self, relative_path: str) -> Path:
     """Resolve an absolute path under the storage root."""
     return self.root / relative_path
 
-  def hash_stream(self, stream: BinaryIO) -> tuple[str, int]:
-    """Compute SHA-256 checksum and size for a stream, then reset to start."""
-    if not self._safe_seek(stream, 0):
-      raise StorageError("File stream is not seekable")
+  def blob_path(self, relative_path: str, codec: str | None = None) -> Path:
+    """
+    Resolve the on-disk blob of a file in its current tier: cold blobs sit
+    next to the plain path with their codec's suffix (e.g. `<sha>.zst`).
+    """
+    path = self.resolve_path(relative_path)
+    suffix = CODEC_SUFFIXES.get(codec or "")
+    return path.with_name(path.name + suffix) if suffix else path
+
+  def staging_path(self, suffix: str = ".partial") -> Path:
+    """Reserve a temp path under the storage root (same volume as blobs)."""
+    folder = self.root / INCOMING_DIRNAME
+    folder.mkdir(parents=True, exist_ok=True)
+    return folder / f"{uuid4()}{suffix}"
+
+  def derived_path(self, checksum: str, kind: str) -> Path:
+    """
+    Resolve where data derived from a file's content (e.g. waveform peaks) is
+    kept. Paths are keyed by checksum, so duplicates share one copy.
+    """
+    return self.root / DERIVED_DIRNAME / kind / _shard(checksum)
 
-    hasher = hashlib.sha256()
-    size = 0
+  def write_bytes(self, dest: Path, data: bytes) -> None:
+    """Atomically write a small blob (temp file + rename)."""
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest.with_name(f".{dest.name}.partial")
+    try:
+      tmp_path.write_bytes(data)
+      os.replace(tmp_path, dest)
+    except Exception as exc:
+      safe_unlink(tmp_path)
+      raise StorageError("Failed to write file to storage") from exc
 
-    while True:
-      chunk = stream.read(CHUNK_SIZE)
-      if not chunk:
-        break
-      size += len(chunk)
-      hasher.update(chunk)
+  def stage_stream(self, stream: BinaryIO) -> StagedFile:
+    """
+    Copy a stream into a temp file under the storage root in a single pass,
+    computing its SHA-256 checksum and size along the way.
 
-    if not self._safe_seek(stream, 0):
-      raise StorageError("Failed to reset file stream")
+    The temp file is on the same volume as the final location, so
+    `commit_staged` is a rename rather than a second copy.
+    """
+    self._safe_seek(stream, 0)
+    writer = self.open_staging()
+    try:
+      for chunk in iter_chunks(stream):
+        writer.write(chunk)
+    except StorageError:
+      raise
+    except Exception as exc:
+      writer.abort()
+      raise StorageError("Failed to read upload stream") from exc
+    return writer.finish()
 
-    return hasher.hexdigest(), size
+  def open_staging(self, *, max_bytes: int | None = None) -> StagingWriter:
+    """Open a staging file under the storage root for incremental writes."""
+    return StagingWriter(self.root / INCOMING_DIRNAME / f"{uuid4()}.partial", max_bytes=max_bytes)
 
-  def hash_path(self, path: Path) -> tuple[str, int]:
-    """Compute SHA-256 checksum and size for a file on disk."""
-    if not path.exists() or not path.is_file():
-      raise StorageError("File not found on disk")
+  def upload_path(self, session_id: str) -> Path:
+    """Resolve the staging file of a resumable upload session."""
+    return self.root / INCOMING_DIRNAME / f"{session_id}.upload"
 
-    hasher = hashlib.sha256()
-    size = 0
+  def allocate(self, path: Path, size: int) -> None:
+    """Create a sparse file of `size` bytes for out-of-order chunk writes."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    try:
+      with path.open("wb") as handle:
+        handle.truncate(size)
+    except Exception as exc:
+      raise StorageError("Failed to allocate upload file") from exc
+
+  def write_at(self, path: Path, offset: int, data: bytes) -> None:
+    """Write `data` at `offset` of an allocated file."""
+    try:
+      with path.open("r+b") as handle:
+        handle.seek(offset)
+        handle.write(data)
+    except Exception as exc:
+      raise StorageError("Failed to write upload chunk") from exc
 
+  def iter_range(self, path: Path, start: int, end: int) -> Iterator[bytes]:
+    """Yield the bytes of [start, end) in CHUNK_SIZE reads."""
     try:
       with path.open("rb") as handle:
-        while True:
-          chunk = handle.read(CHUNK_SIZE)
+        handle.seek(start)
+        remaining = end - start
+        while remaining > 0:
+          chunk = handle.read(min(CHUNK_SIZE, remaining))
           if not chunk:
             break
-          size += len(chunk)
-          hasher.update(chunk)
-    except Exception as exc:
-      raise StorageError("Failed to read file for hashing") from exc
-
-    return hasher.hexdigest(), size
+          remaining -= len(chunk)
+          yield chunk
+    except OSError as exc:
+      raise StorageError("Failed to read upload file") from exc
 
-  def write_stream(self, dest: Path, stream: BinaryIO) -> None:
-    """Persist a stream to the given destination path."""
+  def commit_staged(self, staged: StagedFile, dest: Path) -> None:
+    """Atomically move a staged file to its final storage path."""
     dest.parent.mkdir(parents=True, exist_ok=True)
     try:
-      with dest.open("wb") as buffer:
-        shutil.copyfileobj(stream, buffer)
+      os.replace(staged.path, dest)
     except Exception as exc:
-      raise StorageError("Failed to write file to storage") from exc
+      safe_unlink(staged.path)
+      raise StorageError("Failed to move file into storage") from exc
 
-    self._safe_seek(stream, 0)
+  def discard_staged(self, staged: StagedFile) -> None:
+    """Drop a staged file (e.g. when its checksum is already stored)."""
+    safe_unlink(staged.path)
+
+  def hash_path(self, path: Path) -> tuple[str, int]:
+    """Compute SHA-256 checksum and size for a file on disk."""
+    if not path.exists() or not path.is_file():
+      raise StorageError("File not found on disk")
+
+    try:
+      return hash_file(path)
+    except Exception as exc:
+      raise StorageError("Failed to read file for hashing") from exc
 
   def move_path(self, source: Path, dest: Path) -> None:
     """Move a file into storage."""
@@ -95,7 +221,12 @@ class FileStorage:
       raise StorageError("Failed to move file into storage") from exc
 
   def remove_path(self, path: Path) -> None:
-    """Best-effort removal of a stored file and its parent folder."""
+    """
+    Best-effort removal of a stored file.
+
+    Shard folders are pruned only once empty; a legacy per-file folder is
+    removed with everything in it.
+    """
     try:
       if path.exists():
         path.unlink()
@@ -108,11 +239,63 @@ class FileStorage:
     if not self._is_within_root(parent):
       return
 
+    if self._is_sharded(path):
+      self._prune_empty(parent)
+      return
+
     try:
       shutil.rmtree(parent, ignore_errors=True)
     except Exception:
       pass
 
+  def iter_blobs(self) -> Iterator[Path]:
+    """
+    Yield every stored blob, sharded or legacy, skipping the internal
+    dot-folders (staging and derived data).
+    """
+    yield from self._walk(self.root, skip_hidden=True)
+
+  def iter_internal(self, dirname: str) -> Iterator[Path]:
+    """Yield every file under one of the internal folders (e.g. `.incoming`)."""
+    yield from self._walk(self.root / dirname, skip_hidden=False)
+
+  def remove_blob(self, path: Path) -> int:
+    """
+    Remove a single file and prune the folders it leaves empty, whatever the
+    layout. Returns the bytes reclaimed (0 if nothing was removed).
+    """
+    if not self._is_within_root(path):
+      return 0
+    try:
+      size = path.stat().st_size
+      path.unlink()
+    except OSError:
+      return 0
+    self._prune_empty(path.parent)
+    return size
+
+  def _walk(self, top: Path, *, skip_hidden: bool) -> Iterator[Path]:
+    for folder, dirnames, filenames in os.walk(top):
+      if skip_hidden:
+        dirnames[:] = [name for name in dirnames if not name.startswith(".")]
+      for name in filenames:
+        yield Path(folder) / name
+
+  def _is_sharded(self, path: Path) -> bool:
+    try:
+      relative = path.relative_to(self.root)
+    except ValueError:
+      return False
+    return relative == _shard(path.name)
+
+  def _prune_empty(self, folder: Path) -> None:
+    while folder != self.root and self._is_within_root(folder):
+      try:
+        folder.rmdir()
+      except OSError:
+        return
+      folder = folder.parent
+
   def _safe_seek(self, stream: BinaryIO, position: int) -> bool:
     try:
       stream.seek(position)
@@ -125,3 +308,7 @@ class FileStorage:
       return path.resolve().is_relative_to(self.root.resolve())
     except Exception:
       return False
+
+
+def _shard(checksum: str) -> Path:
+  return Path(checksum[:2]) / checksum[2:4] / checksum
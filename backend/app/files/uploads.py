@@ -0,0 +1,215 @@
+"""Resumable chunked uploads backed by FileStorage."""
+
+from __future__ import annotations
+
+import hashlib
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import timedelta
+from pathlib import Path
+from typing import Any
+
+from sqlmodel import Session
+
+from app.errors import ConflictError, NotFoundError, PayloadTooLargeError, ValidationError
+from app.files.model import File, UploadSession, _as_utc, _utcnow
+from app.files.repository import UploadSessionRepository
+from app.files.schemas import UploadSessionCreate, UploadSessionRead
+from app.files.service import MEDIA_FILE_TYPES, FileService
+from app.files.storage import MAX_UPLOAD_BYTES, FileStorage, StagedFile
+from app.utils.files import safe_unlink
+
+UPLOAD_SESSION_TTL = timedelta(
+  seconds=int(os.getenv("NOXTOOLS_UPLOAD_SESSION_TTL_SECONDS", str(24 * 3600)))
+)
+CHUNK_MAX_BYTES = int(os.getenv("NOXTOOLS_UPLOAD_CHUNK_MAX_BYTES", str(64 * 1024 * 1024)))
+GC_BATCH_SIZE = 100
+
+
+@dataclass
+class _HashState:
+  """
+  Running SHA-256 over the contiguous prefix of an upload.
+
+  `stale` is set once a chunk rewrites bytes that were already hashed; the
+  digest is then recomputed from disk at completion.
+  """
+
+  hasher: Any = field(default_factory=hashlib.sha256)
+  offset: int = 0
+  stale: bool = False
+  lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+class _HashRegistry:
+  """
+  Per-session hash states, kept in process memory.
+
+  A state lost on restart is rebuilt from the bytes already on disk the next
+  time the session advances.
+  """
+
+  def __init__(self) -> None:
+    self._states: dict[str, _HashState] = {}
+    self._lock = threading.Lock()
+
+  def get(self, session_id: str) -> _HashState:
+    with self._lock:
+      return self._states.setdefault(session_id, _HashState())
+
+  def drop(self, session_id: str) -> None:
+    with self._lock:
+      self._states.pop(session_id, None)
+
+
+_hash_states = _HashRegistry()
+
+
+class UploadSessionService:
+  """
+  Resumable uploads: open a session, write chunks at any offset (in parallel
+  if desired), then complete it into a stored File.
+
+  Chunks that extend the contiguous prefix are hashed as they arrive, so for
+  in-order uploads the SHA-256 is ready at completion without rereading the
+  file. Chunks received out of order are hashed from disk once the gap before
+  them is filled; a chunk resent over already hashed bytes makes completion
+  rehash the whole file from disk. Sessions idle past UPLOAD_SESSION_TTL are
+  garbage-collected.
+  """
+
+  def __init__(self, session: Session, *, storage: FileStorage | None = None) -> None:
+    self.repo = UploadSessionRepository(session)
+    self.files = FileService(session, storage=storage)
+    self.storage = self.files.storage
+
+  def create(self, payload: UploadSessionCreate) -> UploadSession:
+    """Open an upload session and allocate its staging file."""
+    if payload.type not in MEDIA_FILE_TYPES:
+      raise ValidationError(f"Type must be one of: {', '.join(sorted(MEDIA_FILE_TYPES))}")
+    if payload.size > MAX_UPLOAD_BYTES:
+      raise PayloadTooLargeError(f"File exceeds the maximum size ({MAX_UPLOAD_BYTES} bytes)")
+
+    self.purge_expired()
+    upload = UploadSession(
+      name=self.storage.sanitize_name(payload.name),
+      type=payload.type,
+      size=payload.size,
+      ranges=[],
+      expires_at=_utcnow() + UPLOAD_SESSION_TTL,
+    )
+    self.storage.allocate(self.storage.upload_path(upload.id), payload.size)
+    return self.repo.save(upload)
+
+  def get(self, session_id: str) -> UploadSession:
+    """Return an active session or raise NotFoundError."""
+    upload = self.repo.get(session_id)
+    if not upload or _as_utc(upload.expires_at) < _utcnow():
+      raise NotFoundError("Upload session not found")
+    return upload
+
+  def write_chunk(self, session_id: str, offset: int, data: bytes) -> UploadSession:
+    """Store one chunk at `offset` and record its byte range."""
+    if not data:
+      raise ValidationError("Chunk is empty")
+    if len(data) > CHUNK_MAX_BYTES:
+      raise PayloadTooLargeError(f"Chunk exceeds the maximum size ({CHUNK_MAX_BYTES} bytes)")
+
+    upload = self.get(session_id)
+    end = offset + len(data)
+    if offset < 0 or end > upload.size:
+      raise ValidationError(f"Chunk [{offset}, {end}) is outside the upload size ({upload.size})")
+
+    path = self.storage.upload_path(upload.id)
+    self.storage.write_at(path, offset, data)
+
+    state = _hash_states.get(upload.id)
+    with state.lock:
+      self.repo.session.refresh(upload)
+      upload.ranges = _merge_ranges([*(upload.ranges or []), [offset, end]])
+      upload.received = sum(stop - start for start, stop in upload.ranges)
+      upload.expires_at = _utcnow() + UPLOAD_SESSION_TTL
+      if offset < state.offset:
+        state.stale = True
+      if not state.stale:
+        if state.offset == offset:
+          state.hasher.update(data)
+          state.offset = end
+        self._advance_hash(state, path, upload.ranges)
+      return self.repo.save(upload)
+
+  def complete(self, session_id: str) -> File:
+    """Turn a fully received upload into a stored File."""
+    upload = self.get(session_id)
+    path = self.storage.upload_path(upload.id)
+    state = _hash_states.get(upload.id)
+    with state.lock:
+      self.repo.session.refresh(upload)
+      if upload.ranges != [[0, upload.size]]:
+        raise ConflictError(f"Upload is incomplete ({upload.received} of {upload.size} bytes)")
+      if state.stale:
+        state.hasher, state.offset, state.stale = hashlib.sha256(), 0, False
+      self._advance_hash(state, path, upload.ranges)
+      staged = StagedFile(path=path, checksum=state.hasher.hexdigest(), size=upload.size)
+      name, file_type = upload.name, upload.type
+      self.repo.delete(upload)
+      _hash_states.drop(session_id)
+
+    return self.files.create_from_staged(
+      staged,
+      file_type=file_type,
+      name=name,
+      format=Path(name).suffix.lstrip(".").lower() or None,
+    )
+
+  def abort(self, session_id: str) -> None:
+    """Cancel an upload and delete what was received."""
+    upload = self.get(session_id)
+    self._remove(upload)
+
+  def purge_expired(self) -> int:
+    """Delete expired sessions and their staging files; return how many."""
+    removed = 0
+    while True:
+      expired = self.repo.list_expired(limit=GC_BATCH_SIZE)
+      for upload in expired:
+        self._remove(upload)
+      removed += len(expired)
+      if len(expired) < GC_BATCH_SIZE:
+        return removed
+
+  def to_read(self, upload: UploadSession) -> UploadSessionRead:
+    return UploadSessionRead(
+      id=upload.id,
+      name=upload.name,
+      type=upload.type,
+      size=upload.size,
+      received=upload.received,
+      ranges=upload.ranges or [],
+      chunk_max_bytes=CHUNK_MAX_BYTES,
+      expires_at=_as_utc(upload.expires_at),
+    )
+
+  def _remove(self, upload: UploadSession) -> None:
+    safe_unlink(self.storage.upload_path(upload.id))
+    _hash_states.drop(upload.id)
+    self.repo.delete(upload)
+
+  def _advance_hash(self, state: _HashState, path: Path, ranges: list[list[int]]) -> None:
+    """Hash bytes already on disk that now extend the contiguous prefix."""
+    for start, end in ranges:
+      if start <= state.offset < end:
+        for chunk in self.storage.iter_range(path, state.offset, end):
+          state.hasher.update(chunk)
+          state.offset += len(chunk)
+
+
+def _merge_ranges(ranges: list[list[int]]) -> list[list[int]]:
+  merged: list[list[int]] = []
+  for start, end in sorted((int(start), int(end)) for start, end in ranges):
+    if merged and start <= merged[-1][1]:
+      merged[-1][1] = max(merged[-1][1], end)
+    else:
+      merged.append([start, end])
+  return merged
@@ -7,6 +7,7 @@ from app.jobs.file_links import JobFile, JobFileRole, JobFileService
 from app.jobs.lifecycle import JobAbortReason, JobLifecycleService
 from app.jobs.model import Job, JobStatus, JobTool
 from app.jobs.repository import JobRepository
+from app.jobs.retention import StorageQuotas, StorageRetentionService
 from app.jobs.schemas import JobCreate, JobExecutionResult, JobRead, JobUpdate
 from app.jobs.service import JobService
 
@@ -32,4 +33,6 @@ __all__ = [
   "JobEvent",
   "job_event_bus",
   "JobExecutionResult",
+  "StorageQuotas",
+  "StorageRetentionService",
 ]
@@ -84,6 +84,10 @@ class JobFileRepository:
     stmt = select(JobFile).where(JobFile.job_id == job_id)
     return list(self.session.exec(stmt).all())
 
+  def list_for_file(self, file_id: str) -> list[JobFile]:
+    stmt = select(JobFile).where(JobFile.file_id == file_id)
+    return list(self.session.exec(stmt).all())
+
   def count_by_file(self, file_id: str) -> int:
     stmt = select(func.count()).select_from(JobFile).where(JobFile.file_id == file_id)
     result = self.session.exec(stmt).one()
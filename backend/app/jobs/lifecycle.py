@@ -13,9 +13,11 @@ from app.errors import ConflictError
 from app.jobs.cleanup import JobCleanupService
 from app.jobs.file_links import JobFileRole, JobFileService
 from app.jobs.model import Job, JobStatus
+from app.jobs.retention import StorageRetentionService
 from app.jobs.schemas import JobExecutionResult
 from app.jobs.service import JobService
 from app.utils.files import safe_rmtree
+from app.utils.hashing import hash_files
 
 
 class JobAbortReason(str, Enum):
@@ -74,6 +76,7 @@ class JobLifecycleService:
     output_names: list[str] = []
 
     try:
+      self._hash_outputs(payload)
       for output in payload.output_files:
         file = self.file_links.file_service.create_from_path(
           output.path,
@@ -81,6 +84,9 @@ class JobLifecycleService:
           name=output.name,
           format=output.format,
           quality=output.quality,
+          media=output.media,
+          checksum=output.checksum,
+          size=output.size,
         )
         self.file_links.link(
           job_id,
@@ -92,7 +98,7 @@ class JobLifecycleService:
         output_names.append(file.name)
 
       result = self._build_result(job_id, payload.summary)
-      return self.job_service.mark_completed(
+      job = self.job_service.mark_completed(
         job_id,
         output_path=None,
         output_files=output_names,
@@ -108,6 +114,20 @@ class JobLifecycleService:
     finally:
       self._cleanup_paths(payload.cleanup_paths)
 
+    self._enforce_quotas(job_id)
+    return job
+
+  def _hash_outputs(self, payload: JobExecutionResult) -> None:
+    """Hash outputs the executor did not hash while writing, concurrently."""
+    missing = [
+      output
+      for output in payload.output_files
+      if not output.checksum and output.path.is_file()
+    ]
+    for output, (checksum, size) in zip(missing, hash_files(output.path for output in missing)):
+      output.checksum = checksum
+      output.size = size
+
   def fail(self, job_id: str, message: str) -> Optional[Job]:
     """Mark a job as errored and clean outputs."""
     job = self.job_service.mark_error(job_id, message)
@@ -201,6 +221,13 @@ class JobLifecycleService:
     except Exception:
       pass
 
+  def _enforce_quotas(self, job_id: str) -> None:
+    """Best-effort eviction after new outputs land, sparing this job's own."""
+    try:
+      StorageRetentionService(self.session).enforce(keep_jobs=[job_id])
+    except Exception:
+      self.session.rollback()
+
   def _cleanup_paths(self, paths: list[Path] | None) -> None:
     for path in paths or []:
       try:
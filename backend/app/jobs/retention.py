@@ -0,0 +1,256 @@
+"""Storage quotas and least-recently-used eviction of derived job outputs."""
+
+from __future__ import annotations
+
+import os
+import re
+from dataclasses import dataclass, field
+from typing import Iterable, Iterator
+
+from sqlalchemy import func
+from sqlmodel import Session, select
+
+from app.files.model import File
+from app.files.storage import FileStorage
+from app.jobs.file_links import JobFile, JobFileRole, JobFileService
+from app.jobs.model import Job, JobStatus, JobTool
+from app.jobs.schemas import EvictionReport, JobUpdate, StorageScopeRead, StorageUsageRead
+from app.jobs.service import JobService
+
+EVICTION_BATCH_SIZE = 100
+SIZE_UNITS = {"": 1, "k": 1024, "m": 1024**2, "g": 1024**3, "t": 1024**4}
+SIZE_PATTERN = re.compile(r"^\s*(\d+)\s*([kmgt]?)(?:i?b)?\s*$", re.IGNORECASE)
+# Bytes a file takes on disk: its compressed size once in the cold tier.
+DISK_BYTES = func.coalesce(File.stored_size, File.size)
+
+
+def parse_size(value: str) -> int:
+  """Parse a byte size such as "500M", "20G" or "1073741824"."""
+  match = SIZE_PATTERN.match(value)
+  if not match:
+    raise ValueError(f"Invalid size: {value!r}")
+  return int(match.group(1)) * SIZE_UNITS[match.group(2).lower()]
+
+
+def _parse_quota_map(raw: str) -> dict[str, int]:
+  quotas: dict[str, int] = {}
+  for item in raw.split(","):
+    if not item.strip():
+      continue
+    name, _, size = item.partition("=")
+    quotas[name.strip().lower()] = parse_size(size)
+  return quotas
+
+
+@dataclass(frozen=True)
+class StorageQuotas:
+  """
+  Byte quotas for the whole volume, per `File.type` and per tool.
+
+  Configured from the environment, e.g.:
+    NOXTOOLS_STORAGE_QUOTA=200G
+    NOXTOOLS_STORAGE_TYPE_QUOTAS=video=120G,image=5G
+    NOXTOOLS_STORAGE_TOOL_QUOTAS=noxsongizer=60G
+  """
+
+  total: int | None = None
+  by_type: dict[str, int] = field(default_factory=dict)
+  by_tool: dict[str, int] = field(default_factory=dict)
+
+  @classmethod
+  def from_env(cls) -> StorageQuotas:
+    total = os.getenv("NOXTOOLS_STORAGE_QUOTA", "").strip()
+    by_tool = _parse_quota_map(os.getenv("NOXTOOLS_STORAGE_TOOL_QUOTAS", ""))
+    known_tools = {tool.value for tool in JobTool}
+    unknown = sorted(set(by_tool) - known_tools)
+    if unknown:
+      raise ValueError(f"Unknown tools in NOXTOOLS_STORAGE_TOOL_QUOTAS: {', '.join(unknown)}")
+    return cls(
+      total=parse_size(total) if total else None,
+      by_type=_parse_quota_map(os.getenv("NOXTOOLS_STORAGE_TYPE_QUOTAS", "")),
+      by_tool=by_tool,
+    )
+
+  @property
+  def enabled(self) -> bool:
+    return self.total is not None or bool(self.by_type) or bool(self.by_tool)
+
+  def scopes(self) -> Iterator[tuple[str, str | None, int]]:
+    """Yield (scope, name, quota), narrowest scopes first."""
+    for name, quota in sorted(self.by_tool.items()):
+      yield "tool", name, quota
+    for name, quota in sorted(self.by_type.items()):
+      yield "type", name, quota
+    if self.total is not None:
+      yield "total", None, self.total
+
+
+class StorageRetentionService:
+  """
+  Keeps stored bytes within the configured quotas.
+
+  Usage is tracked in bytes on disk (compressed size for cold files) per
+  `File.type` and per tool (the distinct outputs its jobs produced). When a
+  scope is over quota, derived outputs are evicted least recently downloaded
+  first; outputs are reproducible by re-running the job.
+  Inputs are pinned: files linked as an input to any job, or to a pending or
+  running job, are never evicted. Jobs that lose an output drop their
+  signature, so an identical request runs again instead of being
+  deduplicated onto files that no longer exist.
+  """
+
+  def __init__(
+    self,
+    session: Session,
+    *,
+    storage: FileStorage | None = None,
+    quotas: StorageQuotas | None = None,
+  ) -> None:
+    self.session = session
+    self.quotas = quotas or StorageQuotas.from_env()
+    self.job_service = JobService(session)
+    self.file_links = JobFileService(session, storage=storage)
+
+  def usage(self) -> StorageUsageRead:
+    """Return stored bytes by type and by tool alongside their quotas."""
+    by_type = dict(
+      self.session.exec(select(File.type, func.sum(DISK_BYTES)).group_by(File.type)).all()
+    )
+    pairs = self._tool_outputs().subquery()
+    by_tool = {
+      _tool_name(tool): total
+      for tool, total in self.session.exec(
+        select(pairs.c.tool, func.sum(DISK_BYTES))
+        .join(pairs, pairs.c.file_id == File.id)
+        .group_by(pairs.c.tool)
+      ).all()
+    }
+    pinned = select(JobFile.file_id).where(JobFile.role == JobFileRole.INPUT)
+
+    return StorageUsageRead(
+      total=StorageScopeRead(scope="total", bytes=self._sum(), quota=self.quotas.total),
+      pinned_bytes=self._sum(File.id.in_(pinned)),
+      by_type=_scope_rows("type", by_type, self.quotas.by_type),
+      by_tool=_scope_rows("tool", by_tool, self.quotas.by_tool),
+    )
+
+  def enforce(self, *, keep_jobs: Iterable[str] = ()) -> EvictionReport:
+    """
+    Evict least-recently-downloaded outputs until every scope fits its quota.
+
+    Args:
+      keep_jobs: Job ids whose outputs must not be evicted in this pass
+        (e.g. the job that just completed).
+
+    Returns:
+      What was evicted, and any scopes still over quota because the rest of
+      their bytes are pinned.
+    """
+    report = EvictionReport()
+    if not self.quotas.enabled:
+      return report
+
+    keep = list(keep_jobs)
+    for scope, name, quota in self.quotas.scopes():
+      excess = self._scope_bytes(scope, name) - quota
+      while excess > 0:
+        batch = self._candidates(scope, name, keep_jobs=keep)
+        if not batch:
+          break
+        for file in batch:
+          if excess <= 0:
+            break
+          excess -= file.stored_size or file.size
+          self._evict(file, report)
+
+    for scope, name, quota in self.quotas.scopes():
+      used = self._scope_bytes(scope, name)
+      if used > quota:
+        report.over_quota.append(StorageScopeRead(scope=scope, name=name, bytes=used, quota=quota))
+    return report
+
+  def _candidates(self, scope: str, name: str | None, *, keep_jobs: list[str]) -> list[File]:
+    outputs = select(JobFile.file_id).where(JobFile.role == JobFileRole.OUTPUT)
+    pinned = select(JobFile.file_id).where(JobFile.role == JobFileRole.INPUT)
+    busy = (
+      select(JobFile.file_id)
+      .join(Job, Job.id == JobFile.job_id)
+      .where(Job.status.in_((JobStatus.PENDING, JobStatus.RUNNING)) | Job.id.in_(keep_jobs))
+    )
+    stmt = (
+      select(File)
+      .where(File.id.in_(outputs))
+      .where(File.id.not_in(pinned))
+      .where(File.id.not_in(busy))
+    )
+    if scope == "type":
+      stmt = stmt.where(File.type == name)
+    elif scope == "tool":
+      stmt = stmt.where(File.id.in_(self._tool_outputs(name).with_only_columns(JobFile.file_id)))
+    stmt = stmt.order_by(func.coalesce(File.accessed_at, File.created_at), File.id)
+    return list(self.session.exec(stmt.limit(EVICTION_BATCH_SIZE)).all())
+
+  def _evict(self, file: File, report: EvictionReport) -> None:
+    name, size = file.name, file.stored_size or file.size
+    links = self.file_links.repo.list_for_file(file.id)
+    for link in links:
+      self.file_links.repo.delete(link.job_id, link.file_id, link.role)
+    self.file_links.file_service.delete_file(file.id)
+
+    for job_id in sorted({link.job_id for link in links}):
+      self._invalidate(job_id, name)
+      if job_id not in report.invalidated_jobs:
+        report.invalidated_jobs.append(job_id)
+    report.evicted_files += 1
+    report.reclaimed_bytes += size
+
+  def _invalidate(self, job_id: str, evicted_name: str) -> None:
+    """Rebuild a job's result without the evicted output and drop its signature."""
+    job = self.job_service.get_job(job_id)
+    if not job:
+      return
+    previous = job.result or {}
+    result = self.file_links.build_result_payload(job_id, previous.get("summary"))
+    result["evicted"] = [*previous.get("evicted", []), evicted_name]
+    linked = self.file_links.list_files(job_id, role=JobFileRole.OUTPUT)
+    outputs = [file.name for file, _role in linked]
+    self.job_service.update_job(
+      job_id,
+      JobUpdate(signature=None, result=result, output_files=outputs),
+    )
+
+  def _tool_outputs(self, tool: str | None = None):
+    stmt = (
+      select(Job.tool, JobFile.file_id)
+      .join(Job, Job.id == JobFile.job_id)
+      .where(JobFile.role == JobFileRole.OUTPUT)
+      .distinct()
+    )
+    if tool is not None:
+      stmt = stmt.where(Job.tool == JobTool(tool))
+    return stmt
+
+  def _scope_bytes(self, scope: str, name: str | None) -> int:
+    if scope == "type":
+      return self._sum(File.type == name)
+    if scope == "tool":
+      return self._sum(File.id.in_(self._tool_outputs(name).with_only_columns(JobFile.file_id)))
+    return self._sum()
+
+  def _sum(self, *conditions) -> int:
+    stmt = select(func.coalesce(func.sum(DISK_BYTES), 0))
+    for condition in conditions:
+      stmt = stmt.where(condition)
+    result = self.session.exec(stmt).one()
+    return int(result[0] if isinstance(result, tuple) else result)
+
+
+def _scope_rows(scope: str, used: dict[str, int], quotas: dict[str, int]) -> list[StorageScopeRead]:
+  return [
+    StorageScopeRead(scope=scope, name=name, bytes=int(used.get(name) or 0), quota=quotas.get(name))
+    for name in sorted(set(used) | set(quotas))
+  ]
+
+
+def _tool_name(tool: JobTool | str) -> str:
+  return tool.value if isinstance(tool, JobTool) else str(tool)
@@ -11,6 +11,7 @@ from pydantic import BaseModel, ConfigDict
 from sqlmodel import Field, SQLModel
 
 from app.jobs.model import JobStatus, JobTool
+from app.utils.media import MediaInfo
 
 
 class JobCreate(SQLModel):
@@ -111,6 +112,33 @@ class JobsEnqueued(BaseModel):
   jobs: list[JobEnqueued]
 
 
+class StorageScopeRead(BaseModel):
+  """Bytes stored for one quota scope (total, a file type, or a tool)."""
+
+  scope: str
+  name: Optional[str] = None
+  bytes: int
+  quota: Optional[int] = None
+
+
+class StorageUsageRead(BaseModel):
+  """Storage usage broken down by file type and by tool, with quotas."""
+
+  total: StorageScopeRead
+  pinned_bytes: int
+  by_type: list[StorageScopeRead]
+  by_tool: list[StorageScopeRead]
+
+
+class EvictionReport(BaseModel):
+  """Outcome of one quota enforcement pass."""
+
+  evicted_files: int = 0
+  reclaimed_bytes: int = 0
+  invalidated_jobs: list[str] = []
+  over_quota: list[StorageScopeRead] = []
+
+
 @dataclass
 class JobOutputFile:
   """Descriptor for an output file produced by an executor."""
@@ -121,6 +149,9 @@ class JobOutputFile:
   format: str | None = None
   quality: str | int | None = None
   label: str | None = None
+  media: MediaInfo | None = None
+  checksum: str | None = None
+  size: int | None = None
 
 
 @dataclass
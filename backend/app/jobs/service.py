@@ -18,6 +18,7 @@ from app.jobs.model import Job, JobStatus, JobTool, _utcnow
 from app.jobs.repository import JobRepository
 from app.jobs.schemas import JobCreate, JobUpdate
 from app.utils.files import append_name_suffix
+from app.utils.media import MediaInfo
 
 
 class JobService:
@@ -385,6 +386,25 @@ class JobService:
     """
     return self.repo.list(tool=tool, status=status, offset=offset, limit=limit)
 
+  def inspect_input_media(self, job_id: str) -> MediaInfo | None:
+    """
+    Return the cached media inspection of a job's primary input.
+
+    Args:
+      job_id: Identifier of the job.
+
+    Returns:
+      The MediaInfo of the input file, or None when unavailable.
+    """
+    session = self.repo.session
+    input_file = JobFileService(session).get_primary_input(job_id)
+    if not input_file:
+      return None
+    try:
+      return FileService(session).inspect_media(input_file)
+    except Exception:
+      return None
+
   def find_signature_matches(self, signature: str) -> tuple[Optional[Job], Optional[Job]]:
     """
     Return (active_job, done_job) for the given signature if any exist.
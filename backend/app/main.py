@@ -1,6 +1,7 @@
 """Application entrypoint wiring FastAPI routes, worker, and executors."""
 
 import asyncio
+import os
 
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
@@ -8,19 +9,27 @@ from fastapi.responses import JSONResponse
 from app.db import engine, get_session, init_db
 from app.errors import AppError
 from app.files import router as files_router
+from app.files.gc import StorageGarbageCollector
+from app.files.uploads import UploadSessionService
 from app.jobs import router as jobs_router
 from app.jobs.events import job_event_bus
 from app.jobs.lifecycle import JobAbortReason, JobLifecycleService
-from app.jobs.model import JobTool
+from app.jobs.model import Job, JobTool
+from app.jobs.retention import StorageRetentionService
+from app.jobs.schemas import JobExecutionResult
+from app.jobs.service import JobService
 from app.tools.noxelizer.executor import NoxelizerExecutor
 from app.tools.noxelizer import router as noxelizer_router
 from app.tools.noxsongizer.executor import NoxsongizerExecutor
+from app.tools.noxsongizer.separation import BATCH_SIZE as SEPARATION_BATCH_SIZE, SeparationServer
 from app.tools.noxsongizer import router as noxsongizer_router
 from app.tools.noxtubizer.executor import NoxtubizerExecutor
 from app.tools.noxtubizer import router as noxtubizer_router
 from app.tools.noxtunizer.executor import NoxtunizerExecutor
 from app.tools.noxtunizer import router as noxtunizer_router
-from app.worker import JobWorker
+from app.tools.noxtunizer import service as noxtunizer_service
+from app.worker import CancellationToken, JobWorker
+from app.worker.resources import cpu_budget
 
 app = FastAPI(title="Noxtools API")
 
@@ -50,34 +59,75 @@ app.include_router(files_router.router)
 app.include_router(jobs_router.router)
 
 job_worker = JobWorker(engine)
+storage_gc = StorageGarbageCollector(engine)
 
-_noxsongizer_executor = NoxsongizerExecutor()
+_noxsongizer_threads = min(
+  int(os.getenv("NOXSONGIZER_THREADS", "0") or 0) or len(cpu_budget.cores),
+  len(cpu_budget.cores),
+)
+_separation_server = (
+  SeparationServer(threads=_noxsongizer_threads)
+  if os.getenv("NOXSONGIZER_ENGINE", "server").lower() == "server"
+  else None
+)
+_noxsongizer_executor = NoxsongizerExecutor(
+  server=_separation_server,
+  threads=_noxsongizer_threads,
+)
 _noxelizer_executor = NoxelizerExecutor()
 _noxtubizer_executor = NoxtubizerExecutor()
 _noxtunizer_executor = NoxtunizerExecutor()
 
-job_worker.register_executor(
+job_worker.register_batch_executor(
   JobTool.NOXSONGIZER,
-  lambda job, svc, token: _noxsongizer_executor.execute(job, cancel_token=token),
+  lambda jobs, svc: _noxsongizer_executor.execute_batch(
+    [(job, token, svc.inspect_input_media(job.id)) for job, token in jobs],
+  ),
+  batch_key=_noxsongizer_executor.batch_key,
+  max_batch=SEPARATION_BATCH_SIZE if _separation_server else 1,
 )
 job_worker.register_executor(
   JobTool.NOXELIZER,
-  lambda job, svc, token: _noxelizer_executor.execute(job, cancel_token=token),
+  lambda job, svc, token: _noxelizer_executor.execute(
+    job,
+    cancel_token=token,
+    input_media=svc.inspect_input_media(job.id),
+  ),
 )
 job_worker.register_executor(
   JobTool.NOXTUBIZER,
   lambda job, svc, token: _noxtubizer_executor.execute(job, cancel_token=token),
 )
-job_worker.register_executor(
-  JobTool.NOXTUNIZER,
-  lambda job, svc, token: _noxtunizer_executor.execute(job, cancel_token=token),
-)
+
+
+def _run_noxtunizer(job: Job, svc: JobService, token: CancellationToken) -> JobExecutionResult:
+  if noxtunizer_service.is_batch_job(job):
+    tracks = noxtunizer_service.batch_tracks(job, svc)
+    return _noxtunizer_executor.execute_batch(
+      job,
+      tracks=tracks,
+      cancel_token=token,
+      on_result=lambda file_id, summary: noxtunizer_service.record_analysis(file_id, summary, svc),
+      cached=noxtunizer_service.cached_analyses(job, [track.file_id for track in tracks], svc),
+    )
+  result = _noxtunizer_executor.execute(
+    job,
+    cancel_token=token,
+    input_media=svc.inspect_input_media(job.id),
+    cached=noxtunizer_service.cached_input_analysis(job, svc),
+  )
+  noxtunizer_service.record_input_analysis(job, result.summary, svc)
+  return result
+
+
+job_worker.register_executor(JobTool.NOXTUNIZER, _run_noxtunizer)
 
 
 @app.on_event("startup")
 def on_startup() -> None:
   """
-  Initialize database, recover orphan jobs, bind event loop, and start worker.
+  Initialize database, recover orphan jobs, bind event loop, and start the
+  worker and storage garbage collector.
   """
   init_db()
 
@@ -85,11 +135,16 @@ def on_startup() -> None:
   session = next(session_gen)
   try:
     JobLifecycleService(session).recover_running_jobs()
+    UploadSessionService(session).purge_expired()
+    StorageRetentionService(session).enforce()
   finally:
     session.close()
 
   job_event_bus.set_loop(asyncio.get_event_loop())
+  if _separation_server:
+    _separation_server.start()
   job_worker.start()
+  storage_gc.start()
 
 
 @app.on_event("shutdown")
@@ -105,3 +160,6 @@ def on_shutdown() -> None:
     session.close()
 
   job_worker.stop(wait=False, abort_running=False)
+  storage_gc.stop()
+  if _separation_server:
+    _separation_server.stop()
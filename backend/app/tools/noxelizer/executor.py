@@ -16,6 +16,7 @@ from app.errors import ExecutionError, StorageError
 from app.jobs.model import Job
 from app.jobs.schemas import JobExecutionResult, JobOutputFile
 from app.utils.files import append_name_suffix, ensure_path, safe_rmtree, safe_unlink, strip_known_suffix_from_stem
+from app.utils.media import MediaInfo
 from app.worker.cancellation import CancellationToken
 from app.worker.process import run_process
 
@@ -72,6 +73,7 @@ class NoxelizerExecutor:
     job: Job,
     *,
     cancel_token: CancellationToken | None = None,
+    input_media: MediaInfo | None = None,
   ) -> JobExecutionResult:
     if cancel_token:
       cancel_token.raise_if_cancelled()
@@ -84,7 +86,10 @@ class NoxelizerExecutor:
       missing_message="Input file is missing",
       not_found_message="Input file not found on disk",
     )
-    self._validate_input_file(input_file)
+    input_name = Path(job.input_filename or input_file.name)
+    self._validate_input_file(input_file, input_name)
+    if input_media and (input_media.width == 0 or input_media.height == 0):
+      raise ExecutionError("Invalid image dimensions")
 
     output_dir = Path(
       tempfile.mkdtemp(
@@ -93,7 +98,7 @@ class NoxelizerExecutor:
       )
     )
     try:
-      output_name = self._build_output_name(input_file)
+      output_name = self._build_output_name(input_name)
       final_path = output_dir / output_name
 
       tmp_path = self._create_temp_file(output_dir)
@@ -124,6 +129,8 @@ class NoxelizerExecutor:
           "duration": duration,
           "hold": final_hold,
           "codec": self.codec,
+          "source_width": input_media.width if input_media else None,
+          "source_height": input_media.height if input_media else None,
         },
         output_files=[
           JobOutputFile(
@@ -423,14 +430,14 @@ class NoxelizerExecutor:
         return default
     return default
 
-  def _validate_input_file(self, path: Path) -> None:
+  def _validate_input_file(self, path: Path, name: Path) -> None:
     if not path.exists():
       raise ExecutionError("Input file not found")
-    if path.suffix.lower() not in self.ALLOWED_EXTENSIONS:
-      raise ExecutionError(f"Unsupported image extension: {path.suffix}")
+    if name.suffix.lower() not in self.ALLOWED_EXTENSIONS:
+      raise ExecutionError(f"Unsupported image extension: {name.suffix}")
 
-  def _build_output_name(self, input_file: Path) -> str:
-    stem = strip_known_suffix_from_stem(input_file.stem or "noxelizer") or "noxelizer"
+  def _build_output_name(self, input_name: Path) -> str:
+    stem = strip_known_suffix_from_stem(input_name.stem or "noxelizer") or "noxelizer"
     return append_name_suffix(f"{stem}{self.suffix}", "pixelate", strip_known=True)
 
   def _normalize_suffix(self, suffix: str) -> str:
@@ -46,19 +46,31 @@ def download_source(
   if not input_file:
     raise NotFoundError("Source file not found")
 
-  path = file_links.file_service.resolve_path(input_file)
-  if not path.exists() or not path.is_file():
+  if not file_links.file_service.blob_path(input_file).is_file():
     raise NotFoundError("Source file not found")
 
   if variant:
-    rendered = build_image_variant(path, variant=variant)
+    path = file_links.file_service.resolve_path(input_file)
+    rendered = build_image_variant(path, variant=variant, name=input_file.name)
     if rendered:
       content, media_type = rendered
       return Response(content=content, media_type=media_type)
 
   label = file_links.get_label(job_id, input_file.id, JobFileRole.INPUT)
   download_name = build_download_name(input_file.name, label)
-  return file_response(path, filename=download_name)
+  lease = file_links.file_service.lease_blob(input_file)
+  if not lease:
+    raise NotFoundError("Source file not found")
+  file_links.file_service.mark_accessed(input_file)
+  return file_response(
+    lease.path,
+    filename=download_name,
+    codec=lease.codec,
+    size=input_file.size,
+    checksum=input_file.checksum,
+    on_close=lease.release,
+    thaw=lease.thaw,
+  )
 
 
 def download_output(job_id: str, filename: str, job_service: JobService):
@@ -70,11 +82,20 @@ def download_output(job_id: str, filename: str, job_service: JobService):
   outputs = file_links.list_files(job_id, role=JobFileRole.OUTPUT)
   for file, _role in outputs:
     if file.name == filename:
-      path = file_links.file_service.resolve_path(file)
-      if not path.exists():
-        break
       label = file_links.get_label(job_id, file.id, JobFileRole.OUTPUT)
       download_name = build_download_name(file.name, label)
-      return file_response(path, filename=download_name)
+      lease = file_links.file_service.lease_blob(file)
+      if not lease:
+        break
+      file_links.file_service.mark_accessed(file)
+      return file_response(
+        lease.path,
+        filename=download_name,
+        codec=lease.codec,
+        size=file.size,
+        checksum=file.checksum,
+        on_close=lease.release,
+        thaw=lease.thaw,
+      )
 
   raise NotFoundError("Output file not found")
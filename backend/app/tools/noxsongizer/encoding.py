@@ -0,0 +1,165 @@
+"""Stem output formats and parallel encoding for Noxsongizer."""
+
+from __future__ import annotations
+
+import os
+import wave
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+
+from app.errors import ExecutionError, ValidationError
+from app.utils.hashing import HashingWriter, hash_file
+from app.worker.cancellation import CancellationToken
+from app.worker.process import run_process
+
+STEM_FORMATS = ("wav", "flac", "mp3", "opus")
+DEFAULT_STEM_FORMAT = "wav"
+MP3_BITRATE_KBPS = 320
+OPUS_BITRATE_KBPS = 160
+MP3_CHUNK_FRAMES = 1152 * 256
+
+
+@dataclass(frozen=True)
+class EncodedStem:
+  """An encoded stem with the checksum computed by its encoding worker."""
+
+  path: Path
+  checksum: str
+  size: int
+
+
+def resolve_stem_format(name: str | None) -> str:
+  """Return a normalized stem format, falling back to the default."""
+  key = str(name or DEFAULT_STEM_FORMAT).strip().lower().lstrip(".")
+  if key not in STEM_FORMATS:
+    raise ValidationError(f"Output format must be one of: {', '.join(STEM_FORMATS)}")
+  return key
+
+
+def encode_stems(
+  paths: list[Path],
+  output_format: str,
+  *,
+  cancel_token: CancellationToken | None = None,
+  cores: list[int] | None = None,
+  max_workers: int | None = None,
+) -> list[EncodedStem]:
+  """
+  Encode WAV stems to `output_format` in parallel, one worker per stem.
+
+  With `cores` (reserved from the CoreBudget) the pool gets one worker per
+  core and ffmpeg encoders are pinned to them.
+
+  Each source WAV is removed once its encoded copy is written. Returns the
+  encoded stems in input order (the inputs unchanged for "wav"), each with
+  its SHA-256: MP3 is hashed as it is written, other outputs by the same
+  worker right after encoding, so storage never rereads them.
+
+  Raises:
+    ExecutionError: If an encoder fails.
+  """
+  if not paths:
+    return []
+
+  workers = max_workers or min(len(paths), len(cores) if cores else os.cpu_count() or 1)
+  with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="stem-encode") as pool:
+    futures = [
+      pool.submit(_encode_one, path, output_format, cancel_token, cores)
+      for path in paths
+    ]
+    return [future.result() for future in futures]
+
+
+def _encode_one(
+  source: Path,
+  output_format: str,
+  cancel_token: CancellationToken | None,
+  cores: list[int] | None,
+) -> EncodedStem:
+  if cancel_token:
+    cancel_token.raise_if_cancelled()
+
+  if output_format == "wav":
+    return EncodedStem(source, *hash_file(source))
+
+  target = source.with_suffix(f".{output_format}")
+  partial = target.with_name(f".partial_{target.name}")
+  try:
+    if output_format == "mp3":
+      checksum, size = _encode_mp3(source, partial, cancel_token)
+    else:
+      _encode_ffmpeg(source, partial, output_format, cancel_token, cores)
+      checksum, size = hash_file(partial)
+    partial.replace(target)
+  finally:
+    partial.unlink(missing_ok=True)
+
+  source.unlink(missing_ok=True)
+  return EncodedStem(target, checksum, size)
+
+
+def _encode_mp3(
+  source: Path,
+  target: Path,
+  cancel_token: CancellationToken | None,
+) -> tuple[str, int]:
+  """
+  Encode a 16-bit WAV with lameenc, streaming in fixed-size chunks; returns
+  the checksum and size of the written MP3.
+  """
+  try:
+    import lameenc
+  except ImportError as exc:
+    raise ExecutionError("lameenc is required for MP3 stems") from exc
+
+  with wave.open(str(source), "rb") as reader:
+    if reader.getsampwidth() != 2:
+      raise ExecutionError("MP3 encoding expects 16-bit PCM stems")
+    encoder = lameenc.Encoder()
+    encoder.set_bit_rate(MP3_BITRATE_KBPS)
+    encoder.set_in_sample_rate(reader.getframerate())
+    encoder.set_channels(reader.getnchannels())
+    encoder.set_quality(2)
+
+    with open(target, "wb") as handle:
+      fp = HashingWriter(handle)
+      while True:
+        if cancel_token:
+          cancel_token.raise_if_cancelled()
+        frames = reader.readframes(MP3_CHUNK_FRAMES)
+        if not frames:
+          break
+        fp.write(encoder.encode(frames))
+      fp.write(encoder.flush())
+  return fp.checksum, fp.size
+
+
+def _encode_ffmpeg(
+  source: Path,
+  target: Path,
+  output_format: str,
+  cancel_token: CancellationToken | None,
+  cores: list[int] | None,
+) -> None:
+  codec_args = {
+    "flac": ["-c:a", "flac", "-compression_level", "5"],
+    "opus": ["-c:a", "libopus", "-b:a", f"{OPUS_BITRATE_KBPS}k"],
+  }[output_format]
+  run_process(
+    [
+      "ffmpeg",
+      "-y",
+      "-v",
+      "error",
+      "-nostdin",
+      "-i",
+      str(source),
+      *codec_args,
+      "-f",
+      "ogg" if output_format == "opus" else output_format,
+      str(target),
+    ],
+    cancel_token=cancel_token,
+    cpu_affinity=cores,
+  )
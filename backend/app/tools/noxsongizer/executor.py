@@ -4,15 +4,45 @@ from __future__ import annotations
 
 import shutil
 import tempfile
+import time
+from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
 from typing import List
 
-from app.errors import ExecutionError
+from app.errors import ExecutionError, ValidationError
+from app.jobs.events import JobEvent, job_event_bus
 from app.jobs.model import Job
 from app.jobs.schemas import JobExecutionResult, JobOutputFile
+from app.tools.noxsongizer.encoding import encode_stems, resolve_stem_format
+from app.tools.noxsongizer.profiles import (
+  DEFAULT_PROFILE,
+  TWO_STEMS_SOURCE,
+  SeparationProfile,
+  resolve_profile,
+)
+from app.tools.noxsongizer.separation import SeparationItem, SeparationServer
 from app.utils.files import ensure_path, safe_rmtree, strip_known_suffix_from_stem
-from app.worker.cancellation import CancellationToken
+from app.utils.media import MediaInfo
+from app.utils.threads import thread_env
+from app.worker.cancellation import CancellationGroup, CancellationToken
 from app.worker.process import run_process
+from app.worker.resources import CoreBudget, cpu_budget
+
+
+@dataclass
+class _SeparationTask:
+  """A prepared Noxsongizer job waiting for (or done with) separation."""
+
+  job: Job
+  cancel_token: CancellationToken | None
+  input_media: MediaInfo | None
+  profile: SeparationProfile
+  two_stems: bool
+  output_format: str
+  input_file: Path
+  output_dir: Path
+  started: float
 
 
 class NoxsongizerExecutor:
@@ -25,94 +55,292 @@ class NoxsongizerExecutor:
   Output policy:
     Work artifacts live in a temporary directory and outputs are moved into
     the File storage by the job lifecycle.
+
+  The Demucs model, shifts and overlap come from the job's `profile` param
+  (fast, balanced, standard, best; "standard" by default); `two_stems`
+  yields vocals + accompaniment only; `output_format` (wav, flac, mp3, opus)
+  picks the stem encoding.
+  When a SeparationServer is provided, jobs are sent to its warm model process
+  instead of spawning the Demucs CLI.
+
+  Separation reserves up to `threads` cores from the shared CoreBudget (all
+  budgeted cores by default), pins the model process to them and caps its
+  thread pools accordingly; concurrent heavy jobs wait for free cores. Stem
+  encoding likewise runs one worker per reserved core.
+
+  `execute_batch` separates several queued jobs of the same profile in one
+  SeparationServer request, then encodes and packages each job on its own.
   """
 
   def __init__(
     self,
     *,
     demucs_bin: str = "demucs",
-    demucs_model: str = "htdemucs_ft",
+    default_profile: str = DEFAULT_PROFILE,
     work_root: Path | None = None,
+    server: SeparationServer | None = None,
+    threads: int | None = None,
+    budget: CoreBudget = cpu_budget,
   ) -> None:
     self.demucs_bin = demucs_bin
-    self.demucs_model = demucs_model
+    self.threads = threads
+    self.budget = budget
+    self.default_profile = default_profile
     self.work_root = work_root
+    self.server = server
+
+  def batch_key(self, job: Job) -> str | None:
+    """Jobs sharing a profile can be separated in one model session."""
+    try:
+      return resolve_profile((job.params or {}).get("profile") or self.default_profile).name
+    except ValidationError:
+      return None
 
   def execute(
     self,
     job: Job,
     *,
     cancel_token: CancellationToken | None = None,
+    input_media: MediaInfo | None = None,
   ) -> JobExecutionResult:
+    [outcome] = self.execute_batch([(job, cancel_token, input_media)])
+    if isinstance(outcome, BaseException):
+      raise outcome
+    return outcome
+
+  def execute_batch(
+    self,
+    items: list[tuple[Job, CancellationToken | None, MediaInfo | None]],
+  ) -> list[JobExecutionResult | Exception]:
+    """
+    Separate several jobs, sharing one model session per profile.
+
+    Returns one result or exception per item, in order; a failing job does
+    not fail the rest of its batch.
+    """
+    outcomes: list[JobExecutionResult | Exception | None] = [None] * len(items)
+    groups: dict[str, list[tuple[int, _SeparationTask]]] = {}
+    for index, (job, cancel_token, input_media) in enumerate(items):
+      try:
+        task = self._prepare(job, cancel_token, input_media)
+      except Exception as exc:
+        outcomes[index] = exc
+        continue
+      groups.setdefault(task.profile.name, []).append((index, task))
+
+    for group in groups.values():
+      tasks = [task for _index, task in group]
+      profile = tasks[0].profile
+      tokens = [task.cancel_token for task in tasks if task.cancel_token]
+      group_token = CancellationGroup(tokens) if tokens else None
+      try:
+        with self.budget.reserve(self.threads, cancel_token=group_token) as cores:
+          separation_started = time.perf_counter()
+          errors = self._run_demucs(tasks, profile=profile, cores=cores, cancel_token=group_token)
+        separation_seconds = time.perf_counter() - separation_started
+      except Exception as exc:
+        for index, task in group:
+          safe_rmtree(task.output_dir)
+          outcomes[index] = exc
+        continue
+
+      for (index, task), error in zip(group, errors):
+        try:
+          if task.cancel_token:
+            task.cancel_token.raise_if_cancelled()
+          if error:
+            raise error
+          outcomes[index] = self._finalize(
+            task,
+            threads=len(cores),
+            batch_size=len(tasks),
+            separation_seconds=separation_seconds,
+          )
+        except Exception as exc:
+          safe_rmtree(task.output_dir)
+          outcomes[index] = exc
+
+    return [outcome or ExecutionError("Noxsongizer job was not executed") for outcome in outcomes]
+
+  def _prepare(
+    self,
+    job: Job,
+    cancel_token: CancellationToken | None,
+    input_media: MediaInfo | None,
+  ) -> _SeparationTask:
     if cancel_token:
       cancel_token.raise_if_cancelled()
 
+    started = time.perf_counter()
+    params = job.params or {}
     input_file = ensure_path(
       job.input_path,
       missing_message="Input file is missing",
       not_found_message="Input file not found on disk",
     )
-    output_dir = Path(
-      tempfile.mkdtemp(
-        prefix="noxsongizer_",
-        dir=str(self.work_root) if self.work_root else None,
-      )
+    task = _SeparationTask(
+      job=job,
+      cancel_token=cancel_token,
+      input_media=input_media,
+      profile=resolve_profile(params.get("profile") or self.default_profile),
+      two_stems=bool(params.get("two_stems")),
+      output_format=resolve_stem_format(params.get("output_format")),
+      input_file=input_file,
+      output_dir=Path(
+        tempfile.mkdtemp(
+          prefix="noxsongizer_",
+          dir=str(self.work_root) if self.work_root else None,
+        )
+      ),
+      started=started,
     )
-    try:
-      input_stem = strip_known_suffix_from_stem(input_file.stem or "output") or "output"
+    return task
+
+  def _finalize(
+    self,
+    task: _SeparationTask,
+    *,
+    threads: int,
+    batch_size: int,
+    separation_seconds: float,
+  ) -> JobExecutionResult:
+    if task.cancel_token:
+      task.cancel_token.raise_if_cancelled()
 
-      self._run_demucs(input_file, output_dir, cancel_token=cancel_token)
+    output_dir = task.output_dir
+    input_file = task.input_file
+    profile = task.profile
+    input_name = Path(task.job.input_filename or input_file.name)
+    input_stem = strip_known_suffix_from_stem(input_name.stem or "output") or "output"
 
-      demucs_output = self._locate_outputs(output_dir, input_file)
-      if not demucs_output:
-        raise ExecutionError("Demucs output folder not found")
+    demucs_output = self._locate_outputs(output_dir, input_file, profile.model)
+    if not demucs_output:
+      raise ExecutionError("Demucs output folder not found")
 
-      stems = self._move_stems(demucs_output, output_dir, input_stem)
-      if not stems:
-        raise ExecutionError("No stems generated by Demucs")
+    stems = self._move_stems(demucs_output, output_dir, input_stem)
+    if not stems:
+      raise ExecutionError("No stems generated by Demucs")
 
-      self._cleanup_demucs_tree(output_dir)
+    self._cleanup_demucs_tree(output_dir, profile.model)
 
-      stem_labels = [stem for stem, _filename, _label in stems]
-      output_files = [
-        JobOutputFile(
-          path=output_dir / filename,
-          type="audio",
-          name=filename,
-          format=(Path(filename).suffix.lstrip(".") or None),
-          label=label,
-        )
-        for _stem, filename, label in stems
-      ]
+    encoding_started = time.perf_counter()
+    with self.budget.reserve(len(stems), cancel_token=task.cancel_token) as cores:
+      encoded = encode_stems(
+        [output_dir / filename for _stem, filename, _label in stems],
+        task.output_format,
+        cancel_token=task.cancel_token,
+        cores=cores,
+      )
+    encoding_seconds = time.perf_counter() - encoding_started
 
-      return JobExecutionResult(
-        summary={"stems": stem_labels},
-        output_files=output_files,
-        cleanup_paths=[output_dir],
+    stem_labels = [stem for stem, _filename, _label in stems]
+    output_files = [
+      JobOutputFile(
+        path=item.path,
+        type="audio",
+        name=item.path.name,
+        format=(item.path.suffix.lstrip(".") or None),
+        label=label,
+        checksum=item.checksum,
+        size=item.size,
       )
-    except Exception:
-      safe_rmtree(output_dir)
-      raise
+      for (_stem, _filename, label), item in zip(stems, encoded)
+    ]
+
+    input_media = task.input_media
+    return JobExecutionResult(
+      summary={
+        "stems": stem_labels,
+        "profile": profile.name,
+        "model": profile.model,
+        "two_stems": task.two_stems,
+        "threads": threads,
+        "batch_size": batch_size,
+        "output_format": task.output_format,
+        "timings": {
+          "separation_seconds": round(separation_seconds, 2),
+          "encoding_seconds": round(encoding_seconds, 2),
+          "total_seconds": round(time.perf_counter() - task.started, 2),
+        },
+        "sample_rate": input_media.sample_rate if input_media else None,
+        "duration": input_media.duration if input_media else None,
+      },
+      output_files=output_files,
+      cleanup_paths=[output_dir],
+    )
 
   def _run_demucs(
     self,
-    input_file: Path,
-    output_dir: Path,
+    tasks: list[_SeparationTask],
     *,
+    profile: SeparationProfile,
+    cores: list[int],
     cancel_token: CancellationToken | None,
-  ) -> None:
-    cmd = [
-      self.demucs_bin,
-      "-n",
-      self.demucs_model,
-      "-o",
-      str(output_dir),
-      str(input_file),
-    ]
-    run_process(cmd, cancel_token=cancel_token)
+  ) -> list[Exception | None]:
+    """Separate all tasks; returns a per-task error (or None)."""
+    if self.server:
+      errors = self.server.separate_batch(
+        [
+          SeparationItem(
+            task.input_file,
+            task.output_dir,
+            two_stems=task.two_stems,
+            on_progress=partial(self._emit_progress, task.job.id),
+            cancel_token=task.cancel_token,
+          )
+          for task in tasks
+        ],
+        profile=profile,
+        cores=cores,
+        cancel_token=cancel_token,
+      )
+      return [ExecutionError(error) if error else None for error in errors]
+
+    results: list[Exception | None] = []
+    for task in tasks:
+      cmd = [
+        self.demucs_bin,
+        "-n",
+        profile.model,
+        "--shifts",
+        str(profile.shifts),
+        "--overlap",
+        str(profile.overlap),
+        "-o",
+        str(task.output_dir),
+      ]
+      if task.two_stems:
+        cmd.extend(["--two-stems", TWO_STEMS_SOURCE])
+      cmd.append(str(task.input_file))
+      try:
+        run_process(
+          cmd,
+          cancel_token=task.cancel_token,
+          env=thread_env(len(cores)),
+          cpu_affinity=cores,
+        )
+        results.append(None)
+      except Exception as exc:
+        results.append(exc)
+    return results
+
+  def _emit_progress(self, job_id: str | None, current: int, total: int) -> None:
+    if not job_id:
+      return
+    job_event_bus.publish_sync(
+      JobEvent(
+        type="job_progress",
+        payload={
+          "job_id": job_id,
+          "stage": "separation",
+          "current": current,
+          "total": total,
+        },
+      )
+    )
 
-  def _locate_outputs(self, output_dir: Path, input_file: Path) -> Path | None:
-    model_dir = output_dir / self.demucs_model
+  def _locate_outputs(self, output_dir: Path, input_file: Path, model: str) -> Path | None:
+    model_dir = output_dir / model
     if not model_dir.exists():
       return None
 
@@ -146,7 +374,8 @@ class NoxsongizerExecutor:
     return stems
 
   def _stem_key_for_stem(self, stem_name: str) -> str:
-    return stem_name.strip().lower()
+    key = stem_name.strip().lower()
+    return "accompaniment" if key == "no_vocals" else key
 
   def _label_for_stem(self, stem_name: str) -> str:
     mapping = {
@@ -154,16 +383,17 @@ class NoxsongizerExecutor:
       "other": "Other",
       "bass": "Bass",
       "drums": "Drums",
+      "no_vocals": "Accompaniment",
     }
     return mapping.get(stem_name.lower(), stem_name.title())
 
-  def _cleanup_demucs_tree(self, output_dir: Path) -> None:
+  def _cleanup_demucs_tree(self, output_dir: Path, model: str) -> None:
     """
     Demucs writes under:
       <job_dir>/<model>/<track>/*
     Once stems are moved to <job_dir>/, we can delete <job_dir>/<model>/ safely.
     """
-    path = output_dir / self.demucs_model
+    path = output_dir / model
     try:
       if path.exists():
         shutil.rmtree(path)
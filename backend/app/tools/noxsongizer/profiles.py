@@ -0,0 +1,40 @@
+"""Speed/quality separation profiles for Noxsongizer."""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+
+from app.errors import ValidationError
+
+
+@dataclass(frozen=True)
+class SeparationProfile:
+  """Demucs settings applied to a Noxsongizer job."""
+
+  name: str
+  model: str
+  shifts: int
+  overlap: float
+
+
+# "standard" is what Noxsongizer always ran (htdemucs_ft with Demucs'
+# default shifts/overlap); "best" roughly triples the cost and is opt-in.
+PROFILES: dict[str, SeparationProfile] = {
+  "fast": SeparationProfile(name="fast", model="htdemucs", shifts=0, overlap=0.1),
+  "balanced": SeparationProfile(name="balanced", model="htdemucs", shifts=1, overlap=0.25),
+  "standard": SeparationProfile(name="standard", model="htdemucs_ft", shifts=1, overlap=0.25),
+  "best": SeparationProfile(name="best", model="htdemucs_ft", shifts=2, overlap=0.5),
+}
+DEFAULT_PROFILE = "standard"
+
+TWO_STEMS_SOURCE = "vocals"
+TWO_STEMS_REST = "no_vocals"
+
+
+def resolve_profile(name: str | None) -> SeparationProfile:
+  """Return the profile for a name, falling back to the default."""
+  key = str(name or DEFAULT_PROFILE).strip().lower()
+  profile = PROFILES.get(key)
+  if not profile:
+    raise ValidationError(f"Profile must be one of: {', '.join(PROFILES)}")
+  return profile
@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from typing import Optional
+
 from fastapi import APIRouter, Depends, File, Form, UploadFile
 from fastapi.responses import FileResponse
 from sqlmodel import Session
@@ -35,10 +37,19 @@ def health() -> dict:
 async def create_job(
   files: list[UploadFile] = File(default=[]),
   file_ids: list[str] | None = Form(default=None),
+  profile: Optional[str] = Form(None),
+  two_stems: Optional[bool] = Form(None),
+  output_format: Optional[str] = Form(None),
   job_service: JobService = Depends(get_job_service),
 ) -> JobsEnqueued:
-  """Create Noxsongizer jobs."""
-  payload = NoxsongizerJobRequest(files=files, file_ids=file_ids or [])
+  """Create Noxsongizer jobs (profile: fast, balanced, standard or best; output_format: wav, flac, mp3 or opus)."""
+  payload = NoxsongizerJobRequest(
+    files=files,
+    file_ids=file_ids or [],
+    profile=profile,
+    two_stems=two_stems,
+    output_format=output_format,
+  )
   params = validate_noxsongizer_request(payload)
   jobs = enqueue_noxsongizer_jobs(params, job_service)
   return JobsEnqueued(
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
 from fastapi import UploadFile
 from pydantic import BaseModel, ConfigDict, Field
@@ -13,5 +13,8 @@ class NoxsongizerJobRequest(BaseModel):
 
   files: List[UploadFile] = Field(default_factory=list)
   file_ids: List[str] = Field(default_factory=list)
+  profile: Optional[str] = None
+  two_stems: Optional[bool] = None
+  output_format: Optional[str] = None
 
   model_config = ConfigDict(arbitrary_types_allowed=True)
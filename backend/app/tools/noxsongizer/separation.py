@@ -0,0 +1,685 @@
+"""Long-lived Demucs separation server for Noxsongizer."""
+
+from __future__ import annotations
+
+import math
+import multiprocessing as mp
+import os
+import queue
+import subprocess
+import threading
+import wave
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable
+from uuid import uuid4
+
+import numpy as np
+
+from app.errors import ExecutionError
+from app.tools.noxsongizer.profiles import TWO_STEMS_REST, TWO_STEMS_SOURCE, SeparationProfile
+from app.utils.threads import thread_env
+from app.worker.cancellation import CancellationToken, JobCancelled
+
+POLL_SECONDS = 0.5
+STARTUP_TIMEOUT_SECONDS = 600
+STOP_TIMEOUT_SECONDS = 5
+SEGMENT_SECONDS = float(os.getenv("NOXSONGIZER_SEGMENT_SECONDS", "120"))
+CROSSFADE_SECONDS = float(os.getenv("NOXSONGIZER_CROSSFADE_SECONDS", "2"))
+BATCH_SIZE = max(1, int(os.getenv("NOXSONGIZER_BATCH_SIZE", "4")))
+STATS_BLOCK_FRAMES = 1024 * 1024
+CANCELLED_MESSAGE = "Cancelled"
+
+ProgressCallback = Callable[[int, int], None]
+
+
+@dataclass(frozen=True)
+class SeparationItem:
+  """A track to separate as part of a batch."""
+
+  input_path: Path
+  output_dir: Path
+  two_stems: bool = False
+  on_progress: ProgressCallback | None = None
+  cancel_token: CancellationToken | None = None
+
+
+@dataclass(frozen=True)
+class SeparationRequest:
+  """A single track sent to the model process."""
+
+  request_id: str
+  input_path: str
+  output_dir: str
+  two_stems: bool = False
+
+
+@dataclass(frozen=True)
+class SeparationBatch:
+  """Tracks separated together with one model and shared settings."""
+
+  batch_id: str
+  model: str
+  requests: tuple[SeparationRequest, ...]
+  shifts: int = 1
+  overlap: float = 0.25
+  segment_seconds: float = SEGMENT_SECONDS
+  crossfade_seconds: float = CROSSFADE_SECONDS
+  batch_size: int = BATCH_SIZE
+  cores: tuple[int, ...] = ()
+
+  @classmethod
+  def from_payload(cls, payload: dict[str, Any]) -> SeparationBatch:
+    requests = tuple(SeparationRequest(**item) for item in payload.get("requests", ()))
+    return cls(**{**payload, "requests": requests})
+
+
+class SeparationServer:
+  """
+  Keeps Demucs models loaded in a dedicated child process.
+
+  The child imports torch and loads each model once (the `preload` models at
+  startup, others on first use); each job is then a queue round-trip and only
+  pays for inference. Cancelling a job terminates the
+  child (inference cannot be interrupted in-process) and a crashed or killed
+  child is restarted lazily on the next request. In a batch, a cancelled
+  track is instead dropped at the next segment boundary (through a control
+  queue) while the others carry on; the child is only terminated once every
+  track is cancelled.
+
+  Tracks are decoded, separated and written segment by segment (with a short
+  crossfade between segments), so memory is bounded by the segment size rather
+  than the track length. Outputs mirror the Demucs CLI layout:
+  `<output_dir>/<model>/<track>/*.wav`.
+
+  `separate_batch` runs several tracks in one request: segments at the same
+  position in each track are stacked (up to `batch_size`) into a single
+  batched inference call.
+
+  OpenMP/MKL pools are capped to `threads` when the child starts; each
+  request then pins the child to its reserved cores and sizes torch's intra-op
+  pool to match, so the model never spills onto cores kept for the API.
+  """
+
+  def __init__(
+    self,
+    *,
+    preload: tuple[str, ...] = ("htdemucs_ft",),
+    threads: int | None = None,
+  ) -> None:
+    self.preload = preload
+    self.threads = threads or (os.cpu_count() or 1)
+    self._ctx = mp.get_context("spawn")
+    self._lock = threading.Lock()
+    self._process: mp.process.BaseProcess | None = None
+    self._requests: Any = None
+    self._responses: Any = None
+    self._controls: Any = None
+    self._ready = False
+
+  @property
+  def running(self) -> bool:
+    return self._process is not None and self._process.is_alive()
+
+  def start(self) -> None:
+    """Spawn the model process if needed (model loading happens in the child)."""
+    with self._lock:
+      self._ensure_process()
+
+  def stop(self) -> None:
+    """Stop the model process."""
+    with self._lock:
+      self._shutdown_process(graceful=True)
+
+  def separate(
+    self,
+    input_path: Path,
+    output_dir: Path,
+    *,
+    profile: SeparationProfile,
+    two_stems: bool = False,
+    cores: list[int] | None = None,
+    cancel_token: CancellationToken | None = None,
+    on_progress: ProgressCallback | None = None,
+  ) -> None:
+    """
+    Separate a track into stems using a warm model.
+
+    `cores` pins inference to a core set (see CoreBudget);
+    `on_progress(current, total)` is called after each processed segment.
+
+    Raises:
+      JobCancelled: If the token is cancelled while waiting.
+      ExecutionError: If the model process fails or crashes.
+    """
+    [error] = self.separate_batch(
+      [SeparationItem(input_path, output_dir, two_stems=two_stems, on_progress=on_progress)],
+      profile=profile,
+      cores=cores,
+      cancel_token=cancel_token,
+    )
+    if error:
+      raise ExecutionError(error)
+
+  def separate_batch(
+    self,
+    items: list[SeparationItem],
+    *,
+    profile: SeparationProfile,
+    cores: list[int] | None = None,
+    cancel_token: CancellationToken | None = None,
+  ) -> list[str | None]:
+    """
+    Separate several tracks in one model session.
+
+    Returns one entry per item: None on success, otherwise the error message
+    for that track (other tracks of the batch are unaffected). A track whose
+    `SeparationItem.cancel_token` is cancelled is dropped from the running
+    batch and reported with an error.
+
+    Raises:
+      JobCancelled: If the token is cancelled while waiting.
+      ExecutionError: If the model process fails or crashes.
+    """
+    requests = tuple(
+      SeparationRequest(
+        request_id=str(uuid4()),
+        input_path=str(item.input_path),
+        output_dir=str(item.output_dir),
+        two_stems=item.two_stems,
+      )
+      for item in items
+    )
+    callbacks = {
+      request.request_id: item.on_progress
+      for request, item in zip(requests, items)
+      if item.on_progress
+    }
+    batch = SeparationBatch(
+      batch_id=str(uuid4()),
+      model=profile.model,
+      requests=requests,
+      shifts=profile.shifts,
+      overlap=profile.overlap,
+      cores=tuple(cores or ()),
+    )
+
+    members = {
+      request.request_id: item.cancel_token
+      for request, item in zip(requests, items)
+      if item.cancel_token
+    }
+    dropped: set[str] = set()
+
+    def _dispatch(message: dict[str, Any]) -> None:
+      callback = callbacks.get(message.get("item"))
+      if callback:
+        callback(*message["progress"])
+
+    def _drop_cancelled() -> None:
+      for request_id, token in members.items():
+        if request_id not in dropped and token.cancelled:
+          dropped.add(request_id)
+          self._controls.put({"batch_id": batch.batch_id, "drop": request_id})
+      if members and len(dropped) == len(requests):
+        self._shutdown_process()
+        raise JobCancelled()
+
+    with self._lock:
+      self._ensure_process()
+      self._wait_ready(cancel_token)
+      self._requests.put(asdict(batch))
+      response = self._wait_for(
+        batch.batch_id,
+        cancel_token,
+        on_progress=_dispatch,
+        on_poll=_drop_cancelled,
+      )
+
+    if not response.get("ok"):
+      raise ExecutionError(response.get("error") or "Demucs separation failed")
+    errors = response.get("errors") or {}
+    return [errors.get(request.request_id) for request in requests]
+
+  def _ensure_process(self) -> None:
+    if self.running:
+      return
+    self._shutdown_process()
+    self._requests = self._ctx.Queue()
+    self._responses = self._ctx.Queue()
+    self._controls = self._ctx.Queue()
+    self._ready = False
+    self._process = self._ctx.Process(
+      target=_serve,
+      args=(self.preload, self.threads, self._requests, self._responses, self._controls),
+      name="demucs-server",
+      daemon=True,
+    )
+    self._process.start()
+
+  def _wait_ready(self, cancel_token: CancellationToken | None) -> None:
+    if self._ready:
+      return
+    response = self._wait_for("ready", cancel_token, timeout=STARTUP_TIMEOUT_SECONDS)
+    if not response.get("ok"):
+      self._shutdown_process()
+      raise ExecutionError(response.get("error") or "Demucs model failed to load")
+    self._ready = True
+
+  def _wait_for(
+    self,
+    request_id: str,
+    cancel_token: CancellationToken | None,
+    *,
+    timeout: float | None = None,
+    on_progress: Callable[[dict[str, Any]], None] | None = None,
+    on_poll: Callable[[], None] | None = None,
+  ) -> dict[str, Any]:
+    waited = 0.0
+    while True:
+      if cancel_token and cancel_token.cancelled:
+        self._shutdown_process()
+        raise JobCancelled()
+      if on_poll:
+        on_poll()
+
+      try:
+        response = self._responses.get(timeout=POLL_SECONDS)
+      except queue.Empty:
+        waited += POLL_SECONDS
+        if not self.running:
+          self._shutdown_process()
+          raise ExecutionError("Demucs model process exited unexpectedly")
+        if timeout is not None and waited >= timeout:
+          self._shutdown_process()
+          raise ExecutionError("Timed out waiting for the Demucs model process")
+        continue
+
+      if response.get("request_id") != request_id:
+        continue
+      if "progress" in response:
+        if on_progress:
+          try:
+            on_progress(response)
+          except Exception:
+            pass
+        continue
+      return response
+
+  def _shutdown_process(self, *, graceful: bool = False) -> None:
+    process = self._process
+    self._process = None
+    self._ready = False
+    if process is None:
+      return
+    try:
+      if graceful and process.is_alive():
+        self._requests.put(None)
+        process.join(timeout=STOP_TIMEOUT_SECONDS)
+      if process.is_alive():
+        process.terminate()
+        process.join(timeout=STOP_TIMEOUT_SECONDS)
+      if process.is_alive():
+        process.kill()
+    except Exception:
+      pass
+
+
+def _serve(
+  preload: tuple[str, ...],
+  threads: int,
+  requests: Any,
+  responses: Any,
+  controls: Any,
+) -> None:
+  """Child process entrypoint: load models once, then serve requests."""
+  # Must happen before torch is imported for OpenMP/MKL to honour it.
+  os.environ.update(thread_env(threads))
+  models: dict[str, Any] = {}
+  try:
+    _configure_torch(threads)
+    for model_name in preload:
+      models[model_name] = _load_model(model_name)
+  except Exception as exc:
+    responses.put({"request_id": "ready", "ok": False, "error": str(exc)})
+    return
+  responses.put({"request_id": "ready", "ok": True})
+
+  while True:
+    payload = requests.get()
+    if payload is None:
+      return
+    batch = SeparationBatch.from_payload(payload)
+    try:
+      _apply_cores(batch.cores, threads)
+      if batch.model not in models:
+        models[batch.model] = _load_model(batch.model)
+      errors = _separate_batch(
+        models[batch.model],
+        batch,
+        controls=controls,
+        on_progress=lambda item, current, total, batch_id=batch.batch_id: responses.put(
+          {"request_id": batch_id, "item": item, "progress": (current, total)}
+        ),
+      )
+      responses.put({"request_id": batch.batch_id, "ok": True, "errors": errors})
+    except Exception as exc:
+      responses.put({"request_id": batch.batch_id, "ok": False, "error": str(exc)})
+
+
+def _configure_torch(threads: int) -> None:
+  import torch
+
+  torch.set_num_threads(max(1, threads))
+  try:
+    torch.set_num_interop_threads(1)
+  except RuntimeError:
+    pass
+
+
+def _apply_cores(cores: tuple[int, ...], threads: int) -> None:
+  """Pin the model process to `cores` and size torch's pool to match."""
+  import torch
+
+  if cores and hasattr(os, "sched_setaffinity"):
+    try:
+      os.sched_setaffinity(0, set(cores))
+    except OSError:
+      pass
+  torch.set_num_threads(max(1, min(threads, len(cores) or threads)))
+
+
+def _load_model(model_name: str) -> Any:
+  from demucs.pretrained import get_model
+
+  model = get_model(model_name)
+  model.cpu()
+  model.eval()
+  return model
+
+
+class _TrackState:
+  """Per-track decode/crossfade/write state while a batch is separated."""
+
+  def __init__(self, model: Any, request: SeparationRequest, batch: SeparationBatch) -> None:
+    self.request_id = request.request_id
+    self.input_path = Path(request.input_path)
+    self.two_stems = request.two_stems
+    self.sources = list(model.sources)
+    self.samplerate = model.samplerate
+    self.channels = model.audio_channels
+
+    self.total_frames, self.mean, self.std = _stream_stats(
+      self.input_path,
+      self.samplerate,
+      self.channels,
+    )
+    if self.total_frames == 0:
+      raise RuntimeError("Input audio is empty")
+
+    self.segment = max(1, int(batch.segment_seconds * self.samplerate))
+    self.crossfade = min(self.segment, max(0, int(batch.crossfade_seconds * self.samplerate)))
+    self.total_segments = math.ceil(self.total_frames / self.segment)
+    self.fade_in = np.linspace(0.0, 1.0, self.crossfade, dtype=np.float32)
+    self.index = 0
+    self.tails: dict[str, np.ndarray] = {}
+
+    track_dir = Path(request.output_dir) / batch.model / self.input_path.stem
+    track_dir.mkdir(parents=True, exist_ok=True)
+    stem_names = [TWO_STEMS_SOURCE, TWO_STEMS_REST] if self.two_stems else self.sources
+    self.writers = {
+      name: _StemWriter(track_dir / f"{name}.wav", self.samplerate, self.channels)
+      for name in stem_names
+    }
+
+  @property
+  def done(self) -> bool:
+    return self.index >= self.total_segments
+
+  def next_window(self) -> np.ndarray:
+    """Decode and normalize the next segment (plus crossfade)."""
+    window = _decode_window(
+      self.input_path,
+      self.samplerate,
+      self.channels,
+      self.index * self.segment,
+      self.segment + self.crossfade,
+    )
+    if window.shape[1] == 0:
+      self.index = self.total_segments
+    return (window - self.mean) / self.std
+
+  def write(self, separated: np.ndarray) -> None:
+    """Write one separated window of shape (sources, channels, n)."""
+    stems = {
+      name: source * self.std + self.mean for name, source in zip(self.sources, separated)
+    }
+    if self.two_stems:
+      vocals = stems.pop(TWO_STEMS_SOURCE)
+      stems = {TWO_STEMS_SOURCE: vocals, TWO_STEMS_REST: sum(stems.values())}
+
+    is_last = self.index == self.total_segments - 1
+    fade_in = self.fade_in
+    for name, audio in stems.items():
+      audio = audio.copy()
+      tail = self.tails.pop(name, None)
+      if tail is not None:
+        width = min(tail.shape[1], audio.shape[1])
+        audio[:, :width] = audio[:, :width] * fade_in[:width] + tail[:, :width] * (1 - fade_in[:width])
+      if is_last or audio.shape[1] <= self.segment:
+        self.writers[name].write(audio)
+      else:
+        self.writers[name].write(audio[:, :self.segment])
+        self.tails[name] = audio[:, self.segment:]
+    self.index += 1
+
+  def close(self) -> None:
+    for writer in self.writers.values():
+      writer.close()
+
+  def abort(self) -> None:
+    """Stop writing and drop the partial stems."""
+    for writer in self.writers.values():
+      writer.abort()
+
+
+def _separate_batch(
+  model: Any,
+  batch: SeparationBatch,
+  *,
+  controls: Any = None,
+  on_progress: Callable[[str, int, int], None],
+) -> dict[str, str]:
+  """
+  Separate a batch of tracks segment by segment with crossfaded overlap-add.
+
+  Windows from different tracks are zero-padded to a common length and run
+  through Demucs together. Returns error messages keyed by request id for
+  tracks that could not be decoded or were dropped (cancelled) through
+  `controls`; inference errors fail the whole batch.
+  """
+  import torch
+  from demucs.apply import apply_model
+
+  errors: dict[str, str] = {}
+  tracks: list[_TrackState] = []
+  for request in batch.requests:
+    try:
+      tracks.append(_TrackState(model, request, batch))
+    except Exception as exc:
+      errors[request.request_id] = str(exc)
+
+  try:
+    while True:
+      for request_id in _drained_drops(controls, batch.batch_id):
+        errors[request_id] = CANCELLED_MESSAGE
+        for track in tracks:
+          if track.request_id == request_id:
+            track.abort()
+      pending: list[tuple[_TrackState, np.ndarray]] = []
+      for track in tracks:
+        if track.done or track.request_id in errors:
+          continue
+        try:
+          window = track.next_window()
+        except Exception as exc:
+          errors[track.request_id] = str(exc)
+          continue
+        if window.shape[1]:
+          pending.append((track, window))
+      if not pending:
+        break
+
+      for offset in range(0, len(pending), max(1, batch.batch_size)):
+        group = pending[offset:offset + max(1, batch.batch_size)]
+        length = max(window.shape[1] for _track, window in group)
+        mix = np.zeros((len(group), group[0][1].shape[0], length), dtype=np.float32)
+        for position, (_track, window) in enumerate(group):
+          mix[position, :, :window.shape[1]] = window
+
+        with torch.no_grad():
+          separated = apply_model(
+            model,
+            torch.from_numpy(mix),
+            device="cpu",
+            shifts=batch.shifts,
+            split=True,
+            overlap=batch.overlap,
+            progress=False,
+          ).numpy()
+
+        for position, (track, window) in enumerate(group):
+          track.write(separated[position, :, :, :window.shape[1]])
+          on_progress(track.request_id, track.index, track.total_segments)
+  finally:
+    for track in tracks:
+      track.close()
+
+  return errors
+
+
+def _drained_drops(controls: Any, batch_id: str) -> list[str]:
+  """Request ids cancelled in `batch_id` since the last check."""
+  drops: list[str] = []
+  while controls is not None:
+    try:
+      message = controls.get_nowait()
+    except queue.Empty:
+      break
+    if message.get("batch_id") == batch_id:
+      drops.append(message["drop"])
+  return drops
+
+
+def _ffmpeg_decode_cmd(
+  input_path: Path,
+  samplerate: int,
+  channels: int,
+  *,
+  start_frame: int = 0,
+  frames: int | None = None,
+) -> list[str]:
+  cmd = ["ffmpeg", "-v", "error", "-nostdin"]
+  if start_frame:
+    cmd.extend(["-ss", f"{start_frame / samplerate:.6f}"])
+  cmd.extend(["-i", str(input_path)])
+  if frames is not None:
+    cmd.extend(["-t", f"{frames / samplerate:.6f}"])
+  cmd.extend(["-map", "0:a:0", "-f", "f32le", "-ac", str(channels), "-ar", str(samplerate), "pipe:1"])
+  return cmd
+
+
+def _stream_stats(input_path: Path, samplerate: int, channels: int) -> tuple[int, float, float]:
+  """Stream-decode once to get frame count and mono mean/std (Demucs normalization)."""
+  cmd = _ffmpeg_decode_cmd(input_path, samplerate, channels)
+  proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  total = 0
+  acc_sum = 0.0
+  acc_sq = 0.0
+  block_bytes = STATS_BLOCK_FRAMES * channels * 4
+  assert proc.stdout is not None
+  while True:
+    raw = proc.stdout.read(block_bytes)
+    if not raw:
+      break
+    usable = len(raw) - len(raw) % (channels * 4)
+    mono = np.frombuffer(raw[:usable], dtype=np.float32).reshape(-1, channels).mean(axis=1, dtype=np.float64)
+    total += mono.shape[0]
+    acc_sum += float(mono.sum())
+    acc_sq += float(np.square(mono).sum())
+  _, stderr = proc.communicate()
+  if proc.returncode != 0:
+    raise RuntimeError((stderr or b"").decode(errors="replace").strip() or "ffmpeg decode failed")
+
+  if total == 0:
+    return 0, 0.0, 1.0
+  mean = acc_sum / total
+  variance = max(0.0, acc_sq / total - mean * mean)
+  return total, float(mean), float(math.sqrt(variance)) or 1.0
+
+
+def _decode_window(
+  input_path: Path,
+  samplerate: int,
+  channels: int,
+  start_frame: int,
+  frames: int,
+) -> np.ndarray:
+  """Decode `frames` frames starting at `start_frame` as a (channels, n) array."""
+  cmd = _ffmpeg_decode_cmd(
+    input_path,
+    samplerate,
+    channels,
+    start_frame=start_frame,
+    frames=frames,
+  )
+  proc = subprocess.run(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+  if proc.returncode != 0:
+    raise RuntimeError(proc.stderr.decode(errors="replace").strip() or "ffmpeg decode failed")
+  usable = len(proc.stdout) - len(proc.stdout) % (channels * 4)
+  data = np.frombuffer(proc.stdout[:usable], dtype=np.float32).reshape(-1, channels)
+  return np.ascontiguousarray(data[:frames].T)
+
+
+class _StemWriter:
+  """
+  Streams one stem to a float32 scratch file while tracking its peak, then
+  writes the 16-bit WAV on close, scaled down as a whole if it would clip
+  (Demucs' default "rescale" clip mode) instead of hard-clipping samples.
+  """
+
+  def __init__(self, path: Path, samplerate: int, channels: int) -> None:
+    self.path = path
+    self.samplerate = samplerate
+    self.channels = channels
+    self.scratch_path = path.with_suffix(".f32")
+    self.scratch = self.scratch_path.open("wb")
+    self.peak = 0.0
+
+  def write(self, audio: np.ndarray) -> None:
+    """Append a (channels, n) float block."""
+    if audio.size:
+      self.peak = max(self.peak, float(np.abs(audio).max()))
+    self.scratch.write(np.ascontiguousarray(audio.T, dtype="<f4").tobytes())
+
+  def abort(self) -> None:
+    self.scratch.close()
+    self.scratch_path.unlink(missing_ok=True)
+
+  def close(self) -> None:
+    if self.scratch.closed:
+      return
+    self.scratch.close()
+    # Same headroom as Demucs: only stems that would clip are scaled.
+    scale = 1.0 / max(1.0, 1.01 * self.peak)
+    block_bytes = STATS_BLOCK_FRAMES * self.channels * 4
+    try:
+      with self.scratch_path.open("rb") as scratch, wave.open(str(self.path), "wb") as writer:
+        writer.setnchannels(self.channels)
+        writer.setsampwidth(2)
+        writer.setframerate(self.samplerate)
+        while raw := scratch.read(block_bytes):
+          samples = np.frombuffer(raw, dtype="<f4") * (scale * 32767.0)
+          writer.writeframes(np.clip(samples, -32768, 32767).astype("<i2").tobytes())
+    finally:
+      self.scratch_path.unlink(missing_ok=True)
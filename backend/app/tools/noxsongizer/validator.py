@@ -3,6 +3,8 @@
 from __future__ import annotations
 
 from app.errors import ValidationError
+from app.tools.noxsongizer.encoding import resolve_stem_format
+from app.tools.noxsongizer.profiles import resolve_profile
 from app.tools.noxsongizer.schemas import NoxsongizerJobRequest
 from app.utils.uploads import validate_uploads
 
@@ -33,17 +35,25 @@ def validate_request(payload: NoxsongizerJobRequest) -> dict:
   if not has_files and not has_file_ids:
     raise ValidationError("Files or file_ids are required")
 
+  params = {
+    "profile": resolve_profile(payload.profile).name,
+    "two_stems": bool(payload.two_stems),
+    "output_format": resolve_stem_format(payload.output_format),
+  }
+
   if has_file_ids:
     cleaned = [
       file_id.strip() for file_id in payload.file_ids if file_id and file_id.strip()
     ]
     if not cleaned:
       raise ValidationError("At least one file_id is required")
-    return {"file_ids": cleaned}
+    params["file_ids"] = cleaned
+    return params
 
   files = validate_uploads(
     payload.files,
     allowed_extensions=AUDIO_EXTENSIONS,
     allowed_mime_prefixes={"audio/"},
   )
-  return {"files": files}
+  params["files"] = files
+  return params
@@ -0,0 +1,142 @@
+"""Global bandwidth budget shared by concurrent Noxtubizer downloads."""
+
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Callable, Iterator
+
+from app.worker.cancellation import CancellationToken, JobCancelled
+
+RATE_UNITS = {
+  "": 1,
+  "K": 1024,
+  "M": 1024 * 1024,
+  "G": 1024 * 1024 * 1024,
+}
+MIN_SHARE_BYTES = 64 * 1024
+
+
+def parse_rate(value: str | int | None) -> int | None:
+  """
+  Parse a yt-dlp style rate (e.g. "500K", "4M") into bytes per second.
+
+  Returns None for empty, zero, or invalid values (meaning "unlimited").
+  """
+  if value is None:
+    return None
+  if isinstance(value, int):
+    return value if value > 0 else None
+
+  raw = str(value).strip().upper().removesuffix("B").removesuffix("/S")
+  if not raw:
+    return None
+
+  unit = raw[-1] if raw[-1] in RATE_UNITS else ""
+  number = raw[:-1] if unit else raw
+  try:
+    rate = int(float(number) * RATE_UNITS[unit])
+  except ValueError:
+    return None
+  return rate if rate > 0 else None
+
+
+class BandwidthShare:
+  """One download's slice of the budget; `rate` follows rebalancing."""
+
+  def __init__(self, rate: int | None) -> None:
+    self.rate = rate
+    self.changed = threading.Event()
+
+
+class RebalanceToken(CancellationToken):
+  """
+  Cancels a running download when its share changes (or its job is
+  cancelled), so it can be restarted at the new rate from its part file.
+  """
+
+  def __init__(self, share: BandwidthShare, parent: CancellationToken | None) -> None:
+    super().__init__(parent.job_id if parent else "")
+    self.share = share
+    self.parent = parent
+
+  @property
+  def cancelled(self) -> bool:
+    return self.share.changed.is_set() or bool(self.parent and self.parent.cancelled)
+
+  @property
+  def stopped(self) -> bool:
+    return bool(self.parent and self.parent.stopped)
+
+
+class BandwidthBudget:
+  """
+  Splits a global download cap evenly across active downloads.
+
+  Shares are recomputed whenever a download starts or finishes; downloads
+  whose share changed are flagged (`BandwidthShare.changed`) so `run` can
+  restart them at the new rate, resuming their part files. The sum thus stays
+  within the configured cap (down to a minimum share per download).
+  """
+
+  def __init__(self, limit_bytes: int | None = None) -> None:
+    self.limit_bytes = limit_bytes
+    self._lock = threading.Lock()
+    self._shares: list[BandwidthShare] = []
+
+  @property
+  def active(self) -> int:
+    with self._lock:
+      return len(self._shares)
+
+  @contextmanager
+  def reserve(self) -> Iterator[BandwidthShare]:
+    """Yield this download's share; its rate is None when uncapped."""
+    share = BandwidthShare(None)
+    with self._lock:
+      self._shares.append(share)
+      self._rebalance()
+      share.changed.clear()
+    try:
+      yield share
+    finally:
+      with self._lock:
+        self._shares.remove(share)
+        self._rebalance()
+
+  def run(
+    self,
+    fetch: Callable[[int | None, CancellationToken], None],
+    cancel_token: CancellationToken | None = None,
+  ) -> None:
+    """
+    Run `fetch(rate, token)` within a share, restarting it whenever the share
+    is rebalanced; `fetch` must resume from where the previous attempt left.
+    """
+    with self.reserve() as share:
+      while True:
+        with self._lock:
+          rate = share.rate
+          share.changed.clear()
+        try:
+          fetch(rate, RebalanceToken(share, cancel_token))
+          return
+        except JobCancelled:
+          if (cancel_token and cancel_token.cancelled) or not share.changed.is_set():
+            raise
+
+  def _rebalance(self) -> None:
+    rate = self._share(len(self._shares))
+    for share in self._shares:
+      if share.rate != rate:
+        share.rate = rate
+        share.changed.set()
+
+  def _share(self, active: int) -> int | None:
+    if not self.limit_bytes:
+      return None
+    return max(MIN_SHARE_BYTES, self.limit_bytes // max(1, active))
+
+
+download_budget = BandwidthBudget(parse_rate(os.getenv("NOXTUBIZER_RATE_LIMIT")))
@@ -2,23 +2,26 @@
 
 from __future__ import annotations
 
-import json
+import hashlib
+import os
 import tempfile
+import time
 from pathlib import Path
 from typing import Literal
 
 from app.errors import ExecutionError
 from app.jobs.model import Job
 from app.jobs.schemas import JobExecutionResult, JobOutputFile
-from app.utils.files import (
-  append_name_suffix,
-  cleanup_directory,
-  detect_new_file,
-  safe_rmtree,
-  snapshot_files,
-)
+from app.tools.noxtubizer.bandwidth import BandwidthBudget, download_budget
+from app.tools.noxtubizer.sources import MediaSource, YtDlpSource
+from app.utils.files import append_name_suffix, cleanup_directory, safe_rmtree
+from app.utils.media import MediaInfo, probe_media
 from app.worker.cancellation import CancellationToken
-from app.worker.process import run_capture, run_process
+from app.worker.process import run_process
+
+DEFAULT_WORK_ROOT = Path(os.getenv("NOXTUBIZER_WORK_ROOT", "storage/work/noxtubizer"))
+PARTIAL_TTL_SECONDS = float(os.getenv("NOXTUBIZER_PARTIAL_TTL_HOURS", "48")) * 3600
+PARTIAL_MARKERS = (".part", ".ytdl", ".temp")
 
 
 class NoxtubizerExecutor:
@@ -29,6 +32,9 @@ class NoxtubizerExecutor:
   - audio
   - video
   - both (merge audio + video)
+
+  Work directories are keyed by the job signature and kept when a run fails or
+  is aborted, so a retry resumes yt-dlp part files and skips finished steps.
   """
 
   AUDIO_QUALITIES = {
@@ -51,8 +57,16 @@ class NoxtubizerExecutor:
     "240p": 240,
   }
 
-  def __init__(self, *, work_root: Path | None = None) -> None:
-    self.work_root = work_root
+  def __init__(
+    self,
+    *,
+    work_root: Path | None = None,
+    budget: BandwidthBudget | None = None,
+    source: MediaSource | None = None,
+  ) -> None:
+    self.work_root = Path(work_root) if work_root else DEFAULT_WORK_ROOT
+    self.budget = budget or download_budget
+    self.source = source or YtDlpSource()
 
   def execute(
     self,
@@ -68,15 +82,11 @@ class NoxtubizerExecutor:
     if not url:
       raise ExecutionError("A YouTube URL is required")
 
-    output_dir = Path(
-      tempfile.mkdtemp(
-        prefix="noxtubizer_",
-        dir=str(self.work_root) if self.work_root else None,
-      )
-    )
+    self._prune_stale_work_dirs()
+    output_dir = self._work_dir(job)
 
     try:
-      meta = self._probe(url, cancel_token)
+      meta = self.source.probe(url, cancel_token=cancel_token)
       raw_title = meta.get("title") or job.input_filename or url
       safe_title = self._sanitize(raw_title)
 
@@ -98,6 +108,7 @@ class NoxtubizerExecutor:
           safe_title,
           params,
           cancel_token,
+          inspect=mode == "audio",
         )
         outputs.append(audio_path.name)
         output_files.append(
@@ -108,6 +119,7 @@ class NoxtubizerExecutor:
             format=audio_meta.get("format"),
             quality=audio_meta.get("quality"),
             label="Audio",
+            media=audio_meta.get("media"),
           )
         )
 
@@ -118,6 +130,7 @@ class NoxtubizerExecutor:
           safe_title,
           params,
           cancel_token,
+          inspect=mode == "video",
         )
         outputs.append(video_path.name)
         output_files.append(
@@ -128,6 +141,7 @@ class NoxtubizerExecutor:
             format=video_meta.get("format"),
             quality=video_meta.get("quality"),
             label="Video",
+            media=video_meta.get("media"),
           )
         )
 
@@ -149,6 +163,7 @@ class NoxtubizerExecutor:
             format=both_meta.get("format"),
             quality=params.get("video_quality"),
             label="Both",
+            media=both_meta.get("media"),
           )
         ]
 
@@ -160,7 +175,8 @@ class NoxtubizerExecutor:
         cleanup_paths=[output_dir],
       )
     except Exception:
-      safe_rmtree(output_dir)
+      if not job.signature:
+        safe_rmtree(output_dir)
       raise
 
   def _process_audio(
@@ -170,36 +186,39 @@ class NoxtubizerExecutor:
     title: str,
     params: dict,
     cancel_token: CancellationToken | None,
+    *,
+    inspect: bool = True,
   ) -> tuple[Path, dict]:
     quality = params.get("audio_quality", "high")
     fmt = params.get("audio_format", "mp3")
 
-    before = snapshot_files(output_dir)
-
-    cmd = [
-      "yt-dlp",
-      "--extract-audio",
-      "--audio-format", self._map_audio_format(fmt),
-      "-o", str(output_dir / "%(id)s.%(ext)s"),
-      url,
-    ]
-
-    bitrate = self.AUDIO_QUALITIES.get(quality)
-    if fmt != "wav" and bitrate:
-      cmd.extend(["--audio-quality", bitrate])
-
-    run_process(cmd, cancel_token=cancel_token)
-
-    created = detect_new_file(output_dir, before, "Audio")
     final_name = append_name_suffix(f"{title}.{fmt}", "audio", strip_known=True)
     final = output_dir / final_name
-    created.rename(final)
 
+    if not final.exists():
+      bitrate = self.AUDIO_QUALITIES.get(quality)
+      self.budget.run(
+        lambda rate, token: self.source.fetch_audio(
+          url,
+          output_dir / "audio.%(ext)s",
+          audio_format=self._map_audio_format(fmt),
+          audio_quality=bitrate if fmt != "wav" else None,
+          rate_limit=rate,
+          cancel_token=token,
+        ),
+        cancel_token,
+      )
+
+      created = self._locate_download(output_dir, "audio", "Audio", preferred_ext=fmt)
+      created.replace(final)
+
+    media = self._inspect(final) if inspect else None
     return final, {
       "filename": final.name,
       "format": fmt,
       "quality": quality,
-      "real_bitrate": self._probe_audio_bitrate(final),
+      "real_bitrate": media.audio_bitrate_kbps if media else None,
+      "media": media,
     }
 
   def _process_video(
@@ -209,42 +228,48 @@ class NoxtubizerExecutor:
     title: str,
     params: dict,
     cancel_token: CancellationToken | None,
+    *,
+    inspect: bool = True,
   ) -> tuple[Path, dict]:
     quality = params.get("video_quality", "best")
     fmt = params.get("video_format", "mp4")
 
-    before = snapshot_files(output_dir)
-
-    selector = self._video_selector(quality)
-    cmd = [
-      "yt-dlp",
-      "-f", selector,
-      "-o", str(output_dir / "%(id)s.%(ext)s"),
-      url,
-    ]
-
-    run_process(cmd, cancel_token=cancel_token)
-
-    created = detect_new_file(output_dir, before, "Video")
     final_name = append_name_suffix(f"{title}.{fmt}", "video", strip_known=True)
     final = output_dir / final_name
 
-    if created.suffix.lstrip(".") == fmt:
-      created.rename(final)
-    else:
-      run_process([
-        "ffmpeg", "-y",
-        "-i", str(created),
-        "-c:v", "copy",
-        "-an",
-        str(final),
-      ], cancel_token=cancel_token)
+    if not final.exists():
+      self.budget.run(
+        lambda rate, token: self.source.fetch_video(
+          url,
+          output_dir / "video.%(ext)s",
+          selector=self._video_selector(quality),
+          rate_limit=rate,
+          cancel_token=token,
+        ),
+        cancel_token,
+      )
 
+      created = self._locate_download(output_dir, "video", "Video", preferred_ext=fmt)
+      if created.suffix.lstrip(".") == fmt:
+        created.replace(final)
+      else:
+        partial = self._partial_path(final)
+        run_process([
+          "ffmpeg", "-y",
+          "-i", str(created),
+          "-c:v", "copy",
+          "-an",
+          str(partial),
+        ], cancel_token=cancel_token)
+        partial.replace(final)
+
+    media = self._inspect(final) if inspect else None
     return final, {
       "filename": final.name,
       "format": fmt,
       "quality": quality,
-      "real_height": self._probe_video_height(final),
+      "real_height": media.height if media else None,
+      "media": media,
     }
 
   def _merge_audio_video(
@@ -262,25 +287,82 @@ class NoxtubizerExecutor:
     final_name = append_name_suffix(f"{title}.{fmt}", "both", strip_known=True)
     final = output_dir / final_name
 
-    run_process([
-      "ffmpeg", "-y",
-      "-i", str(video),
-      "-i", str(audio),
-      "-c:v", "copy",
-      "-c:a", self._audio_codec(audio_fmt, fmt),
-      "-map", "0:v:0",
-      "-map", "1:a:0",
-      str(final),
-    ], cancel_token=cancel_token)
+    if not final.exists():
+      partial = self._partial_path(final)
+      run_process([
+        "ffmpeg", "-y",
+        "-i", str(video),
+        "-i", str(audio),
+        "-c:v", "copy",
+        "-c:a", self._audio_codec(audio_fmt, fmt),
+        "-map", "0:v:0",
+        "-map", "1:a:0",
+        str(partial),
+      ], cancel_token=cancel_token)
+      partial.replace(final)
 
+    media = self._inspect(final)
     return final, {
       "filename": final.name,
       "format": fmt,
       "audio_format": audio_fmt,
-      "real_height": self._probe_video_height(final),
-      "real_bitrate": self._probe_audio_bitrate(final),
+      "real_height": media.height if media else None,
+      "real_bitrate": media.audio_bitrate_kbps if media else None,
+      "media": media,
     }
 
+  def _locate_download(
+    self,
+    output_dir: Path,
+    prefix: str,
+    label: str,
+    *,
+    preferred_ext: str | None = None,
+  ) -> Path:
+    """Find the completed yt-dlp output for a step, ignoring partial files."""
+    candidates = [
+      path
+      for path in output_dir.glob(f"{prefix}.*")
+      if path.is_file() and not any(marker in path.name for marker in PARTIAL_MARKERS)
+    ]
+    if not candidates:
+      raise ExecutionError(f"No {label} file was created")
+    if len(candidates) == 1:
+      return candidates[0]
+
+    preferred = [path for path in candidates if path.suffix.lstrip(".") == preferred_ext]
+    if len(preferred) == 1:
+      return preferred[0]
+    raise ExecutionError(f"Multiple {label} files were created")
+
+  def _partial_path(self, final: Path) -> Path:
+    """Temporary ffmpeg target so an interrupted encode never looks finished."""
+    return final.with_name(f".partial_{final.name}")
+
+  def _work_dir(self, job: Job) -> Path:
+    """Return the resumable work directory for a job (keyed by signature)."""
+    self.work_root.mkdir(parents=True, exist_ok=True)
+    if not job.signature:
+      return Path(tempfile.mkdtemp(prefix="noxtubizer_", dir=str(self.work_root)))
+
+    digest = hashlib.sha256(job.signature.encode("utf-8")).hexdigest()[:32]
+    path = self.work_root / f"noxtubizer_{digest}"
+    path.mkdir(parents=True, exist_ok=True)
+    os.utime(path)
+    return path
+
+  def _prune_stale_work_dirs(self) -> None:
+    """Drop partial downloads that were never retried within the TTL."""
+    if not self.work_root.exists():
+      return
+    cutoff = time.time() - PARTIAL_TTL_SECONDS
+    for path in self.work_root.glob("noxtubizer_*"):
+      try:
+        if path.is_dir() and path.stat().st_mtime < cutoff:
+          safe_rmtree(path)
+      except Exception:
+        continue
+
   def _normalize_mode(self, mode: str | None) -> Literal["audio", "video", "both"]:
     mode = str(mode or "").lower()
     if mode not in ("audio", "video", "both"):
@@ -311,39 +393,6 @@ class NoxtubizerExecutor:
       "wav": "pcm_s16le",
     }.get(audio_fmt, "copy")
 
-  def _probe(self, url: str, cancel_token: CancellationToken | None) -> dict:
-    proc = run_capture(
-      ["yt-dlp", "-j", "--skip-download", "--no-warnings", "--ignore-errors", url],
-      cancel_token=cancel_token,
-    )
-    try:
-      return json.loads(proc.stdout.splitlines()[0])
-    except Exception:
-      return {}
-
-  def _probe_video_height(self, path: Path) -> int | None:
-    proc = run_capture([
-      "ffprobe", "-v", "error",
-      "-select_streams", "v:0",
-      "-show_entries", "stream=height",
-      "-of", "json",
-      str(path),
-    ])
-    try:
-      return json.loads(proc.stdout)["streams"][0]["height"]
-    except Exception:
-      return None
-
-  def _probe_audio_bitrate(self, path: Path) -> int | None:
-    proc = run_capture([
-      "ffprobe", "-v", "error",
-      "-select_streams", "a:0",
-      "-show_entries", "stream=bit_rate",
-      "-of", "json",
-      str(path),
-    ])
-    try:
-      bps = json.loads(proc.stdout)["streams"][0]["bit_rate"]
-      return int(int(bps) / 1000) if bps else None
-    except Exception:
-      return None
+  def _inspect(self, path: Path) -> MediaInfo | None:
+    """Inspect a final output once; the result is cached on its File record."""
+    return probe_media(path)
@@ -32,11 +32,20 @@ def download_output(job_id: str, filename: str, job_service: JobService):
   outputs = file_links.list_files(job_id, role=JobFileRole.OUTPUT)
   for file, _role in outputs:
     if file.name == filename:
-      path = file_links.file_service.resolve_path(file)
-      if not path.exists():
-        break
       label = file_links.get_label(job_id, file.id, JobFileRole.OUTPUT)
       download_name = build_download_name(file.name, label)
-      return file_response(path, filename=download_name)
+      lease = file_links.file_service.lease_blob(file)
+      if not lease:
+        break
+      file_links.file_service.mark_accessed(file)
+      return file_response(
+        lease.path,
+        filename=download_name,
+        codec=lease.codec,
+        size=file.size,
+        checksum=file.checksum,
+        on_close=lease.release,
+        thaw=lease.thaw,
+      )
 
   raise NotFoundError("Output file not found")
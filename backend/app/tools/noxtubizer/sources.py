@@ -0,0 +1,127 @@
+"""Media source boundary used by the Noxtubizer executor."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Any, Protocol
+
+from app.worker.cancellation import CancellationToken
+from app.worker.process import run_capture, run_process
+
+
+class MediaSource(Protocol):
+  """
+  Where Noxtubizer fetches remote media from.
+
+  Implementations write completed files using the given yt-dlp style output
+  template (e.g. `<dir>/audio.%(ext)s`) and return yt-dlp compatible metadata
+  from `probe`.
+  """
+
+  def probe(
+    self,
+    url: str,
+    *,
+    cancel_token: CancellationToken | None = None,
+  ) -> dict[str, Any]:
+    """Return metadata (`title`, `id`, ...) for a URL, or {} if unknown."""
+    ...
+
+  def fetch_audio(
+    self,
+    url: str,
+    output_template: Path,
+    *,
+    audio_format: str,
+    audio_quality: str | None = None,
+    rate_limit: int | None = None,
+    cancel_token: CancellationToken | None = None,
+  ) -> None:
+    """Download and extract the audio track in the requested format."""
+    ...
+
+  def fetch_video(
+    self,
+    url: str,
+    output_template: Path,
+    *,
+    selector: str,
+    rate_limit: int | None = None,
+    cancel_token: CancellationToken | None = None,
+  ) -> None:
+    """Download the video stream matching a yt-dlp format selector."""
+    ...
+
+
+class YtDlpSource:
+  """MediaSource backed by the yt-dlp CLI (resumable part files enabled)."""
+
+  RESUME_FLAGS = ("--continue", "--part", "--no-overwrites")
+
+  def __init__(self, *, binary: str | None = None) -> None:
+    self.binary = binary or os.getenv("NOXTUBIZER_YTDLP_BIN") or "yt-dlp"
+
+  def probe(
+    self,
+    url: str,
+    *,
+    cancel_token: CancellationToken | None = None,
+  ) -> dict[str, Any]:
+    proc = run_capture(
+      [self.binary, "-j", "--skip-download", "--no-warnings", "--ignore-errors", url],
+      cancel_token=cancel_token,
+    )
+    try:
+      return json.loads(proc.stdout.splitlines()[0])
+    except Exception:
+      return {}
+
+  def fetch_audio(
+    self,
+    url: str,
+    output_template: Path,
+    *,
+    audio_format: str,
+    audio_quality: str | None = None,
+    rate_limit: int | None = None,
+    cancel_token: CancellationToken | None = None,
+  ) -> None:
+    cmd = [
+      self.binary,
+      "--extract-audio",
+      "--audio-format", audio_format,
+      "-o", str(output_template),
+    ]
+    if audio_quality:
+      cmd.extend(["--audio-quality", audio_quality])
+    self._run(cmd, url, rate_limit, cancel_token)
+
+  def fetch_video(
+    self,
+    url: str,
+    output_template: Path,
+    *,
+    selector: str,
+    rate_limit: int | None = None,
+    cancel_token: CancellationToken | None = None,
+  ) -> None:
+    cmd = [
+      self.binary,
+      "-f", selector,
+      "-o", str(output_template),
+    ]
+    self._run(cmd, url, rate_limit, cancel_token)
+
+  def _run(
+    self,
+    cmd: list[str],
+    url: str,
+    rate_limit: int | None,
+    cancel_token: CancellationToken | None,
+  ) -> None:
+    args = [*cmd, *self.RESUME_FLAGS]
+    if rate_limit:
+      args.extend(["--limit-rate", str(rate_limit)])
+    run_process([*args, url], cancel_token=cancel_token)
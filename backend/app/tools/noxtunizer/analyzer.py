@@ -0,0 +1,215 @@
+"""In-process BPM/key analysis for Noxtunizer (NumPy engine)."""
+
+from __future__ import annotations
+
+import subprocess
+import wave
+from dataclasses import dataclass
+from pathlib import Path
+
+import numpy as np
+
+from app.errors import ExecutionError
+from app.utils.media import is_wav_file
+
+ANALYSIS_RATE = 22050
+FRAME_SIZE = 4096
+HOP_SIZE = 512
+MIN_BPM = 60.0
+MAX_BPM = 200.0
+PRIOR_BPM = 120.0
+CHROMA_MIN_HZ = 55.0
+CHROMA_MAX_HZ = 4000.0
+STFT_BLOCK_FRAMES = 2048
+
+PITCH_CLASSES = ("C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B")
+
+# Krumhansl-Kessler key profiles.
+MAJOR_PROFILE = np.array([6.35, 2.23, 3.48, 2.33, 4.38, 4.09, 2.52, 5.19, 2.39, 3.66, 2.29, 2.88])
+MINOR_PROFILE = np.array([6.33, 2.68, 3.52, 5.38, 2.60, 3.53, 2.54, 4.75, 3.98, 2.69, 3.34, 3.17])
+
+
+@dataclass(frozen=True)
+class TrackAnalysis:
+  """Raw analyzer output, before Noxtunizer normalization."""
+
+  bpm: float | None
+  key: str | None
+  scale: str | None
+  duration: float
+
+
+def analyze_file(path: Path, *, ffmpeg_bin: str = "ffmpeg") -> TrackAnalysis:
+  """
+  Estimate tempo and key of an audio file.
+
+  WAV files are read in-process; other formats are decoded by one ffmpeg pipe
+  (no temporary files).
+
+  Raises:
+    ExecutionError: If the audio cannot be decoded.
+  """
+  samples = load_mono(path, ffmpeg_bin=ffmpeg_bin)
+  return analyze_samples(samples, ANALYSIS_RATE)
+
+
+def analyze_samples(samples: np.ndarray, sample_rate: int) -> TrackAnalysis:
+  """Estimate tempo and key of mono float samples at `sample_rate`."""
+  duration = float(samples.shape[0]) / sample_rate if sample_rate else 0.0
+  if samples.shape[0] < FRAME_SIZE:
+    return TrackAnalysis(bpm=None, key=None, scale=None, duration=duration)
+
+  flux, chroma = _spectral_features(samples, sample_rate)
+  key, scale = _estimate_key(chroma)
+  return TrackAnalysis(
+    bpm=_estimate_bpm(flux, sample_rate),
+    key=key,
+    scale=scale,
+    duration=duration,
+  )
+
+
+def load_mono(path: Path, *, ffmpeg_bin: str = "ffmpeg") -> np.ndarray:
+  """Decode `path` to mono float32 samples at ANALYSIS_RATE."""
+  if is_wav_file(path):
+    try:
+      return _read_wav(path)
+    except (wave.Error, EOFError, ValueError):
+      pass
+
+  try:
+    proc = subprocess.run(
+      [
+        ffmpeg_bin,
+        "-v",
+        "error",
+        "-nostdin",
+        "-i",
+        str(path),
+        "-map",
+        "0:a:0",
+        "-ac",
+        "1",
+        "-ar",
+        str(ANALYSIS_RATE),
+        "-f",
+        "f32le",
+        "pipe:1",
+      ],
+      stdout=subprocess.PIPE,
+      stderr=subprocess.PIPE,
+      check=False,
+    )
+  except OSError as exc:
+    raise ExecutionError(f"Unable to run {ffmpeg_bin}: {exc}") from exc
+  if proc.returncode != 0:
+    raise ExecutionError(proc.stderr.decode(errors="replace").strip() or "Audio decode failed")
+  usable = len(proc.stdout) - len(proc.stdout) % 4
+  return np.frombuffer(proc.stdout[:usable], dtype="<f4")
+
+
+def _read_wav(path: Path) -> np.ndarray:
+  with wave.open(str(path), "rb") as reader:
+    width = reader.getsampwidth()
+    channels = reader.getnchannels()
+    rate = reader.getframerate()
+    raw = reader.readframes(reader.getnframes())
+
+  if width == 1:
+    data = (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+  elif width == 2:
+    data = np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+  elif width == 4:
+    data = np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+  else:
+    raise ValueError(f"Unsupported WAV sample width: {width}")
+
+  mono = data.reshape(-1, channels).mean(axis=1) if channels > 1 else data
+  if rate == ANALYSIS_RATE or mono.shape[0] == 0:
+    return mono.astype(np.float32, copy=False)
+  target = int(round(mono.shape[0] * ANALYSIS_RATE / rate))
+  positions = np.arange(target, dtype=np.float64) * (rate / ANALYSIS_RATE)
+  return np.interp(positions, np.arange(mono.shape[0]), mono).astype(np.float32)
+
+
+def _spectral_features(samples: np.ndarray, sample_rate: int) -> tuple[np.ndarray, np.ndarray]:
+  """
+  One STFT pass yielding the onset (spectral flux) envelope and the mean
+  chroma vector. Frames are processed in blocks to bound memory.
+  """
+  window = np.hanning(FRAME_SIZE).astype(np.float32)
+  freqs = np.fft.rfftfreq(FRAME_SIZE, d=1.0 / sample_rate)
+  in_range = (freqs >= CHROMA_MIN_HZ) & (freqs <= CHROMA_MAX_HZ)
+  pitch = np.zeros_like(freqs, dtype=np.int64)
+  pitch[in_range] = np.mod(np.round(12 * np.log2(freqs[in_range] / 440.0)) + 9, 12).astype(np.int64)
+
+  frames = np.lib.stride_tricks.sliding_window_view(samples, FRAME_SIZE)[::HOP_SIZE]
+  flux = np.zeros(frames.shape[0], dtype=np.float32)
+  chroma = np.zeros(12, dtype=np.float64)
+  previous: np.ndarray | None = None
+
+  for start in range(0, frames.shape[0], STFT_BLOCK_FRAMES):
+    block = frames[start:start + STFT_BLOCK_FRAMES] * window
+    magnitude = np.abs(np.fft.rfft(block, axis=1)).astype(np.float32)
+    compressed = np.log1p(10.0 * magnitude)
+
+    if previous is None:
+      diff = np.diff(compressed, axis=0, prepend=compressed[:1])
+    else:
+      diff = np.diff(compressed, axis=0, prepend=previous[None])
+    flux[start:start + block.shape[0]] = np.maximum(diff, 0.0).sum(axis=1)
+    previous = compressed[-1]
+
+    energy = np.square(magnitude[:, in_range]).sum(axis=0)
+    chroma += np.bincount(pitch[in_range], weights=energy, minlength=12)
+
+  return flux, chroma
+
+
+def _estimate_bpm(flux: np.ndarray, sample_rate: int) -> float | None:
+  """Pick the strongest onset-autocorrelation lag, weighted by a tempo prior."""
+  envelope = flux - flux.mean()
+  if not np.any(envelope):
+    return None
+
+  size = 1 << int(np.ceil(np.log2(envelope.shape[0] * 2)))
+  spectrum = np.fft.rfft(envelope, n=size)
+  autocorr = np.fft.irfft(spectrum * np.conj(spectrum), n=size)[: envelope.shape[0]]
+
+  frame_rate = sample_rate / HOP_SIZE
+  min_lag = max(1, int(np.floor(frame_rate * 60.0 / MAX_BPM)))
+  max_lag = min(autocorr.shape[0] - 2, int(np.ceil(frame_rate * 60.0 / MIN_BPM)))
+  if max_lag <= min_lag:
+    return None
+
+  lags = np.arange(min_lag, max_lag + 1)
+  bpms = 60.0 * frame_rate / lags
+  prior = np.exp(-0.5 * np.square(np.log2(bpms / PRIOR_BPM)))
+  scores = autocorr[lags] * prior
+  best = int(np.argmax(scores))
+  lag = float(lags[best])
+
+  # Parabolic interpolation around the peak for sub-frame lag precision.
+  if 0 < best < scores.shape[0] - 1:
+    left, center, right = scores[best - 1], scores[best], scores[best + 1]
+    denominator = left - 2 * center + right
+    if denominator:
+      lag += 0.5 * (left - right) / denominator
+
+  return float(60.0 * frame_rate / lag)
+
+
+def _estimate_key(chroma: np.ndarray) -> tuple[str | None, str | None]:
+  """Correlate the mean chroma with rotated major/minor key profiles."""
+  if not np.any(chroma):
+    return None, None
+
+  best_score = -np.inf
+  best: tuple[str | None, str | None] = (None, None)
+  for scale, profile in (("major", MAJOR_PROFILE), ("minor", MINOR_PROFILE)):
+    for tonic in range(12):
+      score = np.corrcoef(chroma, np.roll(profile, tonic))[0, 1]
+      if score > best_score:
+        best_score = score
+        best = (PITCH_CLASSES[tonic], scale)
+  return best
@@ -0,0 +1,27 @@
+"""Analysis engines available to Noxtunizer jobs."""
+
+from __future__ import annotations
+
+import os
+
+from app.errors import ValidationError
+
+ENGINES = ("essentia", "numpy")
+DEFAULT_ENGINE = os.getenv("NOXTUNIZER_ENGINE", "essentia").strip().lower()
+
+# Bump an engine's version whenever its results change (algorithm, extractor
+# profile, normalization) so analyses cached under the old version are redone.
+ENGINE_VERSIONS = {"essentia": 1, "numpy": 1}
+
+
+def resolve_engine(name: str | None) -> str:
+  """Return a normalized engine name, falling back to the default."""
+  key = str(name or DEFAULT_ENGINE).strip().lower()
+  if key not in ENGINES:
+    raise ValidationError(f"Engine must be one of: {', '.join(ENGINES)}")
+  return key
+
+
+def engine_version(engine: str) -> int:
+  """Return the current result version of an analysis engine."""
+  return ENGINE_VERSIONS[engine]
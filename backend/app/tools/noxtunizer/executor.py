@@ -2,19 +2,73 @@
 
 from __future__ import annotations
 
+import hashlib
 import json
+import multiprocessing as mp
 import os
 import shutil
+import signal
 import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Any, Dict
+from typing import Any, Callable, Dict
 
 from app.errors import ExecutionError
+from app.jobs.events import JobEvent, job_event_bus
 from app.jobs.model import Job
 from app.jobs.schemas import JobExecutionResult
-from app.utils.files import ensure_path, safe_unlink
+from app.tools.noxtunizer.analyzer import analyze_file
+from app.tools.noxtunizer.engines import engine_version, resolve_engine
+from app.tools.noxtunizer.pool import init_pool_worker, worker_pids
+from app.utils.files import ensure_path, safe_rmtree, safe_unlink
+from app.utils.media import MediaInfo
 from app.worker.cancellation import CancellationToken
 from app.worker.process import run_process
+from app.worker.resources import CoreBudget, cpu_budget
+
+BATCH_POLL_SECONDS = 0.5
+WORKER_STOP_SECONDS = 5
+
+TrackResultCallback = Callable[[str, Dict[str, Any]], None]
+
+# Extractor profile limited to what `_reduce_output` reads: rhythm BPM, tonal
+# key and audio properties. Frame output, chromaprint and high-level SVM models
+# are disabled and descriptor statistics are cut to the mean, which keeps both
+# the analysis and the JSON it writes small.
+EXTRACTOR_PROFILE = """\
+outputFormat: json
+outputFrames: 0
+requireMbid: false
+indent: 0
+lowlevel:
+  stats: ["mean"]
+average_loudness:
+  compute: 0
+rhythm:
+  method: degara
+  minTempo: 40
+  maxTempo: 208
+  stats: ["mean"]
+tonal:
+  stats: ["mean"]
+chromaprint:
+  compute: 0
+highlevel:
+  compute: 0
+  svm_models: []
+"""
+
+
+@dataclass(frozen=True)
+class BatchTrack:
+  """A stored audio file analyzed by a Noxtunizer batch job."""
+
+  file_id: str
+  name: str
+  path: Path
+  duration: float | None = None
 
 
 class NoxtunizerExecutor:
@@ -25,6 +79,18 @@ class NoxtunizerExecutor:
   - BPM
   - Key
   - Duration
+
+  The extractor runs with a targeted profile (EXTRACTOR_PROFILE, or the file
+  named by NOXTUNIZER_EXTRACTOR_PROFILE) instead of its full default one.
+  Jobs with `engine="numpy"` are analyzed in-process instead (see analyzer),
+  which needs neither Essentia nor a temporary JSON file.
+
+  `execute_batch` analyzes many stored files in one job using a process pool
+  sized to the cores reserved from the CoreBudget, reporting each track as it
+  finishes.
+
+  Callers may pass analyses already stored for the input's checksum as
+  `cached`; those are returned as the result without decoding the audio.
   """
 
   def __init__(
@@ -32,6 +98,7 @@ class NoxtunizerExecutor:
     *,
     extractor_bin: str | None = None,
     work_root: Path | None = None,
+    budget: CoreBudget = cpu_budget,
   ) -> None:
     self.extractor_bin = (
       extractor_bin
@@ -39,21 +106,237 @@ class NoxtunizerExecutor:
       or "/usr/local/bin/essentia_streaming_extractor_music"
     )
     self.work_root = work_root
+    self.budget = budget
+    self.profile_path = (
+      Path(os.environ["NOXTUNIZER_EXTRACTOR_PROFILE"])
+      if os.getenv("NOXTUNIZER_EXTRACTOR_PROFILE")
+      else None
+    )
 
   def execute(
     self,
     job: Job,
     *,
     cancel_token: CancellationToken | None = None,
+    input_media: MediaInfo | None = None,
+    cached: Dict[str, Any] | None = None,
   ) -> JobExecutionResult:
     if cancel_token:
       cancel_token.raise_if_cancelled()
 
-    input_file = ensure_path(
-      job.input_path,
-      missing_message="Input file is missing",
-      not_found_message="Input file not found on disk",
+    engine = resolve_engine((job.params or {}).get("engine"))
+    if cached:
+      summary = self.cached_summary(cached, engine)
+    else:
+      input_file = ensure_path(
+        job.input_path,
+        missing_message="Input file is missing",
+        not_found_message="Input file not found on disk",
+      )
+      summary = self.analyze(input_file, engine, cancel_token=cancel_token)
+    if input_media and input_media.duration is not None:
+      summary["duration"] = input_media.duration
+      summary["duration_label"] = self._format_duration(input_media.duration)
+
+    return JobExecutionResult(
+      summary=summary,
     )
+
+  def analyze(
+    self,
+    input_file: Path,
+    engine: str,
+    *,
+    cancel_token: CancellationToken | None = None,
+  ) -> Dict[str, Any]:
+    """Analyze one file with the given engine and return its summary."""
+    if engine == "numpy":
+      summary = self._analyze_in_process(input_file)
+    else:
+      summary = self._analyze_with_essentia(input_file, cancel_token=cancel_token)
+    summary["engine"] = engine
+    summary["analyzer_version"] = engine_version(engine)
+    return summary
+
+  def cached_summary(self, cached: Dict[str, Any], engine: str) -> Dict[str, Any]:
+    """Build a job summary from a stored analysis (bpm, key, duration)."""
+    bpm = cached.get("bpm")
+    duration = cached.get("duration")
+    return {
+      "bpm": round(bpm) if bpm is not None else None,
+      "key": cached.get("key"),
+      "duration": duration,
+      "duration_label": self._format_duration(duration),
+      "engine": engine,
+      "analyzer_version": engine_version(engine),
+      "cached": True,
+    }
+
+  def execute_batch(
+    self,
+    job: Job,
+    *,
+    tracks: list[BatchTrack],
+    cancel_token: CancellationToken | None = None,
+    on_result: TrackResultCallback | None = None,
+    cached: dict[str, Dict[str, Any]] | None = None,
+  ) -> JobExecutionResult:
+    """
+    Analyze `tracks` in parallel and summarize the whole batch.
+
+    `on_result(file_id, summary)` runs in the calling thread as soon as each
+    track finishes, and a `job_progress` event carrying the track summary is
+    published. Track failures are reported per track and do not fail the job.
+    Tracks found in `cached` (keyed by file id) are reported first and never
+    reach the process pool.
+    """
+    if cancel_token:
+      cancel_token.raise_if_cancelled()
+
+    if not tracks:
+      raise ExecutionError("No tracks to analyze")
+    engine = resolve_engine((job.params or {}).get("engine"))
+    cached = cached or {}
+    results: dict[str, Dict[str, Any]] = {}
+
+    for track in tracks:
+      if track.file_id in cached:
+        results[track.file_id] = self.cached_summary(cached[track.file_id], engine)
+        self._emit_track(
+          job.id,
+          track,
+          results[track.file_id],
+          current=len(results),
+          total=len(tracks),
+        )
+
+    remaining = [track for track in tracks if track.file_id not in results]
+    if remaining:
+      self._analyze_pool(
+        job,
+        remaining,
+        engine,
+        results,
+        total=len(tracks),
+        cancel_token=cancel_token,
+        on_result=on_result,
+      )
+
+    track_summaries = [
+      {"file_id": track.file_id, "name": track.name, **results.get(track.file_id, {})}
+      for track in tracks
+    ]
+    failed = sum(1 for item in track_summaries if "error" in item)
+    return JobExecutionResult(
+      summary={
+        "mode": "batch",
+        "engine": engine,
+        "total": len(tracks),
+        "analyzed": len(tracks) - failed,
+        "failed": failed,
+        "cached_tracks": len(tracks) - len(remaining),
+        "tracks": track_summaries,
+      },
+    )
+
+  def _analyze_pool(
+    self,
+    job: Job,
+    tracks: list[BatchTrack],
+    engine: str,
+    results: dict[str, Dict[str, Any]],
+    *,
+    total: int,
+    cancel_token: CancellationToken | None,
+    on_result: TrackResultCallback | None,
+  ) -> None:
+    with self.budget.reserve(len(tracks), cancel_token=cancel_token) as cores:
+      pid_dir = tempfile.mkdtemp(
+        prefix="noxtunizer_pool_",
+        dir=str(self.work_root) if self.work_root else None,
+      )
+      pool = ProcessPoolExecutor(
+        max_workers=min(len(cores), len(tracks)),
+        mp_context=mp.get_context("spawn"),
+        initializer=init_pool_worker,
+        initargs=(cores, pid_dir),
+      )
+      try:
+        pending: dict[Future, BatchTrack] = {
+          pool.submit(
+            _analyze_track,
+            str(track.path),
+            engine,
+            self.extractor_bin,
+            str(self.work_root) if self.work_root else None,
+          ): track
+          for track in tracks
+        }
+        while pending:
+          if cancel_token:
+            cancel_token.raise_if_cancelled()
+          done, _ = wait(pending, timeout=BATCH_POLL_SECONDS, return_when=FIRST_COMPLETED)
+          for future in done:
+            track = pending.pop(future)
+            try:
+              summary = future.result()
+            except Exception as exc:
+              summary = {"error": str(exc) or "Analysis failed"}
+            else:
+              if track.duration is not None:
+                summary["duration"] = track.duration
+                summary["duration_label"] = self._format_duration(track.duration)
+              if on_result:
+                on_result(track.file_id, summary)
+            results[track.file_id] = summary
+            self._emit_track(job.id, track, summary, current=len(results), total=total)
+      finally:
+        cancelled = bool(cancel_token and cancel_token.cancelled)
+        pool.shutdown(wait=not cancelled, cancel_futures=True)
+        if cancelled:
+          _terminate_workers(worker_pids(pid_dir))
+        safe_rmtree(Path(pid_dir))
+
+  def _emit_track(
+    self,
+    job_id: str | None,
+    track: BatchTrack,
+    summary: Dict[str, Any],
+    *,
+    current: int,
+    total: int,
+  ) -> None:
+    if not job_id:
+      return
+    job_event_bus.publish_sync(
+      JobEvent(
+        type="job_progress",
+        payload={
+          "job_id": job_id,
+          "stage": "analysis",
+          "current": current,
+          "total": total,
+          "file_id": track.file_id,
+          "result": summary,
+        },
+      )
+    )
+
+  def _analyze_in_process(self, input_file: Path) -> Dict[str, Any]:
+    analysis = analyze_file(input_file)
+    return self._build_summary(
+      bpm=analysis.bpm,
+      key=analysis.key,
+      scale=analysis.scale,
+      duration=analysis.duration,
+    )
+
+  def _analyze_with_essentia(
+    self,
+    input_file: Path,
+    *,
+    cancel_token: CancellationToken | None,
+  ) -> Dict[str, Any]:
     tmp_handle = tempfile.NamedTemporaryFile(
       prefix="noxtunizer_",
       suffix=".json",
@@ -75,14 +358,10 @@ class NoxtunizerExecutor:
       except Exception as exc:
         raise ExecutionError("Failed to read Essentia output") from exc
 
-      summary = self._reduce_output(payload)
+      return self._reduce_output(payload)
     finally:
       safe_unlink(output_json)
 
-    return JobExecutionResult(
-      summary=summary,
-    )
-
   def _run_extractor(
     self,
     input_file: Path,
@@ -104,32 +383,61 @@ class NoxtunizerExecutor:
       self.extractor_bin,
       str(input_file),
       str(output_json),
+      str(self._ensure_profile()),
     ]
 
     run_process(cmd, cancel_token=cancel_token)
 
-  def _reduce_output(self, payload: Dict[str, Any]) -> Dict[str, Any]:
-    bpm_raw = self._as_float(self._get(payload, ["rhythm", "bpm"]))
-    bpm_value = round(bpm_raw) if bpm_raw is not None else None
+  def _ensure_profile(self) -> Path:
+    """
+    Write the targeted extractor profile once to a stable path and reuse it.
+
+    The name carries a hash of the profile, so every executor and pool worker
+    shares one file and an edited profile gets a new one.
+    """
+    if self.profile_path and self.profile_path.exists():
+      return self.profile_path
+
+    digest = hashlib.sha256(EXTRACTOR_PROFILE.encode("utf-8")).hexdigest()[:12]
+    root = self.work_root or Path(tempfile.gettempdir())
+    path = root / f"noxtunizer_profile_{digest}.yaml"
+    if not path.exists():
+      root.mkdir(parents=True, exist_ok=True)
+      partial = path.with_name(f".{path.name}.{os.getpid()}")
+      partial.write_text(EXTRACTOR_PROFILE, encoding="utf-8")
+      os.replace(partial, path)
+    self.profile_path = path
+    return path
 
+  def _reduce_output(self, payload: Dict[str, Any]) -> Dict[str, Any]:
     tonal = payload.get("tonal", {}) or {}
-    key_key = tonal.get("key_key") or tonal.get("chords_key")
-    key_scale = tonal.get("key_scale") or tonal.get("chords_scale")
+    return self._build_summary(
+      bpm=self._as_float(self._get(payload, ["rhythm", "bpm"])),
+      key=tonal.get("key_key") or tonal.get("chords_key"),
+      scale=tonal.get("key_scale") or tonal.get("chords_scale"),
+      duration=self._as_float(self._get(payload, ["metadata", "audio_properties", "length"])),
+    )
 
-    key_key = self._normalize_key(key_key) if isinstance(key_key, str) else None
-    key_scale = self._normalize_scale(key_scale)
+  def _build_summary(
+    self,
+    *,
+    bpm: float | None,
+    key: Any,
+    scale: Any,
+    duration: float | None,
+  ) -> Dict[str, Any]:
+    bpm_value = round(bpm) if bpm is not None else None
 
-    key_value = f"{key_key} {key_scale}" if key_key and key_scale else None
+    key_key = self._normalize_key(key) if isinstance(key, str) else None
+    key_scale = self._normalize_scale(scale)
 
-    duration_seconds = self._as_float(
-      self._get(payload, ["metadata", "audio_properties", "length"])
-    )
+    key_value = f"{key_key} {key_scale}" if key_key and key_scale else None
 
     return {
       "bpm": bpm_value,
       "key": key_value,
-      "duration": duration_seconds,
-      "duration_label": self._format_duration(duration_seconds),
+      "duration": duration,
+      "duration_label": self._format_duration(duration),
     }
 
   def _normalize_scale(self, scale: Any) -> str | None:
@@ -200,3 +508,46 @@ class NoxtunizerExecutor:
         return None
       current = current.get(key)
     return current
+
+
+_pool_executor: NoxtunizerExecutor | None = None
+
+
+def _terminate_workers(pids: list[int]) -> None:
+  """Kill cancelled pool workers along with the Essentia processes they run."""
+  for pid in pids:
+    _signal_group(pid, signal.SIGTERM)
+  deadline = time.monotonic() + WORKER_STOP_SECONDS
+  while pids and time.monotonic() < deadline:
+    time.sleep(0.05)
+    pids = [pid for pid in pids if _signal_group(pid, 0)]
+  for pid in pids:
+    _signal_group(pid, getattr(signal, "SIGKILL", signal.SIGTERM))
+
+
+def _signal_group(pid: int, signum: int) -> bool:
+  """Signal a worker's process group; returns False once it is gone."""
+  try:
+    if hasattr(os, "killpg"):
+      os.killpg(pid, signum)
+    else:
+      os.kill(pid, signum)
+  except OSError:
+    return False
+  return True
+
+
+def _analyze_track(
+  input_path: str,
+  engine: str,
+  extractor_bin: str,
+  work_root: str | None,
+) -> Dict[str, Any]:
+  """Process pool entrypoint for a single batch track."""
+  global _pool_executor
+  if _pool_executor is None:
+    _pool_executor = NoxtunizerExecutor(
+      extractor_bin=extractor_bin,
+      work_root=Path(work_root) if work_root else None,
+    )
+  return _pool_executor.analyze(Path(input_path), engine)
@@ -0,0 +1,41 @@
+"""
+Setup for Noxtunizer batch pool workers.
+
+A spawned worker imports this module to run its initializer before it
+imports the analysis code, so it must stay free of heavy imports: the
+thread caps only apply if they are in the environment before NumPy loads
+its BLAS.
+"""
+
+from __future__ import annotations
+
+import os
+from pathlib import Path
+
+from app.utils.threads import thread_env
+
+
+def init_pool_worker(cores: list[int], pid_dir: str) -> None:
+  """
+  Cap a batch pool worker to one thread and pin it to the reserved cores.
+
+  The worker becomes a process group leader, so cancellation can also kill
+  its extractor, and records its pid in `pid_dir` for the parent.
+  """
+  os.environ.update(thread_env(1))
+  if hasattr(os, "setpgrp"):
+    os.setpgrp()
+  if cores and hasattr(os, "sched_setaffinity"):
+    try:
+      os.sched_setaffinity(0, set(cores))
+    except OSError:
+      pass
+  (Path(pid_dir) / str(os.getpid())).touch()
+
+
+def worker_pids(pid_dir: str) -> list[int]:
+  """Pids recorded by the workers of the pool using `pid_dir`."""
+  try:
+    return [int(path.name) for path in Path(pid_dir).iterdir() if path.name.isdigit()]
+  except OSError:
+    return []
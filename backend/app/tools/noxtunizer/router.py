@@ -2,6 +2,8 @@
 
 from __future__ import annotations
 
+from typing import Optional
+
 from fastapi import APIRouter, Depends, File, Form, UploadFile
 from fastapi.responses import FileResponse
 from sqlmodel import Session
@@ -9,12 +11,16 @@ from sqlmodel import Session
 from app.db import get_session
 from app.jobs.schemas import JobEnqueued, JobsEnqueued
 from app.jobs.service import JobService
-from app.tools.noxtunizer.schemas import NoxtunizerJobRequest
+from app.tools.noxtunizer.schemas import NoxtunizerBatchRequest, NoxtunizerJobRequest
 from app.tools.noxtunizer.service import (
   download_source as download_noxtunizer_source,
+  enqueue_batch as enqueue_noxtunizer_batch,
   enqueue_jobs as enqueue_noxtunizer_jobs,
 )
-from app.tools.noxtunizer.validator import validate_request as validate_noxtunizer_request
+from app.tools.noxtunizer.validator import (
+  validate_batch_request as validate_noxtunizer_batch_request,
+  validate_request as validate_noxtunizer_request,
+)
 
 router = APIRouter(prefix="/api/noxtunizer", tags=["noxtunizer"])
 
@@ -34,10 +40,11 @@ def health() -> dict:
 async def create_job(
   files: list[UploadFile] = File(default=[]),
   file_ids: list[str] | None = Form(default=None),
+  engine: Optional[str] = Form(None),
   job_service: JobService = Depends(get_job_service),
 ) -> JobsEnqueued:
-  """Create Noxtunizer jobs."""
-  payload = NoxtunizerJobRequest(files=files, file_ids=file_ids or [])
+  """Create Noxtunizer jobs (engine: essentia or numpy)."""
+  payload = NoxtunizerJobRequest(files=files, file_ids=file_ids or [], engine=engine)
   params = validate_noxtunizer_request(payload)
   jobs = enqueue_noxtunizer_jobs(params, job_service)
   return JobsEnqueued(
@@ -52,6 +59,28 @@ async def create_job(
   )
 
 
+@router.post("/batch", response_model=JobEnqueued)
+async def create_batch_job(
+  file_ids: list[str] = Form(...),
+  engine: Optional[str] = Form(None),
+  job_service: JobService = Depends(get_job_service),
+) -> JobEnqueued:
+  """
+  Analyze many stored audio files in one job.
+
+  Per-track results are streamed as `job_progress` events and saved on each
+  file's `analysis` field.
+  """
+  payload = NoxtunizerBatchRequest(file_ids=file_ids, engine=engine)
+  params = validate_noxtunizer_batch_request(payload)
+  job, duplicate_of = enqueue_noxtunizer_batch(params, job_service)
+  return JobEnqueued(
+    job_id=job.id,
+    filename=job.input_filename,
+    duplicate_of=duplicate_of,
+  )
+
+
 @router.get("/source/{job_id}")
 def download_source(
   job_id: str,
@@ -2,7 +2,7 @@
 
 from __future__ import annotations
 
-from typing import List
+from typing import List, Optional
 
 from fastapi import UploadFile
 from pydantic import BaseModel, ConfigDict, Field
@@ -13,5 +13,13 @@ class NoxtunizerJobRequest(BaseModel):
 
   files: List[UploadFile] = Field(default_factory=list)
   file_ids: List[str] = Field(default_factory=list)
+  engine: Optional[str] = None
 
   model_config = ConfigDict(arbitrary_types_allowed=True)
+
+
+class NoxtunizerBatchRequest(BaseModel):
+  """Request payload for analyzing many stored files in one job."""
+
+  file_ids: List[str] = Field(default_factory=list)
+  engine: Optional[str] = None
@@ -2,10 +2,15 @@
 
 from __future__ import annotations
 
+from typing import Any
+
 from app.errors import NotFoundError
+from app.files.service import FileService
 from app.jobs.file_links import JobFileRole, JobFileService
 from app.jobs.model import Job, JobTool
 from app.jobs.service import JobService
+from app.tools.noxtunizer.engines import engine_version, resolve_engine
+from app.tools.noxtunizer.executor import BatchTrack
 from app.utils.files import build_download_name
 from app.utils.http import file_response
 
@@ -26,6 +31,110 @@ def enqueue_jobs(params: dict, job_service: JobService) -> list[tuple[Job, str |
   )
 
 
+def enqueue_batch(params: dict, job_service: JobService) -> tuple[Job, str | None]:
+  """Create one Noxtunizer job analyzing many stored audio files."""
+  inputs = job_service.prepare_file_inputs(
+    files=[],
+    file_ids=params["file_ids"],
+    expected_type="audio",
+  )
+  file_ids = sorted({file.id for file, _created in inputs})
+  return job_service.enqueue_job_for_signature(
+    tool=JobTool.NOXTUNIZER,
+    params={"mode": "batch", "engine": params["engine"], "file_ids": file_ids},
+    input_filename=f"{len(file_ids)} tracks",
+  )
+
+
+def is_batch_job(job: Job) -> bool:
+  """Return True for jobs created by `enqueue_batch`."""
+  return (job.params or {}).get("mode") == "batch"
+
+
+def batch_tracks(job: Job, job_service: JobService) -> list[BatchTrack]:
+  """Resolve the stored files of a batch job (missing files are skipped)."""
+  file_service = FileService(job_service.repo.session)
+  tracks: list[BatchTrack] = []
+  for file_id in (job.params or {}).get("file_ids") or []:
+    file = file_service.repo.get(file_id)
+    if not file:
+      continue
+    path = file_service.resolve_path(file)
+    if not path.is_file():
+      continue
+    media = file_service.inspect_media(file)
+    tracks.append(
+      BatchTrack(
+        file_id=file.id,
+        name=file.name,
+        path=path,
+        duration=media.duration if media else None,
+      )
+    )
+  return tracks
+
+
+def record_analysis(file_id: str | None, summary: dict[str, Any], job_service: JobService) -> None:
+  """Store an analysis summary on its file so library queries can use it."""
+  if not file_id or summary.get("cached"):
+    return
+  if summary.get("bpm") is None and summary.get("key") is None:
+    return
+  file_service = FileService(job_service.repo.session)
+  file = file_service.repo.get(file_id)
+  if not file:
+    return
+  try:
+    file_service.record_analysis(
+      file,
+      {
+        "bpm": summary.get("bpm"),
+        "key": summary.get("key"),
+        "duration": summary.get("duration"),
+        "engine": summary.get("engine"),
+        "analyzer_version": summary.get("analyzer_version"),
+      },
+    )
+  except Exception:
+    pass
+
+
+def record_input_analysis(job: Job, summary: dict[str, Any], job_service: JobService) -> None:
+  """Store a single-file job's analysis on its input file."""
+  input_file = JobFileService(job_service.repo.session).get_primary_input(job.id)
+  record_analysis(input_file.id if input_file else None, summary, job_service)
+
+
+def cached_analyses(
+  job: Job,
+  file_ids: list[str],
+  job_service: JobService,
+) -> dict[str, dict[str, Any]]:
+  """
+  Return stored analyses (by file id) that the job's engine can reuse.
+
+  Only rows produced by the same engine at its current version count.
+  """
+  engine = resolve_engine((job.params or {}).get("engine"))
+  version = engine_version(engine)
+  file_service = FileService(job_service.repo.session)
+  cached: dict[str, dict[str, Any]] = {}
+  for file_id in file_ids:
+    file = file_service.repo.get(file_id)
+    row = file_service.cached_analysis(file, engine=engine, version=version) if file else None
+    if row:
+      cached[file_id] = {"bpm": row.bpm, "key": row.key, "duration": row.duration}
+  return cached
+
+
+def cached_input_analysis(job: Job, job_service: JobService) -> dict[str, Any] | None:
+  """Return a reusable stored analysis of a single-file job's input."""
+  input_file = JobFileService(job_service.repo.session).get_primary_input(job.id)
+  if not input_file:
+    return None
+  return cached_analyses(job, [input_file.id], job_service).get(input_file.id)
+
+
 def download_source(job_id: str, job_service: JobService):
   """Return the uploaded source file for a Noxtunizer job."""
   job = job_service.get_job(job_id)
@@ -36,10 +145,18 @@ def download_source(job_id: str, job_service: JobService):
   if not input_file:
     raise NotFoundError("Source file not found")
 
-  path = file_links.file_service.resolve_path(input_file)
-  if not path.exists() or not path.is_file():
-    raise NotFoundError("Source file not found")
-
   label = file_links.get_label(job_id, input_file.id, JobFileRole.INPUT)
   download_name = build_download_name(input_file.name, label)
-  return file_response(path, filename=download_name)
+  lease = file_links.file_service.lease_blob(input_file)
+  if not lease:
+    raise NotFoundError("Source file not found")
+  file_links.file_service.mark_accessed(input_file)
+  return file_response(
+    lease.path,
+    filename=download_name,
+    codec=lease.codec,
+    size=input_file.size,
+    checksum=input_file.checksum,
+    on_close=lease.release,
+    thaw=lease.thaw,
+  )
@@ -3,9 +3,12 @@
 from __future__ import annotations
 
 from app.errors import ValidationError
-from app.tools.noxtunizer.schemas import NoxtunizerJobRequest
+from app.tools.noxtunizer.engines import resolve_engine
+from app.tools.noxtunizer.schemas import NoxtunizerBatchRequest, NoxtunizerJobRequest
 from app.utils.uploads import validate_uploads
 
+MAX_BATCH_FILES = 1000
+
 AUDIO_EXTENSIONS = {
   "wav",
   "mp3",
@@ -33,17 +36,33 @@ def validate_request(payload: NoxtunizerJobRequest) -> dict:
   if not has_files and not has_file_ids:
     raise ValidationError("Files or file_ids are required")
 
+  params: dict = {"engine": resolve_engine(payload.engine)}
+
   if has_file_ids:
     cleaned = [
       file_id.strip() for file_id in payload.file_ids if file_id and file_id.strip()
     ]
     if not cleaned:
       raise ValidationError("At least one file_id is required")
-    return {"file_ids": cleaned}
+    params["file_ids"] = cleaned
+    return params
 
   files = validate_uploads(
     payload.files,
     allowed_extensions=AUDIO_EXTENSIONS,
     allowed_mime_prefixes={"audio/"},
   )
-  return {"files": files}
+  params["files"] = files
+  return params
+
+
+def validate_batch_request(payload: NoxtunizerBatchRequest) -> dict:
+  """Validate a batch analysis request and return params."""
+  cleaned = list(
+    dict.fromkeys(file_id.strip() for file_id in payload.file_ids if file_id and file_id.strip())
+  )
+  if not cleaned:
+    raise ValidationError("At least one file_id is required")
+  if len(cleaned) > MAX_BATCH_FILES:
+    raise ValidationError(f"A batch accepts at most {MAX_BATCH_FILES} files")
+  return {"engine": resolve_engine(payload.engine), "file_ids": cleaned}
@@ -0,0 +1,255 @@
+"""Lossless codecs for the cold storage tier (zstd, and FLAC for PCM WAV)."""
+
+from __future__ import annotations
+
+import os
+import shutil
+import struct
+import subprocess
+from dataclasses import dataclass
+from pathlib import Path
+from typing import BinaryIO, Iterator
+
+ZSTD = "zstd"
+FLAC = "flac"
+# Evaluated for the cold tier but kept as-is (compression would not pay off).
+IDENTITY = "identity"
+COLD_CODECS = (ZSTD, FLAC)
+CODEC_SUFFIXES = {ZSTD: ".zst", FLAC: ".flac"}
+READ_SIZE = 1024 * 1024
+
+# FLAC blobs start with the WAV bytes FLAC cannot carry (everything before the
+# PCM samples, and anything after them), so decoding rebuilds the exact file:
+# magic, bits per sample, channels, sample rate, prefix length, suffix length.
+ENVELOPE_MAGIC = b"NXCW"
+ENVELOPE = struct.Struct("<4sBBIII")
+PCM_FORMATS = {16: "s16le", 24: "s24le"}
+WAVE_FORMAT_PCM = 1
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+
+@dataclass(frozen=True)
+class WavLayout:
+  """Where the PCM samples of a WAV file are, and how they are encoded."""
+
+  data_offset: int
+  data_size: int
+  bits: int
+  channels: int
+  sample_rate: int
+
+
+def codec_available(codec: str, *, zstd_bin: str = "zstd", ffmpeg_bin: str = "ffmpeg") -> bool:
+  """Whether the external tool a codec needs is on PATH."""
+  return shutil.which(ffmpeg_bin if codec == FLAC else zstd_bin) is not None
+
+
+def wav_layout(path: Path) -> WavLayout | None:
+  """
+  Locate the PCM data chunk of a 16/24-bit mono or stereo WAV file.
+
+  Returns None for anything FLAC cannot hold losslessly in that shape
+  (floats, other widths, multichannel, malformed files).
+  """
+  try:
+    with path.open("rb") as handle:
+      header = handle.read(12)
+      if len(header) < 12 or header[:4] != b"RIFF" or header[8:12] != b"WAVE":
+        return None
+      fmt: tuple[int, int, int, int] | None = None
+      while True:
+        chunk = handle.read(8)
+        if len(chunk) < 8:
+          return None
+        chunk_id, chunk_size = chunk[:4], struct.unpack("<I", chunk[4:])[0]
+        if chunk_id == b"fmt ":
+          body = handle.read(chunk_size)
+          if len(body) < 16:
+            return None
+          tag, channels, rate = struct.unpack_from("<HHI", body)
+          bits = struct.unpack_from("<H", body, 14)[0]
+          if tag == WAVE_FORMAT_EXTENSIBLE and len(body) >= 26:
+            tag = struct.unpack_from("<H", body, 24)[0]
+          fmt = (tag, channels, rate, bits)
+          handle.seek(chunk_size % 2, os.SEEK_CUR)
+        elif chunk_id == b"data":
+          if not fmt:
+            return None
+          tag, channels, rate, bits = fmt
+          if tag != WAVE_FORMAT_PCM or bits not in PCM_FORMATS or channels not in (1, 2):
+            return None
+          offset = handle.tell()
+          available = os.fstat(handle.fileno()).st_size - offset
+          block = channels * bits // 8
+          size = min(chunk_size, available)
+          return WavLayout(offset, size - size % block, bits, channels, rate)
+        else:
+          handle.seek(chunk_size + chunk_size % 2, os.SEEK_CUR)
+  except (OSError, struct.error):
+    return None
+
+
+def encode_file(
+  source: Path,
+  dest: Path,
+  codec: str,
+  *,
+  layout: WavLayout | None = None,
+  zstd_bin: str = "zstd",
+  ffmpeg_bin: str = "ffmpeg",
+) -> None:
+  """
+  Compress `source` into `dest` with `codec`.
+
+  FLAC needs the `layout` from `wav_layout`. Raises OSError or ValueError on
+  failure; callers verify the result by decoding it.
+  """
+  with dest.open("wb") as out:
+    if codec == ZSTD:
+      _run([zstd_bin, "-q", "-3", "-T0", "-c", str(source)], stdout=out)
+      return
+    if codec != FLAC or layout is None:
+      raise ValueError(f"Cannot encode with {codec}")
+
+    size = source.stat().st_size
+    suffix_start = layout.data_offset + layout.data_size
+    with source.open("rb") as src:
+      prefix = src.read(layout.data_offset)
+      src.seek(suffix_start)
+      suffix = src.read(size - suffix_start)
+    out.write(
+      ENVELOPE.pack(
+        ENVELOPE_MAGIC,
+        layout.bits,
+        layout.channels,
+        layout.sample_rate,
+        len(prefix),
+        len(suffix),
+      )
+    )
+    out.write(prefix)
+    out.write(suffix)
+    out.flush()
+    proc = subprocess.Popen(
+      [
+        ffmpeg_bin,
+        "-v",
+        "error",
+        "-f",
+        PCM_FORMATS[layout.bits],
+        "-ar",
+        str(layout.sample_rate),
+        "-ac",
+        str(layout.channels),
+        "-i",
+        "pipe:0",
+        "-c:a",
+        "flac",
+        "-compression_level",
+        "5",
+        "-f",
+        "flac",
+        "pipe:1",
+      ],
+      stdin=subprocess.PIPE,
+      stdout=out,
+      stderr=subprocess.DEVNULL,
+    )
+    assert proc.stdin is not None
+    try:
+      with source.open("rb") as src:
+        src.seek(layout.data_offset)
+        remaining = layout.data_size
+        while remaining > 0:
+          chunk = src.read(min(READ_SIZE, remaining))
+          if not chunk:
+            break
+          proc.stdin.write(chunk)
+          remaining -= len(chunk)
+    finally:
+      proc.stdin.close()
+      if proc.wait() != 0:
+        raise OSError(f"{Path(ffmpeg_bin).name} failed to encode FLAC")
+
+
+def iter_decoded(
+  path: Path,
+  codec: str,
+  *,
+  zstd_bin: str = "zstd",
+  ffmpeg_bin: str = "ffmpeg",
+) -> Iterator[bytes]:
+  """Stream the original bytes of a blob compressed with `codec`."""
+  if codec == ZSTD:
+    yield from _stream([zstd_bin, "-d", "-q", "-c", str(path)])
+    return
+  if codec != FLAC:
+    raise ValueError(f"Unknown codec: {codec}")
+
+  with path.open("rb", buffering=0) as handle:
+    magic, bits, channels, rate, prefix_len, suffix_len = ENVELOPE.unpack(
+      _read_exact(handle, ENVELOPE.size)
+    )
+    if magic != ENVELOPE_MAGIC or bits not in PCM_FORMATS:
+      raise ValueError("Unsupported cold blob")
+    prefix = _read_exact(handle, prefix_len)
+    suffix = _read_exact(handle, suffix_len)
+    yield prefix
+    # ffmpeg reads the FLAC stream from the shared descriptor, which is
+    # already positioned right after the envelope.
+    yield from _stream(
+      [
+        ffmpeg_bin,
+        "-v",
+        "error",
+        "-f",
+        "flac",
+        "-i",
+        "pipe:0",
+        "-f",
+        PCM_FORMATS[bits],
+        "-ar",
+        str(rate),
+        "-ac",
+        str(channels),
+        "pipe:1",
+      ],
+      stdin=handle,
+    )
+    yield suffix
+
+
+def _run(cmd: list[str], *, stdout: BinaryIO) -> None:
+  result = subprocess.run(cmd, stdout=stdout, stderr=subprocess.PIPE, check=False)
+  if result.returncode != 0:
+    detail = result.stderr.decode(errors="replace").strip()
+    raise OSError(f"{Path(cmd[0]).name} failed: {detail or result.returncode}")
+
+
+def _stream(cmd: list[str], *, stdin: BinaryIO | None = None) -> Iterator[bytes]:
+  proc = subprocess.Popen(
+    cmd,
+    stdin=stdin if stdin is not None else subprocess.DEVNULL,
+    stdout=subprocess.PIPE,
+    stderr=subprocess.DEVNULL,
+  )
+  assert proc.stdout is not None
+  finished = False
+  try:
+    while chunk := proc.stdout.read(READ_SIZE):
+      yield chunk
+    finished = True
+  finally:
+    proc.stdout.close()
+    if not finished:
+      proc.kill()
+    proc.wait()
+  if proc.returncode != 0:
+    raise OSError(f"{Path(cmd[0]).name} failed to decode")
+
+
+def _read_exact(handle: BinaryIO, size: int) -> bytes:
+  data = handle.read(size)
+  if len(data) != size:
+    raise ValueError("Truncated cold blob")
+  return data
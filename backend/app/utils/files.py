@@ -19,6 +19,7 @@ KNOWN_SUFFIXES = (
   "_other",
   "_bass",
   "_drums",
+  "_accompaniment",
 )
 
 
@@ -37,26 +38,6 @@ def ensure_path(
   return resolved
 
 
-def snapshot_files(directory: Path) -> set[Path]:
-  """Snapshot current files in a directory."""
-  if not directory.exists():
-    return set()
-  return {path for path in directory.iterdir() if path.is_file()}
-
-
-def detect_new_file(directory: Path, before: set[Path], label: str) -> Path:
-  """Detect exactly one new file in a directory."""
-  after = snapshot_files(directory)
-  created = list(after - before)
-
-  if not created:
-    raise ExecutionError(f"No {label} file was created")
-  if len(created) > 1:
-    raise ExecutionError(f"Multiple {label} files were created")
-
-  return created[0]
-
-
 def cleanup_directory(directory: Path, keep: Iterable[str]) -> None:
   """Remove files in a directory except for the kept filenames."""
   keep_set = set(keep)
@@ -0,0 +1,124 @@
+"""Content hashing helpers (SHA-256) shared by storage and executors."""
+
+from __future__ import annotations
+
+import hashlib
+import mmap
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import BinaryIO, Iterable
+
+HASH_CHUNK_SIZE = 1024 * 1024
+# Files at least this large are hashed through one mmap-backed update, which
+# hashes the page cache directly (no copies into Python bytes) without the GIL.
+MMAP_MIN_BYTES = 4 * 1024 * 1024
+HASH_WORKERS = max(1, min(8, os.cpu_count() or 1))
+
+_buffers = threading.local()
+
+
+class HashingWriter:
+  """
+  File-like wrapper that hashes and counts bytes as they are written, so an
+  output's checksum is known the moment it is closed.
+  """
+
+  def __init__(self, handle: BinaryIO) -> None:
+    self.handle = handle
+    self.size = 0
+    self._hasher = hashlib.sha256()
+
+  def write(self, data: bytes) -> int:
+    written = self.handle.write(data)
+    self._hasher.update(data)
+    self.size += len(data)
+    return written
+
+  @property
+  def checksum(self) -> str:
+    return self._hasher.hexdigest()
+
+
+def hash_file(path: Path) -> tuple[str, int]:
+  """
+  Compute the SHA-256 checksum and size of a file.
+
+  Large files are hashed through mmap; smaller ones (or files that cannot be
+  mapped) with `hashlib.file_digest`, or `readinto` a reusable buffer.
+  """
+  with path.open("rb", buffering=0) as handle:
+    size = os.fstat(handle.fileno()).st_size
+    if size >= MMAP_MIN_BYTES:
+      try:
+        with mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+          return hashlib.sha256(mapped).hexdigest(), len(mapped)
+      except (OSError, ValueError):
+        handle.seek(0)
+    if hasattr(hashlib, "file_digest"):
+      digest = hashlib.file_digest(handle, "sha256")
+      return digest.hexdigest(), handle.tell()
+    return hash_stream(handle)
+
+
+def hash_stream(stream: BinaryIO) -> tuple[str, int]:
+  """Hash a stream from its current position to the end."""
+  hasher = hashlib.sha256()
+  size = 0
+  for chunk in iter_chunks(stream):
+    hasher.update(chunk)
+    size += len(chunk)
+  return hasher.hexdigest(), size
+
+
+def hash_chunks(chunks: Iterable[bytes]) -> tuple[str, int]:
+  """Hash an iterable of byte chunks (e.g. a decoder's output)."""
+  hasher = hashlib.sha256()
+  size = 0
+  for chunk in chunks:
+    hasher.update(chunk)
+    size += len(chunk)
+  return hasher.hexdigest(), size
+
+
+def iter_chunks(stream: BinaryIO) -> Iterable[memoryview]:
+  """
+  Yield views of a stream read into a reusable per-thread buffer.
+
+  Each view is only valid until the next one is requested.
+  """
+  buffer = _buffer()
+  view = memoryview(buffer)
+  readinto = getattr(stream, "readinto", None)
+  while True:
+    if readinto is not None:
+      count = readinto(buffer)
+      if not count:
+        return
+      yield view[:count]
+    else:
+      chunk = stream.read(HASH_CHUNK_SIZE)
+      if not chunk:
+        return
+      yield memoryview(chunk)
+
+
+def hash_files(paths: Iterable[Path], *, max_workers: int | None = None) -> list[tuple[str, int]]:
+  """
+  Hash several files concurrently (hashlib releases the GIL on large
+  updates) and return (checksum, size) in input order.
+  """
+  items = list(paths)
+  if len(items) <= 1:
+    return [hash_file(path) for path in items]
+  workers = min(len(items), max_workers or HASH_WORKERS)
+  with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="hash") as pool:
+    return list(pool.map(hash_file, items))
+
+
+def _buffer() -> bytearray:
+  buffer = getattr(_buffers, "buffer", None)
+  if buffer is None:
+    buffer = _buffers.buffer = bytearray(HASH_CHUNK_SIZE)
+  return buffer
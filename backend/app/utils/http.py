@@ -2,17 +2,272 @@
 
 from __future__ import annotations
 
+import re
 from mimetypes import guess_type
 from pathlib import Path
+from typing import Callable, Iterator
+from urllib.parse import quote
 
-from fastapi.responses import FileResponse
+from fastapi.responses import FileResponse, PlainTextResponse, Response, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from starlette.datastructures import Headers
+from starlette.types import Receive, Scope, Send
 
+from app.utils.compression import COLD_CODECS, iter_decoded
 
-def file_response(path: Path, *, filename: str | None = None) -> FileResponse:
-  """Build a FileResponse with a best-effort media type."""
-  media_type, _ = guess_type(path.name)
-  return FileResponse(
-    path=str(path),
-    media_type=media_type or "application/octet-stream",
-    filename=filename or path.name,
-  )
+# A checksum-named blob never changes, so URLs that identify one file can be
+# cached for good; URLs that may point at a newer file later revalidate.
+IMMUTABLE_CACHE = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE = "no-cache"
+UNSATISFIABLE = (0, 0)
+RANGE_SPEC = re.compile(r"^\s*(\d*)\s*-\s*(\d*)\s*$")
+
+
+def file_response(
+  path: Path,
+  *,
+  filename: str | None = None,
+  codec: str | None = None,
+  size: int | None = None,
+  checksum: str | None = None,
+  immutable: bool = False,
+  on_close: Callable[[], None] | None = None,
+  thaw: Callable[[], Path] | None = None,
+) -> Response:
+  """
+  Build a download response with a best-effort media type, guessed from the
+  download name (stored blobs have no extension).
+
+  Single and multipart `Range` requests are answered with 206; a Range
+  header that is not valid syntax (e.g. `bytes=5-3`) is ignored. With a
+  `checksum` the response carries it as a strong ETag and answers a matching
+  `If-None-Match` with 304; `immutable` marks the URL as cacheable forever
+  (only for URLs that can never serve other bytes), otherwise clients
+  revalidate each time.
+
+  Blobs in the cold tier (`codec` set) are decoded on the fly; `size` is the
+  original length, sent as Content-Length. A Range request on one calls
+  `thaw` (which returns the plain file) and is then served like a hot file,
+  so seeking players do not decode from byte 0 on every request; without
+  `thaw`, a single range is decoded up to its end.
+
+  `on_close` runs once the response is sent or aborted (e.g. to release a
+  `BlobLease` on the file).
+  """
+  download_name = filename or path.name
+  media_type, _ = guess_type(download_name)
+  media_type = media_type or "application/octet-stream"
+  headers = {"Content-Disposition": _content_disposition(download_name)}
+  if checksum:
+    headers["ETag"] = f'"{checksum}"'
+    headers["Cache-Control"] = IMMUTABLE_CACHE if immutable else REVALIDATE_CACHE
+
+  if codec not in COLD_CODECS:
+    response: Response = CachedFileResponse(path=str(path), media_type=media_type, headers=headers)
+  else:
+    response = DecodedFileResponse(
+      path, codec, size=size, media_type=media_type, headers=headers, thaw=thaw
+    )
+  response.on_close = on_close
+  return response
+
+
+def cached_bytes_response(content: bytes, *, etag: str, media_type: str) -> Response:
+  """
+  Build a response for bytes derived from immutable content (e.g. waveform
+  peaks of a checksum): cacheable forever under the strong ETag `etag`, and
+  answering a matching `If-None-Match` with 304.
+  """
+  headers = {"ETag": f'"{etag}"', "Cache-Control": IMMUTABLE_CACHE}
+  return CachedBytesResponse(content=content, media_type=media_type, headers=headers)
+
+
+class CachedBytesResponse(Response):
+  """In-memory Response that answers If-None-Match with 304."""
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    if _not_modified(scope, self.headers.get("etag")):
+      await _not_modified_response(self.headers)(scope, receive, send)
+      return
+    await super().__call__(scope, receive, send)
+
+
+class CachedFileResponse(FileResponse):
+  """
+  FileResponse (Range, If-Range) that also answers If-None-Match with 304
+  and ignores malformed Range headers instead of answering 400.
+  """
+
+  on_close: Callable[[], None] | None = None
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    try:
+      if _not_modified(scope, self.headers.get("etag")):
+        await _not_modified_response(self.headers)(scope, receive, send)
+        return
+      header = Headers(scope=scope).get("range")
+      if header is not None and _range_specs(header) is None:
+        scope = {**scope, "headers": [(k, v) for k, v in scope["headers"] if k != b"range"]}
+      await super().__call__(scope, receive, send)
+    finally:
+      if self.on_close:
+        self.on_close()
+
+
+class DecodedFileResponse(Response):
+  """
+  Streams the original bytes of a cold blob. Range requests thaw the blob
+  and are served from the plain file; without `thaw`, a single Range is
+  decoded up to its end.
+  """
+
+  def __init__(
+    self,
+    path: Path,
+    codec: str,
+    *,
+    size: int | None,
+    media_type: str,
+    headers: dict[str, str],
+    thaw: Callable[[], Path] | None = None,
+  ) -> None:
+    super().__init__(media_type=media_type, headers=headers)
+    self.path = path
+    self.codec = codec
+    self.size = size
+    self.thaw = thaw
+    self.on_close: Callable[[], None] | None = None
+
+  async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+    try:
+      await self._send(scope, receive, send)
+    finally:
+      if self.on_close:
+        self.on_close()
+
+  async def _send(self, scope: Scope, receive: Receive, send: Send) -> None:
+    etag = self.headers.get("etag")
+    if _not_modified(scope, etag):
+      await _not_modified_response(self.headers)(scope, receive, send)
+      return
+
+    headers = {key: value for key, value in self.headers.items() if key != "content-length"}
+    if self.thaw and _wants_range(Headers(scope=scope), etag):
+      path = await run_in_threadpool(self.thaw)
+      hot = CachedFileResponse(path=str(path), media_type=self.media_type, headers=headers)
+      await hot(scope, receive, send)
+      return
+
+    byte_range = None
+    if self.size is not None:
+      headers["Accept-Ranges"] = "bytes"
+      headers["Content-Length"] = str(self.size)
+      byte_range = _requested_range(Headers(scope=scope), etag, self.size)
+
+    if byte_range is None:
+      response: Response = StreamingResponse(iter_decoded(self.path, self.codec), headers=headers)
+    elif byte_range == UNSATISFIABLE:
+      response = PlainTextResponse(status_code=416, headers={"Content-Range": f"*/{self.size}"})
+    else:
+      start, end = byte_range
+      headers["Content-Range"] = f"bytes {start}-{end - 1}/{self.size}"
+      headers["Content-Length"] = str(end - start)
+      response = StreamingResponse(
+        _slice(iter_decoded(self.path, self.codec), start, end),
+        status_code=206,
+        headers=headers,
+      )
+    await response(scope, receive, send)
+
+
+def _not_modified(scope: Scope, etag: str | None) -> bool:
+  header = Headers(scope=scope).get("if-none-match")
+  if not etag or not header:
+    return False
+  tags = [tag.strip() for tag in header.split(",")]
+  return "*" in tags or any(tag.removeprefix("W/") == etag for tag in tags)
+
+
+def _not_modified_response(headers: Headers) -> Response:
+  kept = {key: headers[key] for key in ("etag", "cache-control") if key in headers}
+  return Response(status_code=304, headers=kept)
+
+
+def _requested_range(headers: Headers, etag: str | None, size: int) -> tuple[int, int] | None:
+  """
+  Parse a single `bytes=` range into a half-open (start, end).
+
+  Returns None to serve the whole file (no, malformed or multiple ranges, or
+  a stale If-Range) and UNSATISFIABLE when the range is not satisfiable.
+  """
+  if not _wants_range(headers, etag):
+    return None
+  specs = _range_specs(headers["range"]) or []
+  if len(specs) != 1:
+    return None
+  first, last = specs[0]
+  if first:
+    start = int(first)
+    end = min(int(last) + 1, size) if last else size
+  else:
+    start, end = max(size - int(last), 0), size
+  if start >= size or start >= end:
+    return UNSATISFIABLE
+  return start, end
+
+
+def _wants_range(headers: Headers, etag: str | None) -> bool:
+  """Whether a valid Range header applies (If-Range, if any, matches)."""
+  header = headers.get("range")
+  if_range = headers.get("if-range")
+  if not header or (if_range is not None and if_range != etag):
+    return False
+  return _range_specs(header) is not None
+
+
+def _range_specs(header: str) -> list[tuple[str, str]] | None:
+  """
+  Split a `bytes=` Range header into (first, last) digit strings.
+
+  Returns None when the header is not valid syntax (another unit, a spec
+  like `5-3` or `abc`), which RFC 9110 says to ignore rather than reject.
+  """
+  unit, sep, spec = header.partition("=")
+  if unit.strip().lower() != "bytes" or not sep:
+    return None
+  specs: list[tuple[str, str]] = []
+  for part in spec.split(","):
+    if not part.strip():
+      continue
+    match = RANGE_SPEC.match(part)
+    if not match or not any(match.groups()):
+      return None
+    first, last = match.groups()
+    if first and last and int(last) < int(first):
+      return None
+    specs.append((first, last))
+  return specs or None
+
+
+def _slice(chunks: Iterator[bytes], start: int, end: int) -> Iterator[bytes]:
+  """Yield bytes [start, end) of a chunk stream, closing it once past `end`."""
+  offset = 0
+  try:
+    for chunk in chunks:
+      chunk_end = offset + len(chunk)
+      if chunk_end > start:
+        yield chunk[max(start - offset, 0) : end - offset]
+      offset = chunk_end
+      if offset >= end:
+        return
+  finally:
+    close = getattr(chunks, "close", None)
+    if close:
+      close()
+
+
+def _content_disposition(filename: str) -> str:
+  quoted = quote(filename)
+  if quoted != filename:
+    return f"attachment; filename*=utf-8''{quoted}"
+  return f'attachment; filename="{filename}"'
@@ -20,12 +20,22 @@ IMAGE_VARIANTS: dict[str, dict[str, int | str]] = {
 }
 
 
-def build_image_variant(original: Path, *, variant: str) -> Optional[tuple[bytes, str]]:
-  """Build an image variant in-memory and return its bytes + media type."""
+def build_image_variant(
+  original: Path,
+  *,
+  variant: str,
+  name: str | None = None,
+) -> Optional[tuple[bytes, str]]:
+  """
+  Build an image variant in-memory and return its bytes + media type.
+
+  `name` is the original file name, used for the extension check when the
+  stored path has none.
+  """
   try:
     if variant not in IMAGE_VARIANTS:
       return None
-    if original.suffix.lower() not in IMAGE_SUPPORTED_EXTENSIONS:
+    if Path(name or original.name).suffix.lower() not in IMAGE_SUPPORTED_EXTENSIONS:
       return None
     if not original.exists() or not original.is_file():
       return None
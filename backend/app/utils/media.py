@@ -0,0 +1,194 @@
+"""Media inspection helpers backed by a single ffprobe call."""
+
+from __future__ import annotations
+
+import json
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any
+
+PROBE_TIMEOUT_SECONDS = 30
+
+
+@dataclass(frozen=True)
+class MediaStream:
+  """Normalized subset of an ffprobe stream entry."""
+
+  index: int
+  codec_type: str
+  codec_name: str | None = None
+  width: int | None = None
+  height: int | None = None
+  sample_rate: int | None = None
+  channels: int | None = None
+  bit_rate: int | None = None
+  duration: float | None = None
+
+
+@dataclass(frozen=True)
+class MediaInfo:
+  """
+  Normalized ffprobe result for a media file.
+
+  Instances are JSON round-trippable through `to_dict`/`from_dict` so they can
+  be cached on the File record and reused across tools.
+  """
+
+  format_name: str | None = None
+  duration: float | None = None
+  bit_rate: int | None = None
+  size: int | None = None
+  streams: list[MediaStream] = field(default_factory=list)
+
+  @property
+  def video(self) -> MediaStream | None:
+    """Return the first video stream, if any."""
+    return self._first_stream("video")
+
+  @property
+  def audio(self) -> MediaStream | None:
+    """Return the first audio stream, if any."""
+    return self._first_stream("audio")
+
+  @property
+  def width(self) -> int | None:
+    return self.video.width if self.video else None
+
+  @property
+  def height(self) -> int | None:
+    return self.video.height if self.video else None
+
+  @property
+  def sample_rate(self) -> int | None:
+    return self.audio.sample_rate if self.audio else None
+
+  @property
+  def channels(self) -> int | None:
+    return self.audio.channels if self.audio else None
+
+  @property
+  def audio_bitrate_kbps(self) -> int | None:
+    """Return the audio bitrate in kbps, falling back to the container rate."""
+    bps = self.audio.bit_rate if self.audio else None
+    if bps is None and self.audio and not self.video:
+      bps = self.bit_rate
+    return int(bps / 1000) if bps else None
+
+  def to_dict(self) -> dict[str, Any]:
+    """Return a JSON-serializable dictionary."""
+    return asdict(self)
+
+  @classmethod
+  def from_dict(cls, data: dict[str, Any] | None) -> MediaInfo | None:
+    """Rebuild a MediaInfo from a cached dictionary."""
+    if not isinstance(data, dict):
+      return None
+    try:
+      streams = [MediaStream(**stream) for stream in data.get("streams") or []]
+      return cls(
+        format_name=data.get("format_name"),
+        duration=data.get("duration"),
+        bit_rate=data.get("bit_rate"),
+        size=data.get("size"),
+        streams=streams,
+      )
+    except Exception:
+      return None
+
+  @classmethod
+  def from_ffprobe(cls, payload: dict[str, Any]) -> MediaInfo:
+    """Normalize raw `ffprobe -show_streams -show_format` JSON output."""
+    fmt = payload.get("format") or {}
+    streams: list[MediaStream] = []
+    for position, raw in enumerate(payload.get("streams") or []):
+      codec_type = str(raw.get("codec_type") or "")
+      if not codec_type:
+        continue
+      streams.append(
+        MediaStream(
+          index=_as_int(raw.get("index")) or position,
+          codec_type=codec_type,
+          codec_name=raw.get("codec_name"),
+          width=_as_int(raw.get("width")),
+          height=_as_int(raw.get("height")),
+          sample_rate=_as_int(raw.get("sample_rate")),
+          channels=_as_int(raw.get("channels")),
+          bit_rate=_as_int(raw.get("bit_rate")),
+          duration=_as_float(raw.get("duration")),
+        )
+      )
+    return cls(
+      format_name=fmt.get("format_name"),
+      duration=_as_float(fmt.get("duration")),
+      bit_rate=_as_int(fmt.get("bit_rate")),
+      size=_as_int(fmt.get("size")),
+      streams=streams,
+    )
+
+  def _first_stream(self, codec_type: str) -> MediaStream | None:
+    return next((stream for stream in self.streams if stream.codec_type == codec_type), None)
+
+
+def is_wav_file(path: Path) -> bool:
+  """
+  Sniff a RIFF/WAVE header; stored blobs carry no extension to go by.
+  """
+  try:
+    with path.open("rb") as handle:
+      header = handle.read(12)
+  except OSError:
+    return False
+  return header[:4] == b"RIFF" and header[8:12] == b"WAVE"
+
+
+def probe_media(path: Path, *, ffprobe_bin: str = "ffprobe") -> MediaInfo | None:
+  """
+  Inspect a media file with a single ffprobe process.
+
+  Returns None when ffprobe is unavailable or cannot parse the file.
+  """
+  if not path.exists() or not path.is_file():
+    return None
+
+  cmd = [
+    ffprobe_bin,
+    "-v", "error",
+    "-show_streams",
+    "-show_format",
+    "-of", "json",
+    str(path),
+  ]
+  # Imported here: app.worker pulls in the job and file services, which
+  # import this module.
+  from app.worker.process import run_capture
+
+  try:
+    proc = run_capture(cmd, timeout=PROBE_TIMEOUT_SECONDS)
+  except Exception:
+    return None
+
+  if proc.returncode != 0:
+    return None
+
+  try:
+    return MediaInfo.from_ffprobe(json.loads(proc.stdout or "{}"))
+  except Exception:
+    return None
+
+
+def _as_int(value: Any) -> int | None:
+  if isinstance(value, bool) or value is None:
+    return None
+  try:
+    return int(float(value))
+  except Exception:
+    return None
+
+
+def _as_float(value: Any) -> float | None:
+  if isinstance(value, bool) or value is None:
+    return None
+  try:
+    return float(value)
+  except Exception:
+    return None
@@ -0,0 +1,187 @@
+"""Waveform peak helpers (multi-resolution min/max envelopes)."""
+
+from __future__ import annotations
+
+import struct
+import subprocess
+import wave
+from pathlib import Path
+from typing import Iterator
+
+import numpy as np
+
+from app.utils.media import is_wav_file
+
+PEAK_MAGIC = b"NXPK"
+PEAK_VERSION = 1
+# Samples per bucket of each zoom level, finest first; every level is a whole
+# multiple of the first so coarser levels are reduced from it.
+PEAK_LEVELS = (256, 1024, 4096, 16384)
+PEAK_DECODE_RATE = 44100
+DEFAULT_PEAK_BUCKETS = 2048
+READ_FRAMES = PEAK_LEVELS[0] * 1024
+
+# magic, version, bits per value, sample rate, samples per bucket, bucket count
+HEADER = struct.Struct("<4sBBIII")
+
+
+def compute_peaks(path: Path, *, ffmpeg_bin: str = "ffmpeg") -> bytes | None:
+  """
+  Decode an audio file once and encode min/max peaks for every PEAK_LEVELS
+  zoom level.
+
+  Each level is a header followed by interleaved int8 (min, max) pairs; the
+  result is the levels concatenated finest first. WAV files are read
+  in-process, other formats through one ffmpeg pipe. Returns None when the
+  audio cannot be decoded; raises OSError when the file cannot be read or
+  ffmpeg cannot be started.
+  """
+  try:
+    if is_wav_file(path):
+      try:
+        return _encode_levels(*_wav_blocks(path))
+      except (wave.Error, EOFError, ValueError):
+        pass
+    return _encode_levels(*_ffmpeg_blocks(path, ffmpeg_bin))
+  except ValueError:
+    return None
+
+
+def select_level(data: bytes, *, max_buckets: int = DEFAULT_PEAK_BUCKETS) -> bytes:
+  """
+  Return the finest level of `data` with at most `max_buckets` buckets (the
+  coarsest level when none fits), as a standalone single-level payload.
+  """
+  levels = list(iter_levels(data))
+  if not levels:
+    raise ValueError("Peak data contains no levels")
+  for start, end, bucket_count in levels:
+    if bucket_count <= max_buckets:
+      return data[start:end]
+  start, end, _ = levels[-1]
+  return data[start:end]
+
+
+def iter_levels(data: bytes) -> Iterator[tuple[int, int, int]]:
+  """Yield (start, end, bucket_count) byte ranges of each encoded level."""
+  offset = 0
+  while offset + HEADER.size <= len(data):
+    magic, version, _bits, _rate, _per_bucket, bucket_count = HEADER.unpack_from(data, offset)
+    if magic != PEAK_MAGIC or version != PEAK_VERSION:
+      raise ValueError("Unsupported peak data")
+    end = offset + HEADER.size + bucket_count * 2
+    yield offset, end, bucket_count
+    offset = end
+
+
+def _encode_levels(sample_rate: int, blocks: Iterator[np.ndarray]) -> bytes:
+  finest = PEAK_LEVELS[0]
+  mins: list[np.ndarray] = []
+  maxs: list[np.ndarray] = []
+  carry: np.ndarray | None = None
+
+  for block in blocks:
+    if carry is not None and carry.size:
+      block = np.concatenate([carry, block])
+    usable = block.shape[0] - block.shape[0] % finest
+    if usable:
+      buckets = block[:usable].reshape(-1, finest, block.shape[1])
+      mins.append(buckets.min(axis=(1, 2)))
+      maxs.append(buckets.max(axis=(1, 2)))
+    carry = block[usable:]
+  if carry is not None and carry.size:
+    mins.append(carry.min(keepdims=True).reshape(1))
+    maxs.append(carry.max(keepdims=True).reshape(1))
+
+  low = np.concatenate(mins) if mins else np.zeros(0, dtype=np.float32)
+  high = np.concatenate(maxs) if maxs else np.zeros(0, dtype=np.float32)
+
+  parts: list[bytes] = []
+  for per_bucket in PEAK_LEVELS:
+    factor = per_bucket // finest
+    level_low = _reduce(low, factor, np.inf).min(axis=1)
+    level_high = _reduce(high, factor, -np.inf).max(axis=1)
+    pairs = np.empty((level_low.shape[0], 2), dtype=np.int8)
+    pairs[:, 0] = np.clip(np.floor(level_low * 127.0), -128, 127)
+    pairs[:, 1] = np.clip(np.ceil(level_high * 127.0), -128, 127)
+    parts.append(HEADER.pack(PEAK_MAGIC, PEAK_VERSION, 8, sample_rate, per_bucket, pairs.shape[0]))
+    parts.append(pairs.tobytes())
+  return b"".join(parts)
+
+
+def _reduce(values: np.ndarray, factor: int, fill: float) -> np.ndarray:
+  padding = -values.shape[0] % factor
+  if padding:
+    values = np.concatenate([values, np.full(padding, fill, dtype=values.dtype)])
+  return values.reshape(-1, factor)
+
+
+def _wav_blocks(path: Path) -> tuple[int, Iterator[np.ndarray]]:
+  reader = wave.open(str(path), "rb")
+  width = reader.getsampwidth()
+  if width not in (1, 2, 4):
+    reader.close()
+    raise ValueError(f"Unsupported WAV sample width: {width}")
+
+  def blocks() -> Iterator[np.ndarray]:
+    channels = reader.getnchannels()
+    with reader:
+      while True:
+        raw = reader.readframes(READ_FRAMES)
+        if not raw:
+          return
+        yield _pcm_to_float(raw, width).reshape(-1, channels)
+
+  return reader.getframerate(), blocks()
+
+
+def _ffmpeg_blocks(path: Path, ffmpeg_bin: str) -> tuple[int, Iterator[np.ndarray]]:
+  proc = subprocess.Popen(
+    [
+      ffmpeg_bin,
+      "-v",
+      "error",
+      "-nostdin",
+      "-i",
+      str(path),
+      "-map",
+      "0:a:0",
+      "-ac",
+      "1",
+      "-ar",
+      str(PEAK_DECODE_RATE),
+      "-f",
+      "s16le",
+      "pipe:1",
+    ],
+    stdout=subprocess.PIPE,
+    stderr=subprocess.DEVNULL,
+  )
+
+  def blocks() -> Iterator[np.ndarray]:
+    assert proc.stdout is not None
+    pending = b""
+    try:
+      while True:
+        raw = proc.stdout.read(READ_FRAMES * 2)
+        if not raw:
+          break
+        raw = pending + raw
+        usable = len(raw) - len(raw) % 2
+        pending = raw[usable:]
+        yield _pcm_to_float(raw[:usable], 2).reshape(-1, 1)
+    finally:
+      proc.stdout.close()
+      if proc.wait() != 0:
+        raise ValueError("Audio decode failed")
+
+  return PEAK_DECODE_RATE, blocks()
+
+
+def _pcm_to_float(raw: bytes, width: int) -> np.ndarray:
+  if width == 1:
+    return (np.frombuffer(raw, dtype=np.uint8).astype(np.float32) - 128.0) / 128.0
+  if width == 2:
+    return np.frombuffer(raw, dtype="<i2").astype(np.float32) / 32768.0
+  return np.frombuffer(raw, dtype="<i4").astype(np.float32) / 2147483648.0
+
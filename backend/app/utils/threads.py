@@ -0,0 +1,14 @@
+"""Thread pool caps for native libraries (OpenMP, MKL, BLAS)."""
+
+from __future__ import annotations
+
+
+def thread_env(threads: int) -> dict[str, str]:
+  """Environment overrides that cap OpenMP/MKL/BLAS thread pools."""
+  value = str(max(1, threads))
+  return {
+    "OMP_NUM_THREADS": value,
+    "MKL_NUM_THREADS": value,
+    "OPENBLAS_NUM_THREADS": value,
+    "NUMEXPR_NUM_THREADS": value,
+  }
@@ -1,6 +1,13 @@
 """Execution runner for the job system."""
 
-from app.worker.cancellation import CancellationToken, JobCancelled
-from app.worker.worker import JobExecutor, JobWorker
+from app.worker.cancellation import CancellationGroup, CancellationToken, JobCancelled
+from app.worker.worker import BatchJobExecutor, JobExecutor, JobWorker
 
-__all__ = ["CancellationToken", "JobCancelled", "JobExecutor", "JobWorker"]
+__all__ = [
+  "BatchJobExecutor",
+  "CancellationGroup",
+  "CancellationToken",
+  "JobCancelled",
+  "JobExecutor",
+  "JobWorker",
+]
@@ -37,3 +37,36 @@ class CancellationToken:
     """Raise if cancellation was requested."""
     if self._cancelled.is_set():
       raise JobCancelled()
+
+
+class CancellationGroup(CancellationToken):
+  """
+  Token for work shared by several jobs (e.g. a batched separation).
+
+  It only counts as cancelled once every member is cancelled, so aborting one
+  job of a batch does not interrupt the others.
+  """
+
+  def __init__(self, tokens: list[CancellationToken]) -> None:
+    super().__init__(",".join(token.job_id for token in tokens))
+    self.tokens = list(tokens)
+
+  def cancel(self) -> None:
+    for token in self.tokens:
+      token.cancel()
+
+  def stop(self) -> None:
+    for token in self.tokens:
+      token.stop()
+
+  @property
+  def cancelled(self) -> bool:
+    return bool(self.tokens) and all(token.cancelled for token in self.tokens)
+
+  @property
+  def stopped(self) -> bool:
+    return bool(self.tokens) and all(token.stopped for token in self.tokens)
+
+  def raise_if_cancelled(self) -> None:
+    if self.cancelled:
+      raise JobCancelled()
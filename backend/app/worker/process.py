@@ -2,8 +2,11 @@
 
 from __future__ import annotations
 
+import os
+import shutil
 import subprocess
 import time
+from typing import Mapping, Sequence
 
 from app.errors import ExecutionError
 from app.worker.cancellation import CancellationToken, JobCancelled
@@ -13,14 +16,16 @@ def run_process(
   cmd: list[str],
   *,
   cancel_token: CancellationToken | None = None,
+  env: Mapping[str, str] | None = None,
+  cpu_affinity: Sequence[int] | None = None,
 ) -> None:
-  """Run a subprocess and raise on failure."""
-  proc = subprocess.Popen(
-    cmd,
-    stdout=subprocess.PIPE,
-    stderr=subprocess.PIPE,
-    text=True,
-  )
+  """
+  Run a subprocess and raise on failure.
+
+  `env` entries override the inherited environment and `cpu_affinity` pins
+  the child (and its descendants) to the given cores.
+  """
+  proc = _spawn(cmd, env=env, cpu_affinity=cpu_affinity)
 
   try:
     retcode, _, stderr = _wait_process(proc, cancel_token)
@@ -34,28 +39,61 @@ def run_capture(
   cmd: list[str],
   *,
   cancel_token: CancellationToken | None = None,
+  env: Mapping[str, str] | None = None,
+  cpu_affinity: Sequence[int] | None = None,
+  timeout: float | None = None,
 ) -> subprocess.CompletedProcess[str]:
-  """Run a subprocess and return captured output."""
+  """
+  Run a subprocess and return captured output.
+
+  A process still running after `timeout` seconds is killed and raises
+  ExecutionError.
+  """
+  proc = _spawn(cmd, env=env, cpu_affinity=cpu_affinity)
+
+  try:
+    retcode, stdout, stderr = _wait_process(proc, cancel_token, timeout=timeout, program=cmd[0])
+    return subprocess.CompletedProcess(cmd, retcode, stdout, stderr)
+  finally:
+    _terminate_if_needed(proc, cancel_token)
+
+
+def _spawn(
+  cmd: list[str],
+  *,
+  env: Mapping[str, str] | None,
+  cpu_affinity: Sequence[int] | None,
+) -> subprocess.Popen:
+  cores = sorted(set(cpu_affinity or ()))
+  taskset = shutil.which("taskset") if cores else None
+  if taskset:
+    # Pinned before exec, so every thread and child the tool starts inherits it.
+    cmd = [taskset, "-c", ",".join(map(str, cores)), *cmd]
   proc = subprocess.Popen(
     cmd,
     stdout=subprocess.PIPE,
     stderr=subprocess.PIPE,
     text=True,
+    env={**os.environ, **env} if env else None,
   )
-
-  try:
-    retcode, stdout, stderr = _wait_process(proc, cancel_token)
-    return subprocess.CompletedProcess(cmd, retcode, stdout, stderr)
-  finally:
-    _terminate_if_needed(proc, cancel_token)
+  if cores and not taskset and hasattr(os, "sched_setaffinity"):
+    try:
+      os.sched_setaffinity(proc.pid, cores)
+    except OSError:
+      pass
+  return proc
 
 
 def _wait_process(
   proc: subprocess.Popen,
   cancel_token: CancellationToken | None,
+  *,
+  timeout: float | None = None,
+  program: str | None = None,
 ) -> tuple[int, str, str]:
   stdout = ""
   stderr = ""
+  deadline = time.monotonic() + timeout if timeout is not None else None
 
   while True:
     if cancel_token and cancel_token.cancelled:
@@ -65,6 +103,11 @@ def _wait_process(
       except Exception:
         proc.kill()
       raise JobCancelled()
+    if deadline is not None and time.monotonic() > deadline:
+      proc.kill()
+      proc.wait()
+      # proc.args starts with taskset when the child is pinned.
+      raise ExecutionError(f"{program or proc.args[0]} timed out")
 
     try:
       out, err = proc.communicate(timeout=0.5)
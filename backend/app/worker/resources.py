@@ -0,0 +1,108 @@
+"""CPU core budgeting for heavy (torch/ffmpeg) job steps."""
+
+from __future__ import annotations
+
+import os
+import threading
+from contextlib import contextmanager
+from typing import Iterator
+
+from app.worker.cancellation import CancellationToken
+
+WAIT_SECONDS = 0.5
+
+
+def parse_cores(value: str | None) -> list[int]:
+  """
+  Parse a core list such as "0-3,6" into sorted core ids.
+
+  Invalid tokens are ignored.
+  """
+  cores: set[int] = set()
+  for token in (value or "").split(","):
+    token = token.strip()
+    if not token:
+      continue
+    try:
+      if "-" in token:
+        low, high = (int(part) for part in token.split("-", 1))
+        cores.update(range(min(low, high), max(low, high) + 1))
+      else:
+        cores.add(int(token))
+    except ValueError:
+      continue
+  return sorted(cores)
+
+
+def available_cores() -> list[int]:
+  """Return the cores this process may run on."""
+  try:
+    return sorted(os.sched_getaffinity(0))
+  except AttributeError:
+    return list(range(os.cpu_count() or 1))
+
+
+class CoreBudget:
+  """
+  Hands out disjoint CPU core sets to concurrently running heavy steps.
+
+  A step reserves up to `count` cores and blocks until they are free, so two
+  separations never oversubscribe the same cores and the reserved cores stay
+  available to the API process.
+  """
+
+  def __init__(self, cores: list[int]) -> None:
+    self.cores = list(cores) or [0]
+    self._free = set(self.cores)
+    self._condition = threading.Condition()
+
+  @classmethod
+  def from_env(cls) -> CoreBudget:
+    """
+    Build the budget from NOXTOOLS_CPU_CORES (explicit list) or from the
+    process affinity minus NOXTOOLS_RESERVED_CORES cores kept for the API.
+    """
+    configured = parse_cores(os.getenv("NOXTOOLS_CPU_CORES"))
+    if configured:
+      return cls(configured)
+
+    cores = available_cores()
+    try:
+      reserved = max(0, int(os.getenv("NOXTOOLS_RESERVED_CORES", "1")))
+    except ValueError:
+      reserved = 1
+    if len(cores) > reserved:
+      cores = cores[reserved:]
+    return cls(cores)
+
+  @property
+  def free(self) -> int:
+    with self._condition:
+      return len(self._free)
+
+  @contextmanager
+  def reserve(
+    self,
+    count: int | None = None,
+    *,
+    cancel_token: CancellationToken | None = None,
+  ) -> Iterator[list[int]]:
+    """Reserve `count` cores (all budgeted cores when None) for a step."""
+    wanted = min(len(self.cores), max(1, count or len(self.cores)))
+    with self._condition:
+      while len(self._free) < wanted:
+        if cancel_token:
+          cancel_token.raise_if_cancelled()
+        self._condition.wait(timeout=WAIT_SECONDS)
+      granted = sorted(self._free)[:wanted]
+      self._free.difference_update(granted)
+
+    try:
+      yield granted
+    finally:
+      with self._condition:
+        self._free.update(granted)
+        self._condition.notify_all()
+
+
+cpu_budget = CoreBudget.from_env()
@@ -4,14 +4,15 @@ from __future__ import annotations
 
 import threading
 import time
+from dataclasses import dataclass
 from datetime import timedelta
-from typing import Callable, Dict, Optional
+from typing import Callable, Dict, Optional, Union
 from uuid import uuid4
 
 from sqlmodel import Session, select
 
 from app.errors import ExecutionError
-from app.jobs.file_links import JobFileRole, JobFileService
+from app.jobs.file_links import JobFileRole
 from app.jobs.lifecycle import JobAbortReason, JobLifecycleService
 from app.jobs.model import Job, JobStatus, JobTool, _utcnow
 from app.jobs.schemas import JobExecutionResult
@@ -20,6 +21,20 @@ from app.worker.cancellation import CancellationToken, JobCancelled
 
 
 JobExecutor = Callable[[Job, JobService, CancellationToken], JobExecutionResult]
+JobOutcome = Union[JobExecutionResult, BaseException]
+BatchJobExecutor = Callable[
+  [list[tuple[Job, CancellationToken]], JobService],
+  list[JobOutcome],
+]
+
+
+@dataclass(frozen=True)
+class BatchRegistration:
+  """A batch executor plus the rule deciding which pending jobs share a run."""
+
+  executor: BatchJobExecutor
+  batch_key: Callable[[Job], Optional[str]]
+  max_batch: int
 
 
 class JobWorker:
@@ -28,6 +43,10 @@ class JobWorker:
 
   Designed to be crash-resilient: all lifecycle steps are wrapped in defensive
   try/except blocks, and lock updates are always attempted to avoid stuck jobs.
+
+  Tools registered with `register_batch_executor` claim up to `max_batch`
+  pending jobs sharing the same batch key and run them in one executor call;
+  each job still gets its own token, status transitions and outputs.
   """
 
   def __init__(
@@ -42,6 +61,7 @@ class JobWorker:
     self.stale_lock_seconds = stale_lock_seconds
     self.worker_id = str(uuid4())
     self.executors: Dict[JobTool, JobExecutor] = {}
+    self.batch_executors: Dict[JobTool, BatchRegistration] = {}
     self._stop_event = threading.Event()
     self._thread: Optional[threading.Thread] = None
     self._tokens_lock = threading.Lock()
@@ -50,6 +70,26 @@ class JobWorker:
   def register_executor(self, tool: JobTool, executor: JobExecutor) -> None:
     self.executors[tool] = executor
 
+  def register_batch_executor(
+    self,
+    tool: JobTool,
+    executor: BatchJobExecutor,
+    *,
+    batch_key: Callable[[Job], Optional[str]],
+    max_batch: int,
+  ) -> None:
+    """
+    Register an executor that runs several queued jobs of a tool at once.
+
+    Pending jobs are grouped when `batch_key` returns the same non-None value;
+    the executor must return one result (or exception) per job, in order.
+    """
+    self.batch_executors[tool] = BatchRegistration(
+      executor=executor,
+      batch_key=batch_key,
+      max_batch=max(1, max_batch),
+    )
+
   def start(self) -> None:
     if self._thread and self._thread.is_alive():
       return
@@ -78,7 +118,12 @@ class JobWorker:
         if not job:
           time.sleep(self.poll_interval)
           continue
-        self._process_job(job.id)
+        batch = self.batch_executors.get(job.tool)
+        if batch:
+          peers = self._acquire_batch_peers(job, batch)
+          self._process_batch([job.id, *peers], batch)
+        else:
+          self._process_job(job.id)
       except Exception:
         time.sleep(self.poll_interval)
 
@@ -136,6 +181,45 @@ class JobWorker:
 
       return job
 
+  def _acquire_batch_peers(self, job: Job, batch: BatchRegistration) -> list[str]:
+    """Lock further pending jobs that can share a batch with `job`."""
+    if batch.max_batch <= 1:
+      return []
+    key = batch.batch_key(job)
+    if key is None:
+      return []
+
+    with Session(self.engine) as session:
+      stale_before = _utcnow() - timedelta(seconds=self.stale_lock_seconds)
+      stmt = (
+        select(Job)
+        .where(Job.status == JobStatus.PENDING)
+        .where(Job.tool == job.tool)
+        .where(Job.id != job.id)
+        .where((Job.locked_at.is_(None)) | (Job.locked_at <= stale_before))
+        .order_by(Job.created_at)
+        .limit(batch.max_batch * 4)
+      )
+      peers = [
+        candidate.id
+        for candidate in session.exec(stmt).all()
+        if batch.batch_key(candidate) == key
+      ][: batch.max_batch - 1]
+      if not peers:
+        return []
+
+      try:
+        session.exec(
+          Job.__table__.update()
+          .where(Job.id.in_(peers))
+          .values(locked_at=_utcnow(), locked_by=self.worker_id)
+        )
+        session.commit()
+      except Exception:
+        session.rollback()
+        return []
+      return peers
+
   def _process_job(self, job_id: str) -> None:
     with Session(self.engine) as session:
       lifecycle = JobLifecycleService(session)
@@ -149,62 +233,127 @@ class JobWorker:
         lifecycle.fail(job_id, f"No executor registered for tool '{job.tool}'")
         return
 
-      cancel_token = CancellationToken(job_id)
-      self._register_token(cancel_token)
-      watcher = threading.Thread(
-        target=self._watch_for_abort,
-        args=(job_id, cancel_token),
-        daemon=True,
-      )
-      watcher.start()
+      started = self._start_job(lifecycle, job)
+      if not started:
+        return
+      updated, cancel_token = started
 
-      if self._stop_event.is_set():
-        cancel_token.cancel()
+      outcome: JobOutcome
+      try:
+        job_for_exec = self._prepare_job(lifecycle, updated)
+        outcome = executor(job_for_exec, service, cancel_token)
+      except (Exception, KeyboardInterrupt) as exc:
+        outcome = exc
+      self._settle_job(lifecycle, job_id, cancel_token, outcome)
 
-      updated = lifecycle.mark_running(
-        job_id,
-        worker_id=self.worker_id,
-        attempt=(job.attempt or 0) + 1,
-      )
-      if not updated:
-        cancel_token.stop()
-        self._unregister_token(job_id)
-        return
+  def _process_batch(self, job_ids: list[str], batch: BatchRegistration) -> None:
+    with Session(self.engine) as session:
+      lifecycle = JobLifecycleService(session)
+      service = lifecycle.job_service
+
+      prepared: list[tuple[Job, CancellationToken]] = []
+      for job_id in job_ids:
+        job = service.get_job(job_id)
+        if not job:
+          continue
+        started = self._start_job(lifecycle, job)
+        if not started:
+          continue
+        updated, cancel_token = started
+        try:
+          prepared.append((self._prepare_job(lifecycle, updated), cancel_token))
+        except (Exception, KeyboardInterrupt) as exc:
+          self._settle_job(lifecycle, job_id, cancel_token, exc)
 
-      if self._stop_event.is_set():
-        cancel_token.cancel()
+      if not prepared:
+        return
 
+      outcomes: list[JobOutcome]
       try:
-        file_links = JobFileService(session)
-        job_for_exec = Job(**updated.model_dump())
-        inputs = file_links.list_files(job_id, role=JobFileRole.INPUT)
-        if len(inputs) > 1:
-          raise ExecutionError("Multiple input files are not supported")
-        if inputs:
-          input_file = inputs[0][0]
-          input_path = file_links.file_service.resolve_path(input_file)
-          if not input_path.exists():
-            raise ExecutionError("Input file not found on disk")
-          job_for_exec.input_path = str(input_path)
-          job_for_exec.input_filename = input_file.name
-
-        result = executor(job_for_exec, service, cancel_token)
-        if not isinstance(result, JobExecutionResult):
-          raise ExecutionError("Executor returned an invalid result payload")
-        lifecycle.complete(job_id, result)
-      except JobCancelled:
-        lifecycle.abort_for_cancellation(job_id, shutdown_requested=self._stop_event.is_set())
-      except KeyboardInterrupt:
-        lifecycle.abort_if_running(job_id, reason=JobAbortReason.SHUTDOWN)
-      except Exception as exc:
-        lifecycle.fail(job_id, str(exc))
-      finally:
-        cancel_token.stop()
-        self._unregister_token(job_id)
-
-      refreshed = service.get_job(job_id)
-      if refreshed and refreshed.status == JobStatus.RUNNING:
-        lifecycle.fail(job_id, "Executor completed without finalizing job status")
+        outcomes = list(batch.executor(prepared, service))
+        if len(outcomes) != len(prepared):
+          raise ExecutionError("Batch executor returned a mismatched result count")
+      except (Exception, KeyboardInterrupt) as exc:
+        outcomes = [exc] * len(prepared)
+
+      for (job, cancel_token), outcome in zip(prepared, outcomes):
+        self._settle_job(lifecycle, job.id, cancel_token, outcome)
+
+  def _start_job(
+    self,
+    lifecycle: JobLifecycleService,
+    job: Job,
+  ) -> Optional[tuple[Job, CancellationToken]]:
+    """Register a cancellation token and mark the job as running."""
+    cancel_token = CancellationToken(job.id)
+    self._register_token(cancel_token)
+    watcher = threading.Thread(
+      target=self._watch_for_abort,
+      args=(job.id, cancel_token),
+      daemon=True,
+    )
+    watcher.start()
+
+    if self._stop_event.is_set():
+      cancel_token.cancel()
+
+    updated = lifecycle.mark_running(
+      job.id,
+      worker_id=self.worker_id,
+      attempt=(job.attempt or 0) + 1,
+    )
+    if not updated:
+      cancel_token.stop()
+      self._unregister_token(job.id)
+      return None
+
+    if self._stop_event.is_set():
+      cancel_token.cancel()
+    return updated, cancel_token
+
+  def _prepare_job(self, lifecycle: JobLifecycleService, job: Job) -> Job:
+    """Build the executor's view of a job with its input file resolved."""
+    file_links = lifecycle.file_links
+    job_for_exec = Job(**job.model_dump())
+    inputs = file_links.list_files(job.id, role=JobFileRole.INPUT)
+    if len(inputs) > 1:
+      raise ExecutionError("Multiple input files are not supported")
+    if inputs:
+      input_file = inputs[0][0]
+      input_path = file_links.file_service.resolve_path(input_file)
+      if not input_path.exists():
+        raise ExecutionError("Input file not found on disk")
+      job_for_exec.input_path = str(input_path)
+      job_for_exec.input_filename = input_file.name
+    return job_for_exec
+
+  def _settle_job(
+    self,
+    lifecycle: JobLifecycleService,
+    job_id: str,
+    cancel_token: CancellationToken,
+    outcome: JobOutcome,
+  ) -> None:
+    """Persist an executor outcome and release the job's token."""
+    try:
+      if isinstance(outcome, BaseException):
+        raise outcome
+      if not isinstance(outcome, JobExecutionResult):
+        raise ExecutionError("Executor returned an invalid result payload")
+      lifecycle.complete(job_id, outcome)
+    except JobCancelled:
+      lifecycle.abort_for_cancellation(job_id, shutdown_requested=self._stop_event.is_set())
+    except KeyboardInterrupt:
+      lifecycle.abort_if_running(job_id, reason=JobAbortReason.SHUTDOWN)
+    except Exception as exc:
+      lifecycle.fail(job_id, str(exc))
+    finally:
+      cancel_token.stop()
+      self._unregister_token(job_id)
+
+    refreshed = lifecycle.job_service.get_job(job_id)
+    if refreshed and refreshed.status == JobStatus.RUNNING:
+      lifecycle.fail(job_id, "Executor completed without finalizing job status")
 
   def _watch_for_abort(self, job_id: str, token: CancellationToken) -> None:
     while not token.stopped:
@@ -0,0 +1 @@
+"""Offline benchmark suites for Noxtools executors."""
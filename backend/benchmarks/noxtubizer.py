@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+"""
+Benchmark end-to-end Noxtubizer jobs against the offline fake toolchain.
+
+Each iteration enqueues a job, runs the executor, and finalizes it through
+JobLifecycleService (hashing + storage), reporting latency and process spawns
+per mode.
+
+Usage:
+  cd backend
+  python -m benchmarks.noxtubizer --iterations 5 --audio-mb 4 --video-mb 32
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter
+from pathlib import Path
+
+_WORK_DIR = Path(tempfile.mkdtemp(prefix="noxbench_"))
+os.environ.setdefault("NOXTOOLS_FILE_STORAGE_ROOT", str(_WORK_DIR / "files"))
+
+from sqlmodel import Session, SQLModel, create_engine  # noqa: E402
+
+from app.files import model as file_model  # noqa: E402,F401
+from app.jobs import file_links as job_file_links  # noqa: E402,F401
+from app.jobs.lifecycle import JobLifecycleService  # noqa: E402
+from app.jobs.model import JobTool  # noqa: E402
+from app.tools.noxtubizer.executor import NoxtubizerExecutor  # noqa: E402
+from tests.fakes import FakeMediaToolchain  # noqa: E402
+
+MODES = {
+  "audio": {"audio_quality": "high", "audio_format": "mp3"},
+  "video": {"video_quality": "1080p", "video_format": "mp4"},
+  "both": {
+    "audio_quality": "high",
+    "audio_format": "mp3",
+    "video_quality": "1080p",
+    "video_format": "mp4",
+  },
+}
+
+
+def run_mode(
+  mode: str,
+  *,
+  iterations: int,
+  engine,
+  toolchain: FakeMediaToolchain,
+) -> tuple[list[float], Counter]:
+  executor = NoxtubizerExecutor(work_root=_WORK_DIR / "work")
+  timings: list[float] = []
+  spawns: Counter = Counter()
+
+  for idx in range(iterations):
+    url = f"https://www.youtube.com/watch?v=bench-{mode}-{idx}"
+    params = {"url": url, "mode": mode, **MODES[mode]}
+    toolchain.reset_counts()
+
+    with Session(engine) as session:
+      lifecycle = JobLifecycleService(session)
+      job, _duplicate_of = lifecycle.job_service.enqueue_job_for_signature(
+        tool=JobTool.NOXTUBIZER,
+        input_url=url,
+        params=params,
+        input_filename=url,
+      )
+      started = time.perf_counter()
+      lifecycle.mark_running(job.id, worker_id="bench", attempt=1)
+      result = executor.execute(lifecycle.job_service.get_job(job.id))
+      lifecycle.complete(job.id, result)
+      timings.append(time.perf_counter() - started)
+
+    spawns.update(toolchain.spawn_counts())
+
+  return timings, spawns
+
+
+def main(argv: list[str] | None = None) -> int:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--iterations", type=int, default=3)
+  parser.add_argument("--audio-mb", type=float, default=4)
+  parser.add_argument("--video-mb", type=float, default=32)
+  parser.add_argument("--modes", nargs="+", choices=sorted(MODES), default=list(MODES))
+  args = parser.parse_args(argv)
+
+  engine = create_engine(f"sqlite:///{_WORK_DIR / 'bench.db'}")
+  SQLModel.metadata.create_all(engine)
+
+  try:
+    report(args, engine)
+  finally:
+    engine.dispose()
+    shutil.rmtree(_WORK_DIR, ignore_errors=True)
+  return 0
+
+
+def report(args: argparse.Namespace, engine) -> None:
+  print(f"{'mode':<6} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9}  spawns/job")
+  with FakeMediaToolchain(audio_mb=args.audio_mb, video_mb=args.video_mb) as toolchain:
+    for mode in args.modes:
+      timings, spawns = run_mode(
+        mode,
+        iterations=args.iterations,
+        engine=engine,
+        toolchain=toolchain,
+      )
+      per_job = ", ".join(
+        f"{tool}={count / args.iterations:g}" for tool, count in sorted(spawns.items())
+      )
+      print(
+        f"{mode:<6} {statistics.mean(timings) * 1000:>9.1f} "
+        f"{statistics.median(timings) * 1000:>9.1f} "
+        f"{max(timings) * 1000:>9.1f}  {per_job}"
+      )
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+"""
+Benchmark Noxtunizer analysis engines for speed and accuracy.
+
+Synthetic tracks with a known tempo and key are analyzed by every available
+engine through NoxtunizerExecutor; Essentia is skipped when its extractor is
+not installed. BPM counts as correct within --bpm-tolerance, key on an exact
+tonic + scale match.
+
+Usage:
+  cd backend
+  python -m benchmarks.noxtunizer --seconds 120 --engines numpy essentia
+"""
+from __future__ import annotations
+
+import argparse
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from app.jobs.model import Job, JobTool
+from app.tools.noxtunizer.engines import ENGINES
+from app.tools.noxtunizer.executor import NoxtunizerExecutor
+from tests.fakes import write_synthetic_track
+
+TEMPOS = (85, 100, 122, 128, 140, 174)
+KEYS = (("C", "major"), ("A", "minor"), ("F#", "major"), ("Bb", "minor"), ("E", "minor"))
+
+
+def build_tracks(root: Path, *, seconds: float, count: int) -> list[tuple[Path, int, str]]:
+  tracks = []
+  for idx in range(count):
+    bpm = TEMPOS[idx % len(TEMPOS)]
+    tonic, scale = KEYS[idx % len(KEYS)]
+    path = write_synthetic_track(
+      root / f"track_{idx:02d}.wav",
+      bpm=bpm,
+      tonic=tonic,
+      scale=scale,
+      seconds=seconds,
+      seed=idx,
+    )
+    tracks.append((path, bpm, f"{tonic} {scale.title()}"))
+  return tracks
+
+
+def run_engine(
+  engine: str,
+  tracks: list[tuple[Path, int, str]],
+  *,
+  bpm_tolerance: float,
+) -> tuple[list[float], int, int]:
+  executor = NoxtunizerExecutor()
+  timings: list[float] = []
+  bpm_hits = 0
+  key_hits = 0
+  for path, bpm, key in tracks:
+    job = Job(tool=JobTool.NOXTUNIZER, params={"engine": engine}, input_path=str(path))
+    started = time.perf_counter()
+    summary = executor.execute(job).summary
+    timings.append(time.perf_counter() - started)
+    if summary.get("bpm") is not None and abs(summary["bpm"] - bpm) <= bpm_tolerance:
+      bpm_hits += 1
+    if summary.get("key") == key:
+      key_hits += 1
+  return timings, bpm_hits, key_hits
+
+
+def essentia_available() -> bool:
+  binary = NoxtunizerExecutor().extractor_bin
+  return shutil.which(binary) is not None or Path(binary).exists()
+
+
+def main(argv: list[str] | None = None) -> int:
+  parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+  parser.add_argument("--seconds", type=float, default=60)
+  parser.add_argument("--tracks", type=int, default=12)
+  parser.add_argument("--bpm-tolerance", type=float, default=1.0)
+  parser.add_argument("--engines", nargs="+", choices=ENGINES, default=list(ENGINES))
+  args = parser.parse_args(argv)
+
+  work_dir = Path(tempfile.mkdtemp(prefix="noxtunebench_"))
+  try:
+    tracks = build_tracks(work_dir, seconds=args.seconds, count=args.tracks)
+    print(f"{'engine':<9} {'mean ms':>9} {'p50 ms':>9} {'max ms':>9} {'bpm ok':>7} {'key ok':>7}")
+    for engine in args.engines:
+      if engine == "essentia" and not essentia_available():
+        print(f"{engine:<9} skipped (extractor not installed)")
+        continue
+      timings, bpm_hits, key_hits = run_engine(
+        engine,
+        tracks,
+        bpm_tolerance=args.bpm_tolerance,
+      )
+      print(
+        f"{engine:<9} {statistics.mean(timings) * 1000:>9.1f} "
+        f"{statistics.median(timings) * 1000:>9.1f} "
+        f"{max(timings) * 1000:>9.1f} "
+        f"{bpm_hits:>3}/{len(tracks):<3} {key_hits:>3}/{len(tracks):<3}"
+      )
+  finally:
+    shutil.rmtree(work_dir, ignore_errors=True)
+  return 0
+
+
+if __name__ == "__main__":
+  sys.exit(main())
@@ -0,0 +1,285 @@
+"""Offline stand-ins for yt-dlp, ffmpeg and ffprobe.
+
+`FakeMediaToolchain` installs small Python scripts named like the real tools
+at the front of PATH. They serve synthetic media with yt-dlp compatible
+metadata and log every invocation so tests and benchmarks can count process
+spawns without touching the network.
+
+Synthetic files start with a one-line header (`NOXFAKE <json>`) describing
+their streams, followed by filler bytes; the fake ffprobe reads it back.
+"""
+
+from __future__ import annotations
+
+import os
+import shutil
+import sys
+import tempfile
+from collections import Counter
+from pathlib import Path
+
+FAKE_TOOL_SOURCE = r'''
+import json
+import os
+import re
+import sys
+from pathlib import Path
+
+TOOL = "__TOOL__"
+MAGIC = b"NOXFAKE "
+CHUNK = 1024 * 1024
+
+
+def log():
+  path = os.environ.get("NOXFAKE_LOG")
+  if path:
+    with open(path, "a", encoding="utf-8") as fp:
+      fp.write(TOOL + "\n")
+
+
+def option(args, name, default=None):
+  if name in args:
+    idx = args.index(name)
+    if idx + 1 < len(args):
+      return args[idx + 1]
+  return default
+
+
+def read_header(path):
+  with open(path, "rb") as fp:
+    line = fp.readline()
+  if not line.startswith(MAGIC):
+    return None
+  return json.loads(line[len(MAGIC):])
+
+
+def write_media(path, header, size, seed):
+  tmp = Path(str(path) + ".part")
+  filler = (seed.encode("utf-8") * (CHUNK // max(1, len(seed)) + 1))[:CHUNK]
+  with open(tmp, "wb") as fp:
+    fp.write(MAGIC + json.dumps(header).encode("utf-8") + b"\n")
+    remaining = size
+    while remaining > 0:
+      chunk = filler[: min(CHUNK, remaining)]
+      fp.write(chunk)
+      remaining -= len(chunk)
+  tmp.replace(path)
+
+
+def video_id(url):
+  match = re.search(r"[?&]v=([\w-]+)", url)
+  return match.group(1) if match else "fakevideo"
+
+
+def yt_dlp(args):
+  url = args[-1]
+  vid = video_id(url)
+  duration = float(os.environ.get("NOXFAKE_DURATION", "180"))
+  if "-j" in args:
+    print(json.dumps({
+      "id": vid,
+      "title": os.environ.get("NOXFAKE_TITLE", f"Synthetic {vid}"),
+      "duration": duration,
+      "webpage_url": url,
+      "extractor": "youtube",
+      "ext": os.environ.get("NOXFAKE_VIDEO_EXT", "webm"),
+    }))
+    return 0
+
+  template = option(args, "-o", "%(id)s.%(ext)s")
+  if "--extract-audio" in args:
+    fmt = option(args, "--audio-format", "mp3")
+    ext = "ogg" if fmt == "vorbis" else fmt
+    quality = option(args, "--audio-quality")
+    kbps = int(quality.rstrip("Kk")) if quality else 320
+    header = {
+      "format": {"format_name": ext, "duration": duration, "bit_rate": kbps * 1000},
+      "streams": [{
+        "index": 0,
+        "codec_type": "audio",
+        "codec_name": ext,
+        "sample_rate": 44100,
+        "channels": 2,
+        "bit_rate": kbps * 1000,
+      }],
+    }
+    size = int(float(os.environ.get("NOXFAKE_AUDIO_MB", "2")) * CHUNK)
+  else:
+    ext = os.environ.get("NOXFAKE_VIDEO_EXT", "webm")
+    selector = option(args, "-f", "")
+    match = re.search(r"height<=(\d+)", selector)
+    height = int(match.group(1)) if match else 2160
+    header = {
+      "format": {"format_name": ext, "duration": duration},
+      "streams": [{
+        "index": 0,
+        "codec_type": "video",
+        "codec_name": "vp9",
+        "width": height * 16 // 9,
+        "height": height,
+      }],
+    }
+    size = int(float(os.environ.get("NOXFAKE_VIDEO_MB", "8")) * CHUNK)
+
+  target = Path(template.replace("%(id)s", vid).replace("%(ext)s", ext))
+  if target.exists() and "--no-overwrites" in args:
+    return 0
+  target.parent.mkdir(parents=True, exist_ok=True)
+  write_media(target, header, size, vid)
+  return 0
+
+
+def ffmpeg(args):
+  inputs = [args[idx + 1] for idx, arg in enumerate(args) if arg == "-i"]
+  output = Path(args[-1])
+  headers = [read_header(path) or {"format": {}, "streams": []} for path in inputs]
+
+  streams = []
+  for position, header in enumerate(headers):
+    for stream in header.get("streams", []):
+      if "-an" in args and stream.get("codec_type") == "audio":
+        continue
+      if len(inputs) > 1 and position > 0 and stream.get("codec_type") != "audio":
+        continue
+      streams.append(dict(stream, index=len(streams)))
+
+  fmt = dict(headers[0].get("format", {})) if headers else {}
+  fmt["format_name"] = output.suffix.lstrip(".")
+  size = sum(max(0, os.path.getsize(path) - 512) for path in inputs)
+  write_media(output, {"format": fmt, "streams": streams}, size, output.stem)
+  return 0
+
+
+def ffprobe(args):
+  header = read_header(args[-1])
+  if header is None:
+    print("Invalid data found when processing input", file=sys.stderr)
+    return 1
+  fmt = dict(header.get("format", {}))
+  fmt["size"] = os.path.getsize(args[-1])
+  print(json.dumps({"format": fmt, "streams": header.get("streams", [])}))
+  return 0
+
+
+if __name__ == "__main__":
+  log()
+  handler = {"yt-dlp": yt_dlp, "ffmpeg": ffmpeg, "ffprobe": ffprobe}[TOOL]
+  sys.exit(handler(sys.argv[1:]))
+'''
+
+FAKE_TOOLS = ("yt-dlp", "ffmpeg", "ffprobe")
+
+
+class FakeMediaToolchain:
+  """
+  Context manager that puts fake yt-dlp/ffmpeg/ffprobe binaries on PATH.
+
+  Args:
+    audio_mb: Size of synthetic audio downloads.
+    video_mb: Size of synthetic video downloads.
+    video_ext: Container yt-dlp "downloads" video in (webm forces a remux).
+  """
+
+  def __init__(
+    self,
+    *,
+    audio_mb: float = 2,
+    video_mb: float = 8,
+    video_ext: str = "webm",
+  ) -> None:
+    self.env = {
+      "NOXFAKE_AUDIO_MB": str(audio_mb),
+      "NOXFAKE_VIDEO_MB": str(video_mb),
+      "NOXFAKE_VIDEO_EXT": video_ext,
+    }
+    self.root: Path | None = None
+    self._saved_env: dict[str, str | None] = {}
+
+  @property
+  def log_path(self) -> Path:
+    assert self.root is not None
+    return self.root / "spawns.log"
+
+  def __enter__(self) -> FakeMediaToolchain:
+    self.root = Path(tempfile.mkdtemp(prefix="noxfake_"))
+    bin_dir = self.root / "bin"
+    bin_dir.mkdir()
+    for tool in FAKE_TOOLS:
+      script = bin_dir / tool
+      script.write_text(
+        f"#!{sys.executable}\n" + FAKE_TOOL_SOURCE.replace("__TOOL__", tool),
+        encoding="utf-8",
+      )
+      script.chmod(0o755)
+    self.log_path.touch()
+
+    overrides = dict(self.env)
+    overrides["NOXFAKE_LOG"] = str(self.log_path)
+    overrides["PATH"] = f"{bin_dir}{os.pathsep}{os.environ.get('PATH', '')}"
+    for key, value in overrides.items():
+      self._saved_env[key] = os.environ.get(key)
+      os.environ[key] = value
+    return self
+
+  def __exit__(self, *exc_info) -> None:
+    for key, value in self._saved_env.items():
+      if value is None:
+        os.environ.pop(key, None)
+      else:
+        os.environ[key] = value
+    if self.root:
+      shutil.rmtree(self.root, ignore_errors=True)
+
+  def spawn_counts(self) -> Counter:
+    """Return how many times each fake tool was spawned so far."""
+    lines = self.log_path.read_text(encoding="utf-8").splitlines()
+    return Counter(line for line in lines if line)
+
+  def reset_counts(self) -> None:
+    """Clear the spawn log."""
+    self.log_path.write_text("", encoding="utf-8")
+
+
+def write_synthetic_track(
+  path: Path,
+  *,
+  bpm: float,
+  tonic: str,
+  scale: str,
+  seconds: float = 30,
+  sample_rate: int = 44100,
+  seed: int = 0,
+) -> Path:
+  """
+  Write a 16-bit stereo WAV with a sustained triad and a noise click per beat,
+  giving analyzers a known tempo and key.
+  """
+  import wave
+
+  import numpy as np
+
+  pitch_classes = ["C", "C#", "D", "Eb", "E", "F", "F#", "G", "Ab", "A", "Bb", "B"]
+  root = 48 + pitch_classes.index(tonic)
+  third = 3 if scale == "minor" else 4
+  rng = np.random.default_rng(seed)
+
+  t = np.arange(int(sample_rate * seconds)) / sample_rate
+  audio = np.zeros_like(t)
+  for interval, gain in ((0, 1.0), (third, 0.7), (7, 0.8), (12, 0.4), (12 + third, 0.3)):
+    freq = 440.0 * 2 ** ((root + interval - 69) / 12)
+    audio += gain * 0.08 * np.sin(2 * np.pi * freq * t)
+
+  click = int(0.05 * sample_rate)
+  envelope = np.exp(-np.arange(click) / (0.007 * sample_rate))
+  for beat in np.arange(0, seconds, 60.0 / bpm):
+    start = int(beat * sample_rate)
+    length = min(click, audio.shape[0] - start)
+    audio[start:start + length] += rng.standard_normal(length) * envelope[:length] * 0.6
+
+  pcm = (np.clip(audio, -1, 1) * 32767).astype("<i2")
+  with wave.open(str(path), "wb") as writer:
+    writer.setnchannels(2)
+    writer.setsampwidth(2)
+    writer.setframerate(sample_rate)
+    writer.writeframes(np.repeat(pcm, 2).tobytes())
+  return path
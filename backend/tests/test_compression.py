@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import os
+import shutil
+import struct
+from pathlib import Path
+
+import pytest
+
+from app.utils.compression import FLAC, encode_file, iter_decoded, wav_layout
+from app.utils.hashing import hash_chunks, hash_file
+
+FORMATS = [(16, 2), (24, 1), (24, 2)]
+
+
+def _chunk(chunk_id: bytes, body: bytes) -> bytes:
+  return chunk_id + struct.pack("<I", len(body)) + body + b"\0" * (len(body) % 2)
+
+
+def _write_wav(path: Path, *, bits: int, channels: int, frames: int = 44_101) -> bytes:
+  """A PCM WAV with LIST metadata before the samples and an id3 chunk after."""
+  rate = 44_100
+  block = channels * bits // 8
+  fmt = struct.pack("<HHIIHH", 1, channels, rate, rate * block, block, bits)
+  samples = os.urandom(frames * block)
+  body = (
+    b"WAVE"
+    + _chunk(b"fmt ", fmt)
+    + _chunk(b"LIST", b"INFOISFT\x05\x00\x00\x00nox\x00\x00")
+    + _chunk(b"data", samples)
+    + _chunk(b"id3 ", b"ID3\x04tagged")
+  )
+  path.write_bytes(b"RIFF" + struct.pack("<I", len(body)) + body)
+  return samples
+
+
+@pytest.mark.parametrize(("bits", "channels"), FORMATS)
+def test_wav_layout_finds_samples_between_extra_chunks(
+  tmp_path: Path, bits: int, channels: int
+) -> None:
+  source = tmp_path / "track.wav"
+  samples = _write_wav(source, bits=bits, channels=channels)
+
+  layout = wav_layout(source)
+
+  assert layout is not None
+  assert (layout.bits, layout.channels, layout.sample_rate) == (bits, channels, 44_100)
+  data = source.read_bytes()[layout.data_offset : layout.data_offset + layout.data_size]
+  assert data == samples
+
+
+@pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed")
+@pytest.mark.parametrize(("bits", "channels"), FORMATS)
+def test_flac_envelope_round_trips_wav_bytes(tmp_path: Path, bits: int, channels: int) -> None:
+  source = tmp_path / "track.wav"
+  _write_wav(source, bits=bits, channels=channels)
+  blob = tmp_path / "track.flac"
+
+  encode_file(source, blob, FLAC, layout=wav_layout(source))
+
+  assert hash_chunks(iter_decoded(blob, FLAC)) == hash_file(source)
@@ -0,0 +1,66 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from sqlalchemy import inspect, text
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.db import add_missing_columns, rebuild_changed_primary_keys
+from app.files.repository import AudioAnalysisRepository, FileRepository
+
+
+def test_existing_tables_gain_new_columns_idempotently(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  with engine.begin() as conn:
+    conn.execute(
+      text(
+        "CREATE TABLE files (id VARCHAR PRIMARY KEY, type VARCHAR NOT NULL, name VARCHAR NOT NULL,"
+        " checksum VARCHAR NOT NULL UNIQUE, size INTEGER NOT NULL, path VARCHAR NOT NULL,"
+        " created_at DATETIME NOT NULL, format VARCHAR, quality JSON, variants JSON)"
+      )
+    )
+    conn.execute(
+      text(
+        "INSERT INTO files VALUES ('f1', 'audio', 'a.wav', 'abc', 3, 'f1/a.wav',"
+        " '2024-01-01 00:00:00', NULL, NULL, NULL)"
+      )
+    )
+  SQLModel.metadata.create_all(engine)
+
+  added = add_missing_columns(engine)
+
+  assert {"files.media", "files.accessed_at", "files.missing_at", "files.storage_codec"} <= set(added)
+  assert "ix_files_accessed_at" in {index["name"] for index in inspect(engine).get_indexes("files")}
+  assert add_missing_columns(engine) == []
+  with Session(engine) as session:
+    file = FileRepository(session).get("f1")
+    assert file is not None
+    assert (file.media, file.storage_codec) == (None, None)
+
+
+def test_analyses_table_is_rebuilt_with_its_engine_key(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  with engine.begin() as conn:
+    conn.execute(
+      text(
+        "CREATE TABLE audio_analyses (checksum VARCHAR PRIMARY KEY, bpm FLOAT, key VARCHAR,"
+        " duration FLOAT, engine VARCHAR, version INTEGER, analyzed_at DATETIME NOT NULL)"
+      )
+    )
+    conn.execute(text("CREATE INDEX ix_audio_analyses_bpm ON audio_analyses (bpm)"))
+    conn.execute(
+      text(
+        "INSERT INTO audio_analyses VALUES ('abc', 120.0, 'A Minor', 30.0, 'numpy', 2,"
+        " '2024-01-01 00:00:00'), ('def', 90.0, NULL, NULL, NULL, NULL, '2024-01-01 00:00:00')"
+      )
+    )
+  SQLModel.metadata.create_all(engine)
+
+  assert rebuild_changed_primary_keys(engine) == ["audio_analyses"]
+  assert rebuild_changed_primary_keys(engine) == []
+  pk = inspect(engine).get_pk_constraint("audio_analyses")["constrained_columns"]
+  assert sorted(pk) == ["checksum", "engine"]
+  with Session(engine) as session:
+    analyses = AudioAnalysisRepository(session)
+    assert analyses.get("abc", "numpy").bpm == 120.0
+    assert analyses.get("def", "").bpm == 90.0
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import shutil
+import wave
+from pathlib import Path
+
+import numpy as np
+import pytest
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.errors import ValidationError
+from app.files import service as file_service
+from app.files.cold import ColdStorageService
+from app.files.schemas import ColdTierReport
+from app.files.service import FileService, build_analysis_filter, peaks_builder
+from app.files.storage import FileStorage
+from app.utils.compression import ZSTD
+from app.utils.peaks import HEADER
+from tests.fakes import write_synthetic_track
+
+
+def test_key_query_matches_enharmonic_spellings() -> None:
+  assert build_analysis_filter(key="Am").keys == ["A Minor"]
+  assert build_analysis_filter(key="f# maj").keys == ["F# Major", "Gb Major"]
+  with pytest.raises(ValidationError):
+    build_analysis_filter(key="H minor")
+  with pytest.raises(ValidationError):
+    build_analysis_filter(bpm_min=140, bpm_max=120)
+
+
+def test_files_filter_by_indexed_analysis(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  with Session(engine) as session:
+    service = FileService(session, storage=FileStorage(tmp_path / "storage"))
+    files = {}
+    for name, bpm, key in (("slow", 90.0, "A Minor"), ("fast", 128.0, "Bb Major"), ("raw", None, None)):
+      source = tmp_path / f"{name}.wav"
+      source.write_bytes(name.encode())
+      files[name] = service.create_from_path(source, file_type="audio")
+      if bpm is not None:
+        service.record_analysis(files[name], {"bpm": bpm, "key": key, "duration": 30.0, "engine": "numpy"})
+
+    fast = service.list_files(analysis=build_analysis_filter(bpm_min=120, key="A# major"))
+    assert [file.id for file in fast] == [files["fast"].id]
+    assert service.count_files(analysis=build_analysis_filter(duration_max=60)) == 2
+    assert service.count_files() == 3
+
+    reads = {read.id: read for read in service.with_analysis(service.list_files())}
+    assert reads[files["slow"].id].analysis.bpm == 90.0
+    assert reads[files["raw"].id].analysis is None
+
+    # Another engine gets its own row; both stay cached and filters match once.
+    service.record_analysis(
+      files["slow"],
+      {"bpm": 91.0, "key": "A Minor", "duration": 30.0, "engine": "essentia", "analyzer_version": 1},
+    )
+    assert service.cached_analysis(files["slow"], engine="essentia", version=1).bpm == 91.0
+    assert service.analyses.get(files["slow"].checksum, "numpy").bpm == 90.0
+    assert service.count_files(analysis=build_analysis_filter(key="Am")) == 1
+
+
+def test_audio_peaks_are_stored_at_ingest(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  with Session(engine) as session:
+    service = FileService(session, storage=FileStorage(tmp_path / "storage"))
+    track = write_synthetic_track(tmp_path / "track.wav", bpm=120, tonic="C", scale="major", seconds=10)
+    file = service.create_from_path(track, file_type="audio")
+    peaks_builder.wait(file.checksum)
+    assert service.storage.derived_path(file.checksum, "peaks").is_file()
+
+    payload = service.read_peaks(file, max_buckets=500)
+    magic, _version, bits, rate, per_bucket, count = HEADER.unpack_from(payload)
+    assert (magic, bits, rate) == (b"NXPK", 8, 44100)
+    assert count <= 500 and count == -(-10 * 44100 // per_bucket)
+    pairs = np.frombuffer(payload, dtype=np.int8, offset=HEADER.size).reshape(-1, 2)
+    assert pairs.shape[0] == count
+    assert np.all(pairs[:, 0] <= pairs[:, 1]) and pairs[:, 1].max() > 0
+
+    service.delete_file(file.id)
+    assert not service.storage.derived_path(file.checksum, "peaks").exists()
+
+
+def test_undecodable_audio_is_marked_once(tmp_path: Path, monkeypatch) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  decodes: list[Path] = []
+  monkeypatch.setattr(file_service, "compute_peaks", lambda path: decodes.append(path))
+  with Session(engine) as session:
+    service = FileService(session, storage=FileStorage(tmp_path / "storage"))
+    source = tmp_path / "broken.mp3"
+    source.write_bytes(b"not audio")
+    file = service.create_from_path(source, file_type="audio")
+
+    for _ in range(2):
+      with pytest.raises(ValidationError):
+        service.read_peaks(file)
+    assert len(decodes) == 1
+
+
+@pytest.mark.skipif(shutil.which("zstd") is None, reason="zstd CLI not installed")
+def test_peaks_of_cold_files_are_computed_without_thawing(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  track = tmp_path / "quiet.wav"
+  with wave.open(str(track), "wb") as writer:
+    writer.setnchannels(1)
+    writer.setsampwidth(2)
+    writer.setframerate(44100)
+    writer.writeframes(b"\0\0" * 44100 * 20)
+  with Session(engine) as session:
+    service = FileService(session, storage=FileStorage(tmp_path / "storage"))
+    file = service.create_from_path(track, file_type="audio")
+    peaks_builder.wait(file.checksum)
+    peaks_path = service.storage.derived_path(file.checksum, "peaks")
+    peaks_path.unlink()
+    ColdStorageService(session, storage=service.storage).freeze(file, ColdTierReport())
+    session.refresh(file)
+    assert file.storage_codec == ZSTD
+
+    payload = service.read_peaks(file)
+
+    session.refresh(file)
+    assert file.storage_codec == ZSTD
+    assert peaks_path.is_file()
+    assert HEADER.unpack_from(payload)[0] == b"NXPK"
+
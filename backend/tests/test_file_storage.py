@@ -0,0 +1,271 @@
+from __future__ import annotations
+
+import hashlib
+import io
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+import shutil
+
+import pytest
+from fastapi import UploadFile
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.errors import ConflictError, NotFoundError, PayloadTooLargeError
+from app.files.cold import ColdStorageService
+from app.files.gc import StorageReconciler
+from app.files.model import _utcnow
+from app.files.schemas import ColdTierReport, UploadSessionCreate
+from app.files.service import FileService
+from app.files.storage import INCOMING_DIRNAME, FileStorage
+from app.files.uploads import UploadSessionService
+from app.utils.compression import ZSTD, iter_decoded
+from app.utils.hashing import hash_file
+
+
+def _service(tmp_path: Path, session: Session) -> FileService:
+  return FileService(session, storage=FileStorage(tmp_path / "storage"))
+
+
+def test_upload_is_hashed_while_staged_and_deduplicated(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  payload = b"noxtools" * 300_000
+  with Session(engine) as session:
+    service = _service(tmp_path, session)
+    first = service.create_from_upload(
+      UploadFile(io.BytesIO(payload), filename="a.bin"),
+      file_type="other",
+    )
+    second = service.create_from_upload(
+      UploadFile(io.BytesIO(payload), filename="b.bin"),
+      file_type="other",
+    )
+
+    assert first.checksum == hashlib.sha256(payload).hexdigest()
+    assert first.size == len(payload)
+    assert second.id == first.id
+    assert service.resolve_path(first).read_bytes() == payload
+    assert list((service.storage.root / INCOMING_DIRNAME).iterdir()) == []
+
+
+def test_stream_upload_enforces_size_limit_on_the_fly(tmp_path: Path) -> None:
+  storage = FileStorage(tmp_path / "storage")
+  writer = storage.open_staging(max_bytes=10)
+  writer.write(b"12345")
+  with pytest.raises(PayloadTooLargeError):
+    writer.write(b"678901")
+  assert not writer.path.exists()
+
+  writer = storage.open_staging(max_bytes=10)
+  writer.write(b"0123456789")
+  staged = writer.finish()
+  assert (staged.size, staged.checksum) == (10, hashlib.sha256(b"0123456789").hexdigest())
+
+
+def test_chunked_upload_out_of_order_and_resumed(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  payload = bytes(range(256)) * 4096
+  third = len(payload) // 3
+  with Session(engine) as session:
+    uploads = UploadSessionService(session, storage=FileStorage(tmp_path / "storage"))
+    upload = uploads.create(UploadSessionCreate(name="clip.mp4", type="video", size=len(payload)))
+
+    uploads.write_chunk(upload.id, 2 * third, payload[2 * third:])
+    uploads.write_chunk(upload.id, 0, payload[:third])
+    with pytest.raises(ConflictError):
+      uploads.complete(upload.id)
+    assert uploads.get(upload.id).ranges == [[0, third], [2 * third, len(payload)]]
+
+    uploads.write_chunk(upload.id, third, payload[third:2 * third])
+    file = uploads.complete(upload.id)
+
+    assert file.checksum == hashlib.sha256(payload).hexdigest()
+    assert uploads.files.resolve_path(file).read_bytes() == payload
+    with pytest.raises(NotFoundError):
+      uploads.get(upload.id)
+
+
+def test_chunk_resent_over_hashed_bytes_is_rehashed_at_completion(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  payload = bytes(range(256)) * 64
+  half = len(payload) // 2
+  with Session(engine) as session:
+    uploads = UploadSessionService(session, storage=FileStorage(tmp_path / "storage"))
+    upload = uploads.create(UploadSessionCreate(name="a.wav", type="audio", size=len(payload)))
+
+    uploads.write_chunk(upload.id, 0, b"\0" * half)
+    uploads.write_chunk(upload.id, 0, payload[:half])
+    uploads.write_chunk(upload.id, half, payload[half:])
+    file = uploads.complete(upload.id)
+
+    assert file.checksum == hashlib.sha256(payload).hexdigest()
+    assert hash_file(uploads.files.resolve_path(file)) == (file.checksum, len(payload))
+
+
+def test_expired_upload_sessions_are_purged(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  with Session(engine) as session:
+    uploads = UploadSessionService(session, storage=FileStorage(tmp_path / "storage"))
+    upload = uploads.create(UploadSessionCreate(name="a.wav", type="audio", size=10))
+    upload.expires_at = datetime.now(timezone.utc) - timedelta(seconds=1)
+    uploads.repo.save(upload)
+
+    assert uploads.purge_expired() == 1
+    assert not uploads.storage.upload_path(upload.id).exists()
+
+
+def test_create_from_path_trusts_precomputed_checksum(tmp_path: Path, monkeypatch) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  source = tmp_path / "stem.bin"
+  source.write_bytes(b"stem" * 1000)
+  checksum, size = hash_file(source)
+  with Session(engine) as session:
+    service = _service(tmp_path, session)
+    monkeypatch.setattr(service.storage, "hash_path", lambda path: pytest.fail("output was rehashed"))
+    file = service.create_from_path(source, file_type="other", checksum=checksum)
+
+    assert (file.checksum, file.size) == (checksum, size)
+    assert not source.exists()
+
+
+def test_files_are_sharded_by_checksum_and_shards_pruned_on_delete(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  with Session(engine) as session:
+    service = _service(tmp_path, session)
+    kept = service.create_from_upload(
+      UploadFile(io.BytesIO(b"kept"), filename="kept.bin"),
+      file_type="other",
+    )
+    doomed = service.create_from_upload(
+      UploadFile(io.BytesIO(b"doomed"), filename="Doomed Track.wav"),
+      file_type="other",
+    )
+
+    checksum = doomed.checksum
+    assert doomed.path == f"{checksum[:2]}/{checksum[2:4]}/{checksum}"
+    assert doomed.name == "Doomed Track.wav"
+
+    assert service.delete_file(doomed.id)
+    root = service.storage.root
+    assert not (root / checksum[:2] / checksum[2:4]).exists()
+    if checksum[:2] != kept.checksum[:2]:
+      assert not (root / checksum[:2]).exists()
+    assert service.resolve_path(kept).read_bytes() == b"kept"
+
+
+def test_reconcile_removes_orphans_and_flags_missing_blobs(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  with Session(engine) as session:
+    service = _service(tmp_path, session)
+    kept = service.create_from_upload(
+      UploadFile(io.BytesIO(b"kept"), filename="kept.bin"),
+      file_type="other",
+    )
+    lost = service.create_from_upload(
+      UploadFile(io.BytesIO(b"lost"), filename="lost.bin"),
+      file_type="other",
+    )
+    storage = service.storage
+    service.resolve_path(lost).unlink()
+
+    orphan = storage.resolve_path(storage.build_relative_path("f" * 64))
+    orphan.parent.mkdir(parents=True)
+    orphan.write_bytes(b"x" * 10)
+    legacy = storage.root / "old-file-id" / "song.wav"
+    legacy.parent.mkdir()
+    legacy.write_bytes(b"y" * 20)
+    stale_partial = storage.root / INCOMING_DIRNAME / "crashed.partial"
+    stale_partial.parent.mkdir(exist_ok=True)
+    stale_partial.write_bytes(b"z" * 5)
+    stale_peaks = storage.derived_path("e" * 64, "peaks")
+    storage.write_bytes(stale_peaks, b"p" * 3)
+
+    report = StorageReconciler(session, storage=storage, grace=timedelta(seconds=-60)).reconcile()
+
+    assert (report.orphans_removed, report.staging_removed, report.derived_removed) == (2, 1, 1)
+    assert report.reclaimed_bytes == 10 + 20 + 5 + 3
+    assert (report.missing_files, report.missing_file_ids) == (1, [lost.id])
+    assert not (storage.root / "ff").exists()
+    assert not legacy.parent.exists()
+    assert service.resolve_path(kept).read_bytes() == b"kept"
+    session.refresh(lost)
+    session.refresh(kept)
+    assert lost.missing_at is not None
+    assert kept.missing_at is None
+
+
+@pytest.mark.skipif(shutil.which("zstd") is None, reason="zstd CLI not installed")
+def test_idle_files_are_compressed_cold_and_thawed_on_use(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  payload = b"noxtools cold tier " * 100_000
+  with Session(engine) as session:
+    service = _service(tmp_path, session)
+    file = service.create_from_upload(
+      UploadFile(io.BytesIO(payload), filename="notes.txt"),
+      file_type="other",
+    )
+    hot_path = service.resolve_path(file)
+    service.repo.touch(file.id, accessed_at=_utcnow() - timedelta(days=60), stale_before=_utcnow())
+
+    report = ColdStorageService(session, storage=service.storage).freeze_idle()
+
+    session.refresh(file)
+    assert (report.compressed, report.errors) == (1, 0)
+    assert file.storage_codec == ZSTD
+    assert file.stored_size < file.size == len(payload)
+    assert not hot_path.exists()
+    cold_path = service.blob_path(file)
+    assert cold_path.name.endswith(".zst")
+    assert b"".join(iter_decoded(cold_path, ZSTD)) == payload
+
+    gc = StorageReconciler(session, storage=service.storage, grace=timedelta(seconds=-60))
+    assert gc.reconcile().orphans_removed == 0
+    assert cold_path.exists()
+
+    assert service.resolve_path(file).read_bytes() == payload
+    session.refresh(file)
+    assert (file.storage_codec, file.stored_size) == (None, None)
+    assert not cold_path.exists()
+    assert ColdStorageService(session, storage=service.storage).freeze_idle().compressed == 0
+
+
+@pytest.mark.skipif(shutil.which("zstd") is None, reason="zstd CLI not installed")
+def test_tier_moves_keep_blobs_leased_by_downloads(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  payload = b"noxtools leased blob " * 100_000
+  with Session(engine) as session:
+    service = _service(tmp_path, session)
+    file = service.create_from_upload(
+      UploadFile(io.BytesIO(payload), filename="notes.txt"),
+      file_type="other",
+    )
+    hot = service.lease_blob(file)
+    assert hot is not None and hot.codec is None
+
+    ColdStorageService(session, storage=service.storage, idle_after=timedelta(0)).freeze(
+      file, ColdTierReport()
+    )
+    session.refresh(file)
+    assert file.storage_codec == ZSTD
+    assert hot.path.read_bytes() == payload
+
+    cold = service.lease_blob(file)
+    assert cold is not None and cold.codec == ZSTD
+    hot.release()
+    hot.release()
+    assert hot.path.exists()
+
+    assert cold.thaw().read_bytes() == payload
+    assert b"".join(iter_decoded(cold.path, ZSTD)) == payload
+    cold.release()
+    assert not cold.path.exists()
+    assert service.resolve_path(file).read_bytes() == payload
@@ -0,0 +1,72 @@
+from __future__ import annotations
+
+import hashlib
+import io
+import os
+from pathlib import Path
+
+import pytest
+
+from app.utils import hashing
+from app.utils.hashing import HASH_CHUNK_SIZE, MMAP_MIN_BYTES, hash_file, hash_files, hash_stream
+
+SIZES = [0, 1, HASH_CHUNK_SIZE + 1, MMAP_MIN_BYTES - 1, MMAP_MIN_BYTES, MMAP_MIN_BYTES + 4097]
+
+
+class _ReadOnlyStream:
+  """A stream exposing read() but not readinto()."""
+
+  def __init__(self, data: bytes) -> None:
+    self._buffer = io.BytesIO(data)
+
+  def read(self, size: int = -1) -> bytes:
+    return self._buffer.read(size)
+
+
+def _expected(data: bytes) -> tuple[str, int]:
+  return hashlib.sha256(data).hexdigest(), len(data)
+
+
+@pytest.fixture(scope="module")
+def payload() -> bytes:
+  return os.urandom(max(SIZES))
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_hash_file_matches_hashlib_across_mmap_threshold(
+  tmp_path: Path, payload: bytes, size: int
+) -> None:
+  path = tmp_path / "blob"
+  path.write_bytes(payload[:size])
+
+  assert hash_file(path) == _expected(payload[:size])
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_hash_file_without_file_digest_reads_into_buffer(
+  tmp_path: Path, payload: bytes, size: int, monkeypatch
+) -> None:
+  path = tmp_path / "blob"
+  path.write_bytes(payload[:size])
+  monkeypatch.delattr(hashing.hashlib, "file_digest", raising=False)
+  monkeypatch.setattr(hashing, "MMAP_MIN_BYTES", max(SIZES) + 1)
+
+  assert hash_file(path) == _expected(payload[:size])
+
+
+@pytest.mark.parametrize("size", SIZES)
+def test_hash_stream_with_and_without_readinto(payload: bytes, size: int) -> None:
+  data = payload[:size]
+
+  assert hash_stream(io.BytesIO(data)) == _expected(data)
+  assert hash_stream(_ReadOnlyStream(data)) == _expected(data)
+
+
+def test_hash_files_keeps_input_order(tmp_path: Path, payload: bytes) -> None:
+  paths = []
+  for size in SIZES:
+    path = tmp_path / f"blob-{size}"
+    path.write_bytes(payload[:size])
+    paths.append(path)
+
+  assert hash_files(paths, max_workers=3) == [_expected(payload[:size]) for size in SIZES]
@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import hashlib
+import shutil
+from pathlib import Path
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.utils.compression import ZSTD, encode_file, iter_decoded
+from app.utils.http import IMMUTABLE_CACHE, cached_bytes_response, file_response
+
+PAYLOAD = bytes(range(256)) * 64
+
+
+def _client(path: Path, **kwargs) -> TestClient:
+  app = FastAPI()
+
+  @app.get("/download")
+  def download():
+    return file_response(
+      path,
+      filename="track.wav",
+      size=len(PAYLOAD),
+      checksum=hashlib.sha256(PAYLOAD).hexdigest(),
+      **kwargs,
+    )
+
+  return TestClient(app)
+
+
+def test_downloads_support_ranges_and_conditional_gets(tmp_path: Path) -> None:
+  blob = tmp_path / "blob"
+  blob.write_bytes(PAYLOAD)
+  client = _client(blob, immutable=True)
+
+  full = client.get("/download")
+  etag = full.headers["etag"]
+  assert full.content == PAYLOAD
+  assert etag == f'"{hashlib.sha256(PAYLOAD).hexdigest()}"'
+  assert full.headers["cache-control"] == IMMUTABLE_CACHE
+  assert full.headers["accept-ranges"] == "bytes"
+
+  partial = client.get("/download", headers={"Range": "bytes=100-199"})
+  assert partial.status_code == 206
+  assert partial.content == PAYLOAD[100:200]
+  assert partial.headers["content-range"] == f"bytes 100-199/{len(PAYLOAD)}"
+
+  cached = client.get("/download", headers={"If-None-Match": f'W/"other", {etag}'})
+  assert cached.status_code == 304
+  assert cached.content == b""
+  assert cached.headers["etag"] == etag
+
+
+def test_on_close_runs_after_every_response(tmp_path: Path) -> None:
+  blob = tmp_path / "blob"
+  blob.write_bytes(PAYLOAD)
+  closed: list[bool] = []
+  client = _client(blob, on_close=lambda: closed.append(True))
+
+  etag = client.get("/download").headers["etag"]
+  client.get("/download", headers={"Range": "bytes=0-9"})
+  client.get("/download", headers={"If-None-Match": etag})
+
+  assert closed == [True, True, True]
+
+
+@pytest.mark.skipif(shutil.which("zstd") is None, reason="zstd CLI not installed")
+def test_cold_downloads_decode_requested_range(tmp_path: Path) -> None:
+  source = tmp_path / "source"
+  source.write_bytes(PAYLOAD)
+  blob = tmp_path / "blob.zst"
+  encode_file(source, blob, ZSTD)
+  client = _client(blob, codec=ZSTD)
+
+  full = client.get("/download")
+  assert full.content == PAYLOAD
+  assert full.headers["cache-control"] == "no-cache"
+
+  partial = client.get("/download", headers={"Range": "bytes=-300"})
+  assert partial.status_code == 206
+  assert partial.content == PAYLOAD[-300:]
+  assert partial.headers["content-range"] == f"bytes {len(PAYLOAD) - 300}-{len(PAYLOAD) - 1}/{len(PAYLOAD)}"
+
+  stale = client.get("/download", headers={"Range": "bytes=0-9", "If-Range": '"old"'})
+  assert (stale.status_code, stale.content) == (200, PAYLOAD)
+  assert client.get("/download", headers={"Range": f"bytes={len(PAYLOAD)}-"}).status_code == 416
+  assert client.get("/download", headers={"Range": "bytes=5-3"}).status_code == 200
+  assert client.get("/download", headers={"If-None-Match": full.headers["etag"]}).status_code == 304
+
+
+@pytest.mark.skipif(shutil.which("zstd") is None, reason="zstd CLI not installed")
+def test_cold_range_requests_thaw_once_then_serve_the_plain_file(tmp_path: Path) -> None:
+  source = tmp_path / "source"
+  source.write_bytes(PAYLOAD)
+  blob = tmp_path / "blob.zst"
+  encode_file(source, blob, ZSTD)
+  source.unlink()
+  thawed: list[Path] = []
+
+  def thaw() -> Path:
+    if not thawed:
+      source.write_bytes(b"".join(iter_decoded(blob, ZSTD)))
+    thawed.append(source)
+    return source
+
+  client = _client(blob, codec=ZSTD, thaw=thaw)
+
+  assert client.get("/download").content == PAYLOAD
+  assert thawed == []
+  partial = client.get("/download", headers={"Range": "bytes=100-199"})
+  assert (partial.status_code, partial.content) == (206, PAYLOAD[100:200])
+  multi = client.get("/download", headers={"Range": "bytes=0-9,20-29"})
+  assert multi.status_code == 206
+  assert len(thawed) == 2
+
+
+@pytest.mark.parametrize("header", ["bytes=5-3", "bytes=abc", "items=0-9", "bytes=0-9,5-3"])
+def test_invalid_range_headers_are_ignored(tmp_path: Path, header: str) -> None:
+  blob = tmp_path / "blob"
+  blob.write_bytes(PAYLOAD)
+
+  response = _client(blob).get("/download", headers={"Range": header})
+
+  assert (response.status_code, response.content) == (200, PAYLOAD)
+
+
+def test_derived_bytes_are_cached_under_their_etag() -> None:
+  app = FastAPI()
+
+  @app.get("/peaks")
+  def peaks():
+    return cached_bytes_response(b"NXPK", etag="abc-peaks-v1-8", media_type="application/octet-stream")
+
+  client = TestClient(app)
+  first = client.get("/peaks")
+  assert (first.content, first.headers["etag"]) == (b"NXPK", '"abc-peaks-v1-8"')
+  assert first.headers["cache-control"] == IMMUTABLE_CACHE
+  cached = client.get("/peaks", headers={"If-None-Match": first.headers["etag"]})
+  assert (cached.status_code, cached.content) == (304, b"")
+
@@ -0,0 +1,156 @@
+from __future__ import annotations
+
+import importlib.util
+import shutil
+import wave
+from pathlib import Path
+from types import SimpleNamespace
+
+import numpy as np
+import pytest
+
+from app.errors import ExecutionError
+from app.jobs.model import Job, JobTool
+from app.tools.noxsongizer import separation
+from app.tools.noxsongizer.encoding import encode_stems
+from app.tools.noxsongizer.executor import NoxsongizerExecutor
+from app.tools.noxsongizer.profiles import resolve_profile
+from app.tools.noxsongizer.separation import (
+  SeparationBatch,
+  SeparationRequest,
+  _StemWriter,
+  _TrackState,
+)
+from app.utils.hashing import hash_file
+from app.worker.resources import CoreBudget
+
+
+def _write_wav(path: Path, frames: bytes = b"\1\0" * 4410, *, rate: int = 44100) -> Path:
+  path.parent.mkdir(parents=True, exist_ok=True)
+  with wave.open(str(path), "wb") as writer:
+    writer.setnchannels(1)
+    writer.setsampwidth(2)
+    writer.setframerate(rate)
+    writer.writeframes(frames)
+  return path
+
+
+class _FakeServer:
+  """Writes Demucs-shaped stems for every item but fails the named inputs."""
+
+  def __init__(self, failing: set[str]) -> None:
+    self.failing = failing
+    self.batches: list[list[str]] = []
+
+  def separate_batch(self, items, *, profile, cores, cancel_token=None):
+    self.batches.append([item.input_path.name for item in items])
+    errors: list[str | None] = []
+    for item in items:
+      if item.input_path.name in self.failing:
+        errors.append("Demucs failed on this track")
+        continue
+      track_dir = item.output_dir / profile.model / item.input_path.stem
+      for stem in ("vocals", "no_vocals"):
+        _write_wav(track_dir / f"{stem}.wav")
+      errors.append(None)
+    return errors
+
+
+def test_execute_batch_isolates_a_failing_track(tmp_path: Path) -> None:
+  server = _FakeServer(failing={"b.wav"})
+  executor = NoxsongizerExecutor(work_root=tmp_path, server=server, budget=CoreBudget([0, 1]))
+  jobs = [
+    Job(
+      tool=JobTool.NOXSONGIZER,
+      params={"profile": "fast", "two_stems": True},
+      input_path=str(_write_wav(tmp_path / "inputs" / name)),
+      input_filename=name,
+    )
+    for name in ("a.wav", "b.wav", "c.wav")
+  ]
+
+  ok, failed, other = executor.execute_batch([(job, None, None) for job in jobs])
+
+  assert server.batches == [["a.wav", "b.wav", "c.wav"]]
+  assert isinstance(failed, ExecutionError)
+  assert str(failed) == "Demucs failed on this track"
+  for result in (ok, other):
+    assert result.summary["batch_size"] == 3
+    assert result.summary["profile"] == resolve_profile("fast").name
+    assert sorted(item.label for item in result.output_files) == ["Accompaniment", "Vocals"]
+    assert all(item.path.is_file() for item in result.output_files)
+  assert sorted(path.name for path in tmp_path.glob("noxsongizer_*")) == sorted(
+    path.name for result in (ok, other) for path in result.cleanup_paths
+  )
+
+
+def _wav_samples(path: Path) -> tuple[int, np.ndarray]:
+  with wave.open(str(path), "rb") as reader:
+    frames = reader.getnframes()
+    return frames, np.frombuffer(reader.readframes(frames), dtype="<i2")
+
+
+def test_track_state_crossfades_windows_without_seams(tmp_path: Path, monkeypatch) -> None:
+  level, total_frames = 0.5, 450
+  monkeypatch.setattr(separation, "_stream_stats", lambda *_args: (total_frames, 0.1, 2.0))
+  model = SimpleNamespace(sources=["vocals", "drums"], samplerate=1000, audio_channels=2)
+  request = SeparationRequest("r1", str(tmp_path / "track.wav"), str(tmp_path / "out"))
+  batch = SeparationBatch("b1", "htdemucs", (request,), segment_seconds=0.1, crossfade_seconds=0.02)
+  track = _TrackState(model, request, batch)
+
+  while not track.done:
+    start = track.index * track.segment
+    frames = min(track.segment + track.crossfade, total_frames - start)
+    window = (np.full((2, frames), level, dtype=np.float32) - track.mean) / track.std
+    track.write(np.stack([window, window]))
+  track.close()
+
+  for name in model.sources:
+    frames, samples = _wav_samples(tmp_path / "out" / "htdemucs" / "track" / f"{name}.wav")
+    assert frames == total_frames
+    assert np.all(samples == int(level * 32767))
+
+
+def test_stem_writer_scales_a_clipping_stem_instead_of_clipping(tmp_path: Path) -> None:
+  writer = _StemWriter(tmp_path / "vocals.wav", 1000, 1)
+  peak = 2.0
+  audio = np.array([[0.5, -peak, 1.0, peak]], dtype=np.float32)
+  writer.write(audio[:, :2])
+  writer.write(audio[:, 2:])
+  writer.close()
+
+  frames, samples = _wav_samples(tmp_path / "vocals.wav")
+  expected = (audio[0] / (1.01 * peak) * 32767.0).astype("<i2")
+  assert frames == 4
+  assert np.array_equal(samples, expected)
+  assert np.abs(samples).max() < 32767
+  assert not (tmp_path / "vocals.f32").exists()
+
+
+@pytest.mark.parametrize(
+  "output_format",
+  [
+    "wav",
+    pytest.param(
+      "flac",
+      marks=pytest.mark.skipif(shutil.which("ffmpeg") is None, reason="ffmpeg not installed"),
+    ),
+    pytest.param(
+      "mp3",
+      marks=pytest.mark.skipif(importlib.util.find_spec("lameenc") is None, reason="lameenc not installed"),
+    ),
+  ],
+)
+def test_encode_stems_hashes_outputs_and_cleans_up(tmp_path: Path, output_format: str) -> None:
+  tone = (np.sin(np.arange(44100) / 10) * 12000).astype("<i2").tobytes()
+  sources = [_write_wav(tmp_path / f"{name}.wav", tone) for name in ("vocals", "drums")]
+
+  encoded = encode_stems(sources, output_format, max_workers=2)
+
+  assert [item.path.name for item in encoded] == [f"{name}.{output_format}" for name in ("vocals", "drums")]
+  for item in encoded:
+    assert item.path.is_file()
+    assert (item.checksum, item.size) == hash_file(item.path)
+  if output_format != "wav":
+    assert not any(source.exists() for source in sources)
+  assert list(tmp_path.glob(".partial_*")) == []
@@ -0,0 +1,113 @@
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.jobs.model import Job, JobTool
+from app.jobs.service import JobService
+from app.tools.noxtubizer.bandwidth import MIN_SHARE_BYTES, BandwidthBudget
+from app.tools.noxtubizer.executor import NoxtubizerExecutor
+from app.worker.cancellation import CancellationToken, JobCancelled
+from tests.fakes import FakeMediaToolchain
+
+URL = "https://www.youtube.com/watch?v=abc123"
+
+
+def _job(mode: str, **params) -> Job:
+  job_params = {"url": URL, "mode": mode, **params}
+  signature = JobService.build_signature(
+    tool=JobTool.NOXTUBIZER,
+    input_url=URL,
+    params=job_params,
+  )
+  return Job(tool=JobTool.NOXTUBIZER, params=job_params, signature=signature)
+
+
+@pytest.fixture
+def toolchain():
+  with FakeMediaToolchain(audio_mb=0.25, video_mb=0.5) as fake:
+    yield fake
+
+
+def test_audio_mode(toolchain: FakeMediaToolchain, tmp_path: Path) -> None:
+  executor = NoxtubizerExecutor(work_root=tmp_path)
+  result = executor.execute(_job("audio", audio_quality="128kbps", audio_format="mp3"))
+
+  [output] = result.output_files
+  assert output.path.exists()
+  assert output.name == "Synthetic abc123_audio.mp3"
+  assert output.media is not None
+  assert output.media.audio_bitrate_kbps == 128
+  assert toolchain.spawn_counts() == {"yt-dlp": 2, "ffprobe": 1}
+
+
+def test_video_mode_remuxes_once(toolchain: FakeMediaToolchain, tmp_path: Path) -> None:
+  executor = NoxtubizerExecutor(work_root=tmp_path)
+  result = executor.execute(_job("video", video_quality="1080p", video_format="mp4"))
+
+  [output] = result.output_files
+  assert output.format == "mp4"
+  assert output.media is not None
+  assert output.media.height == 1080
+  assert toolchain.spawn_counts() == {"yt-dlp": 2, "ffmpeg": 1, "ffprobe": 1}
+
+
+def test_both_mode_probes_only_final_output(toolchain: FakeMediaToolchain, tmp_path: Path) -> None:
+  executor = NoxtubizerExecutor(work_root=tmp_path)
+  result = executor.execute(
+    _job("both", audio_format="mp3", video_quality="720p", video_format="mp4"),
+  )
+
+  [output] = result.output_files
+  assert output.label == "Both"
+  assert output.media is not None
+  assert output.media.height == 720
+  assert output.media.audio is not None
+  assert toolchain.spawn_counts() == {"yt-dlp": 3, "ffmpeg": 2, "ffprobe": 1}
+  assert sorted(path.name for path in result.cleanup_paths[0].iterdir()) == [output.name]
+
+
+def test_retry_reuses_finished_steps(toolchain: FakeMediaToolchain, tmp_path: Path) -> None:
+  executor = NoxtubizerExecutor(work_root=tmp_path)
+  job = _job("audio", audio_format="mp3")
+
+  first = executor.execute(job)
+  toolchain.reset_counts()
+  second = executor.execute(job)
+
+  assert first.cleanup_paths == second.cleanup_paths
+  assert toolchain.spawn_counts() == {"yt-dlp": 1, "ffprobe": 1}
+
+
+def test_bandwidth_shares_are_rebalanced_as_downloads_start_and_finish() -> None:
+  limit = 100 * MIN_SHARE_BYTES
+  budget = BandwidthBudget(limit)
+  rates: list[int | None] = []
+
+  def wait_for(count: int) -> None:
+    deadline = time.monotonic() + 5
+    while len(rates) < count and time.monotonic() < deadline:
+      time.sleep(0.01)
+
+  def first(rate: int | None, token: CancellationToken) -> None:
+    rates.append(rate)
+    while not token.cancelled:
+      if len(rates) == 3:
+        return
+      time.sleep(0.01)
+    raise JobCancelled()
+
+  def second(rate: int | None, token: CancellationToken) -> None:
+    assert rate == limit // 2
+    wait_for(2)
+
+  thread = threading.Thread(target=budget.run, args=(first,), daemon=True)
+  thread.start()
+  wait_for(1)
+  budget.run(second)
+  thread.join(timeout=5)
+
+  # Halved while the second download ran, restored once it finished.
+  assert rates == [limit, limit // 2, limit]
+  assert budget.active == 0
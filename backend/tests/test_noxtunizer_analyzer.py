@@ -0,0 +1,141 @@
+import os
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from app.jobs.model import Job, JobTool
+from app.tools.noxtunizer.analyzer import analyze_file
+from app.tools.noxtunizer.executor import BatchTrack, NoxtunizerExecutor
+from app.worker.cancellation import CancellationToken, JobCancelled
+from app.worker.resources import CoreBudget
+from tests.fakes import write_synthetic_track
+
+
+@pytest.mark.parametrize(
+  ("bpm", "tonic", "scale"),
+  [(128, "C", "major"), (95, "A", "minor"), (174, "D", "major")],
+)
+def test_analyzer_recovers_tempo_and_key(tmp_path: Path, bpm: float, tonic: str, scale: str) -> None:
+  track = write_synthetic_track(tmp_path / "track.wav", bpm=bpm, tonic=tonic, scale=scale)
+
+  analysis = analyze_file(track)
+
+  assert analysis.bpm == pytest.approx(bpm, abs=1.5)
+  assert (analysis.key, analysis.scale) == (tonic, scale)
+  assert analysis.duration == pytest.approx(30, abs=0.01)
+
+
+def test_numpy_engine_summary(tmp_path: Path) -> None:
+  track = write_synthetic_track(tmp_path / "track.wav", bpm=140, tonic="Bb", scale="minor")
+  job = Job(tool=JobTool.NOXTUNIZER, params={"engine": "numpy"}, input_path=str(track))
+
+  summary = NoxtunizerExecutor().execute(job).summary
+
+  assert summary == {
+    "bpm": 140,
+    "key": "Bb Minor",
+    "duration": pytest.approx(30, abs=0.01),
+    "duration_label": "0:30",
+    "engine": "numpy",
+    "analyzer_version": 1,
+  }
+
+
+def test_batch_reports_each_track(tmp_path: Path) -> None:
+  tracks = [
+    BatchTrack(
+      file_id=f"file-{bpm}",
+      name=f"{bpm}.wav",
+      path=write_synthetic_track(tmp_path / f"{bpm}.wav", bpm=bpm, tonic="C", scale="major"),
+    )
+    for bpm in (100, 128)
+  ]
+  tracks.append(BatchTrack(file_id="broken", name="broken.wav", path=tmp_path / "missing.wav"))
+  job = Job(tool=JobTool.NOXTUNIZER, params={"mode": "batch", "engine": "numpy"})
+  recorded: dict[str, dict] = {}
+
+  summary = NoxtunizerExecutor(budget=CoreBudget([0, 1])).execute_batch(
+    job,
+    tracks=tracks,
+    on_result=lambda file_id, result: recorded.setdefault(file_id, result),
+  ).summary
+
+  assert (summary["total"], summary["analyzed"], summary["failed"]) == (3, 2, 1)
+  assert [track["bpm"] for track in summary["tracks"][:2]] == [100, 128]
+  assert "error" in summary["tracks"][2]
+  assert sorted(recorded) == ["file-100", "file-128"]
+
+
+def test_batch_reuses_cached_analyses(tmp_path: Path) -> None:
+  tracks = [
+    BatchTrack(file_id="cached", name="cached.wav", path=tmp_path / "not-decoded.wav"),
+    BatchTrack(
+      file_id="fresh",
+      name="fresh.wav",
+      path=write_synthetic_track(tmp_path / "fresh.wav", bpm=120, tonic="A", scale="minor"),
+    ),
+  ]
+  job = Job(tool=JobTool.NOXTUNIZER, params={"mode": "batch", "engine": "numpy"})
+  recorded: list[str] = []
+
+  summary = NoxtunizerExecutor(budget=CoreBudget([0])).execute_batch(
+    job,
+    tracks=tracks,
+    on_result=lambda file_id, result: recorded.append(file_id),
+    cached={"cached": {"bpm": 90, "key": "C Major", "duration": 61.0}},
+  ).summary
+
+  assert (summary["analyzed"], summary["failed"], summary["cached_tracks"]) == (2, 0, 1)
+  assert summary["tracks"][0]["cached"] is True
+  assert summary["tracks"][0]["duration_label"] == "1:01"
+  assert recorded == ["fresh"]
+
+
+def test_pool_setup_imports_no_numpy() -> None:
+  backend = Path(__file__).resolve().parents[1]
+  probe = "import sys, app.tools.noxtunizer.pool; print('numpy' in sys.modules)"
+  result = subprocess.run([sys.executable, "-c", probe], cwd=backend, capture_output=True, text=True)
+  assert result.stdout.strip() == "False", result.stderr
+
+
+def _running(pid: int) -> bool:
+  try:
+    state = Path(f"/proc/{pid}/stat").read_text().rsplit(")", 1)[1].split()[0]
+  except (OSError, IndexError):
+    return False
+  return state not in ("Z", "X")
+
+
+@pytest.mark.skipif(
+  not hasattr(os, "killpg") or not Path("/proc/self/stat").exists(),
+  reason="needs process groups and /proc",
+)
+def test_cancelled_batch_kills_workers_and_extractors(tmp_path: Path) -> None:
+  started = tmp_path / "started"
+  started.mkdir()
+  extractor = tmp_path / "extractor"
+  extractor.write_text(f'#!/bin/sh\necho $$ > "{started}/$$"\nexec sleep 60\n')
+  extractor.chmod(0o755)
+  tracks = [BatchTrack(file_id=f"file-{n}", name=f"{n}.wav", path=tmp_path / f"{n}.wav") for n in range(2)]
+  job = Job(tool=JobTool.NOXTUNIZER, params={"mode": "batch", "engine": "essentia"})
+  token = CancellationToken("job")
+
+  def cancel_once_extracting() -> None:
+    deadline = time.monotonic() + 60
+    while len(list(started.iterdir())) < 2 and time.monotonic() < deadline:
+      time.sleep(0.05)
+    token.cancel()
+
+  threading.Thread(target=cancel_once_extracting, daemon=True).start()
+  executor = NoxtunizerExecutor(extractor_bin=str(extractor), work_root=tmp_path, budget=CoreBudget([0, 1]))
+  with pytest.raises(JobCancelled):
+    executor.execute_batch(job, tracks=tracks, cancel_token=token)
+
+  pids = [int(path.name) for path in started.iterdir()]
+  assert len(pids) == 2
+  assert not any(_running(pid) for pid in pids)
+  assert list(tmp_path.glob("noxtunizer_pool_*")) == []
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from pathlib import Path
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.files.model import File, _utcnow
+from app.files.storage import FileStorage
+from app.jobs.file_links import JobFileRole, JobFileService
+from app.jobs.model import JobStatus, JobTool
+from app.jobs.retention import StorageQuotas, StorageRetentionService, parse_size
+from app.jobs.service import JobService
+
+
+def _store(tmp_path: Path, links: JobFileService, name: str, payload: bytes) -> File:
+  source = tmp_path / name
+  source.write_bytes(payload)
+  return links.file_service.create_from_path(source, file_type="audio", name=name)
+
+
+def test_evicts_least_recently_downloaded_outputs_and_pins_inputs(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  storage = FileStorage(tmp_path / "storage")
+  with Session(engine) as session:
+    links = JobFileService(session, storage=storage)
+    jobs = JobService(session)
+    source = _store(tmp_path, links, "song.wav", b"i" * 100)
+    stale = _store(tmp_path, links, "song_vocals.wav", b"v" * 100)
+    fresh = _store(tmp_path, links, "song_drums.wav", b"d" * 100)
+
+    original = jobs.create_job(tool=JobTool.NOXSONGIZER, status=JobStatus.DONE, signature="v1:song")
+    clone = jobs.create_job(tool=JobTool.NOXSONGIZER, status=JobStatus.DONE, signature="v1:song")
+    for job in (original, clone):
+      links.link(job.id, source.id, JobFileRole.INPUT)
+      links.link(job.id, stale.id, JobFileRole.OUTPUT)
+      links.link(job.id, fresh.id, JobFileRole.OUTPUT)
+
+    last_week = _utcnow() - timedelta(days=7)
+    links.file_service.repo.touch(stale.id, accessed_at=last_week, stale_before=_utcnow())
+    links.file_service.mark_accessed(fresh)
+
+    retention = StorageRetentionService(
+      session,
+      storage=storage,
+      quotas=StorageQuotas(total=250, by_tool={"noxsongizer": 50}),
+    )
+    usage = retention.usage()
+    assert (usage.total.bytes, usage.pinned_bytes) == (300, 100)
+    assert [(row.name, row.bytes, row.quota) for row in usage.by_tool] == [("noxsongizer", 200, 50)]
+
+    report = retention.enforce()
+
+    assert report.evicted_files == 2
+    assert report.reclaimed_bytes == 200
+    assert sorted(report.invalidated_jobs) == sorted([original.id, clone.id])
+    assert [(row.scope, row.bytes) for row in report.over_quota] == []
+    assert links.file_service.repo.get(source.id) is not None
+    assert links.file_service.resolve_path(source).exists()
+    for job in (original, clone):
+      refreshed = jobs.get_job(job.id)
+      assert refreshed.signature is None
+      assert refreshed.output_files == []
+      assert refreshed.result["evicted"] == ["song_vocals.wav", "song_drums.wav"]
+    assert jobs.find_signature_matches("v1:song") == (None, None)
+
+
+def test_mark_accessed_writes_at_most_once_per_interval(tmp_path: Path) -> None:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  with Session(engine) as session:
+    links = JobFileService(session, storage=FileStorage(tmp_path / "storage"))
+    file = _store(tmp_path, links, "a.wav", b"a")
+
+    links.file_service.mark_accessed(file)
+    session.refresh(file)
+    first = file.accessed_at
+    links.file_service.mark_accessed(file)
+    session.refresh(file)
+
+    assert first is not None
+    assert file.accessed_at == first
+    assert parse_size("20G") == 20 * 1024**3
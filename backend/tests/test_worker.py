@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from datetime import timedelta
+from pathlib import Path
+
+from sqlmodel import Session, SQLModel, create_engine
+
+from app.errors import ExecutionError
+from app.jobs.model import Job, JobStatus, JobTool, _utcnow
+from app.jobs.schemas import JobExecutionResult
+from app.worker.worker import JobWorker
+
+
+def _worker(tmp_path: Path, profiles: list[str]) -> tuple[JobWorker, list[str]]:
+  engine = create_engine(f"sqlite:///{tmp_path / 'db.sqlite'}")
+  SQLModel.metadata.create_all(engine)
+  created = _utcnow()
+  jobs = [
+    Job(
+      tool=JobTool.NOXSONGIZER,
+      params={"profile": profile},
+      created_at=created + timedelta(seconds=index),
+    )
+    for index, profile in enumerate(profiles)
+  ]
+  with Session(engine) as session:
+    session.add_all(jobs)
+    session.commit()
+    ids = [job.id for job in jobs]
+  return JobWorker(engine, poll_interval=0.01), ids
+
+
+def _register(worker: JobWorker, executor, *, max_batch: int = 2) -> list[list[str]]:
+  calls: list[list[str]] = []
+
+  def run(items, _service):
+    calls.append([job.id for job, _token in items])
+    return executor(items)
+
+  worker.register_batch_executor(
+    JobTool.NOXSONGIZER,
+    run,
+    batch_key=lambda job: (job.params or {}).get("profile"),
+    max_batch=max_batch,
+  )
+  return calls
+
+
+def _next_batch(worker: JobWorker) -> list[str]:
+  job = worker._acquire_next_job()
+  assert job is not None
+  batch = worker.batch_executors[job.tool]
+  job_ids = [job.id, *worker._acquire_batch_peers(job, batch)]
+  worker._process_batch(job_ids, batch)
+  return job_ids
+
+
+def _jobs(worker: JobWorker, ids: list[str]) -> list[Job]:
+  with Session(worker.engine) as session:
+    return [session.get(Job, job_id) for job_id in ids]
+
+
+def _done(items) -> list[JobExecutionResult]:
+  return [JobExecutionResult(summary={"job": job.id}) for job, _token in items]
+
+
+def test_batches_group_by_key_up_to_max_batch(tmp_path: Path) -> None:
+  worker, ids = _worker(tmp_path, ["fast", "best", "fast", "fast"])
+  calls = _register(worker, _done, max_batch=2)
+
+  assert _next_batch(worker) == [ids[0], ids[2]]
+  assert calls == [[ids[0], ids[2]]]
+  first, skipped, peer, left = _jobs(worker, ids)
+  assert (first.status, peer.status) == (JobStatus.DONE, JobStatus.DONE)
+  assert peer.result["summary"] == {"job": peer.id}
+  assert (skipped.status, skipped.locked_at) == (JobStatus.PENDING, None)
+  assert (left.status, left.locked_at) == (JobStatus.PENDING, None)
+
+  assert _next_batch(worker) == [ids[1]]
+  assert _next_batch(worker) == [ids[3]]
+  assert [job.status for job in _jobs(worker, ids)] == [JobStatus.DONE] * 4
+
+
+def test_a_failing_job_does_not_fail_its_batch(tmp_path: Path) -> None:
+  worker, ids = _worker(tmp_path, ["fast", "fast", "fast"])
+
+  def one_fails(items):
+    outcomes = _done(items)
+    outcomes[1] = ExecutionError("stem 2 exploded")
+    return outcomes
+
+  _register(worker, one_fails, max_batch=3)
+  _next_batch(worker)
+
+  ok, failed, other = _jobs(worker, ids)
+  assert (ok.status, other.status) == (JobStatus.DONE, JobStatus.DONE)
+  assert (failed.status, failed.error_message) == (JobStatus.ERROR, "stem 2 exploded")
+
+
+def test_a_raising_or_miscounting_executor_fails_every_job(tmp_path: Path) -> None:
+  worker, ids = _worker(tmp_path, ["fast", "fast", "best", "best"])
+
+  def broken(items):
+    if items[0][0].params["profile"] == "fast":
+      raise ExecutionError("model crashed")
+    return _done(items)[:1]
+
+  _register(worker, broken, max_batch=2)
+  _next_batch(worker)
+  _next_batch(worker)
+
+  jobs = _jobs(worker, ids)
+  assert [job.status for job in jobs] == [JobStatus.ERROR] * 4
+  assert [job.error_message for job in jobs[:2]] == ["model crashed"] * 2
+  assert jobs[2].error_message == "Batch executor returned a mismatched result count"
@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import shutil
+
+import pytest
+
+from app.errors import ExecutionError
+from app.worker import resources
+from app.worker.cancellation import CancellationToken, JobCancelled
+from app.worker.process import run_capture
+from app.worker.resources import CoreBudget, parse_cores
+
+
+def test_parse_cores_accepts_ranges_and_skips_junk() -> None:
+  assert parse_cores("0-3,6") == [0, 1, 2, 3, 6]
+  assert parse_cores(" 5-3 , 4") == [3, 4, 5]
+  assert parse_cores("x,2,1-a,,-,7") == [2, 7]
+  assert parse_cores(None) == parse_cores("") == []
+
+
+def test_from_env_keeps_reserved_cores_for_the_api(monkeypatch) -> None:
+  monkeypatch.delenv("NOXTOOLS_CPU_CORES", raising=False)
+  monkeypatch.setattr(resources, "available_cores", lambda: [0, 1, 2, 3])
+
+  monkeypatch.setenv("NOXTOOLS_RESERVED_CORES", "2")
+  assert CoreBudget.from_env().cores == [2, 3]
+  monkeypatch.setenv("NOXTOOLS_RESERVED_CORES", "many")
+  assert CoreBudget.from_env().cores == [1, 2, 3]
+  monkeypatch.setenv("NOXTOOLS_RESERVED_CORES", "4")
+  assert CoreBudget.from_env().cores == [0, 1, 2, 3]
+
+  monkeypatch.setenv("NOXTOOLS_CPU_CORES", "0,2-3")
+  assert CoreBudget.from_env().cores == [0, 2, 3]
+
+
+def test_reserve_hands_out_disjoint_cores() -> None:
+  budget = CoreBudget([0, 1, 2, 3])
+  with budget.reserve(2) as first, budget.reserve(2) as second:
+    assert (first, second) == ([0, 1], [2, 3])
+    assert budget.free == 0
+  assert budget.free == 4
+  with budget.reserve() as everything:
+    assert everything == [0, 1, 2, 3]
+
+
+def test_reserve_raises_when_cancelled_while_waiting(monkeypatch) -> None:
+  monkeypatch.setattr(resources, "WAIT_SECONDS", 0.01)
+  budget = CoreBudget([0])
+  token = CancellationToken("job")
+  with budget.reserve(1):
+    token.cancel()
+    with pytest.raises(JobCancelled):
+      with budget.reserve(1, cancel_token=token):
+        pytest.fail("cores were granted twice")
+  assert budget.free == 1
+
+
+@pytest.mark.skipif(shutil.which("sleep") is None, reason="sleep not available")
+def test_timeout_names_the_tool_not_taskset() -> None:
+  with pytest.raises(ExecutionError, match="^sleep timed out$"):
+    run_capture(["sleep", "5"], cpu_affinity=[0], timeout=0.1)
@@ -1,2 +1,19 @@
-export { listFiles, getFileContentUrl } from "./queries"
-export type { PaginatedFiles, ListFilesParams } from "./types"
+export {
+  listFiles,
+  getFileContentUrl,
+  getFilePeaks,
+  getStorageUsage,
+  getUploadSession,
+  uploadFileResumable,
+  uploadFileStream,
+} from "./queries"
+export type {
+  PaginatedFiles,
+  ListFilesParams,
+  ResumableUploadOptions,
+  StorageScope,
+  StorageUsage,
+  StreamFileType,
+  UploadSession,
+  WaveformPeaks,
+} from "./types"
@@ -1,5 +1,14 @@
 import { API_BASE_URL, handleResponse } from "@/shared/api"
-import type { ListFilesParams, PaginatedFiles } from "./types"
+import type { StoredFile } from "../model/types"
+import type {
+  ListFilesParams,
+  PaginatedFiles,
+  ResumableUploadOptions,
+  StorageUsage,
+  StreamFileType,
+  UploadSession,
+  WaveformPeaks,
+} from "./types"
 
 type FileContentVariant = "thumb"
 
@@ -10,6 +19,15 @@ export async function listFiles(
 
   if (params.q) search.set("q", params.q)
   if (params.type) search.set("type", params.type)
+  if (typeof params.bpm_min === "number") search.set("bpm_min", String(params.bpm_min))
+  if (typeof params.bpm_max === "number") search.set("bpm_max", String(params.bpm_max))
+  if (params.key) search.set("key", params.key)
+  if (typeof params.duration_min === "number") {
+    search.set("duration_min", String(params.duration_min))
+  }
+  if (typeof params.duration_max === "number") {
+    search.set("duration_max", String(params.duration_max))
+  }
   if (typeof params.limit === "number") search.set("limit", String(params.limit))
   if (typeof params.offset === "number") search.set("offset", String(params.offset))
 
@@ -17,6 +35,106 @@ export async function listFiles(
   return handleResponse<PaginatedFiles>(res)
 }
 
+/** Upload a file as the raw request body; tools then reference it by id. */
+export async function uploadFileStream(
+  file: File,
+  type: StreamFileType,
+): Promise<StoredFile> {
+  const url = new URL(`${API_BASE_URL}/files/stream`)
+  url.searchParams.set("name", file.name)
+  url.searchParams.set("type", type)
+
+  const res = await fetch(url.toString(), {
+    method: "POST",
+    headers: { "Content-Type": file.type || "application/octet-stream" },
+    body: file,
+  })
+  return handleResponse<StoredFile>(res)
+}
+
+const DEFAULT_CHUNK_SIZE = 8 * 1024 * 1024
+
+export async function getUploadSession(sessionId: string): Promise<UploadSession> {
+  const res = await fetch(`${API_BASE_URL}/files/uploads/${sessionId}`)
+  return handleResponse<UploadSession>(res)
+}
+
+/**
+ * Upload a large file in chunks (several in flight). Passing the id of an
+ * interrupted session re-sends only the missing ranges.
+ */
+export async function uploadFileResumable(
+  file: File,
+  type: StreamFileType,
+  opts: ResumableUploadOptions = {},
+): Promise<StoredFile> {
+  const session = opts.sessionId
+    ? await getUploadSession(opts.sessionId)
+    : await handleResponse<UploadSession>(
+        await fetch(`${API_BASE_URL}/files/uploads`, {
+          method: "POST",
+          headers: { "Content-Type": "application/json" },
+          body: JSON.stringify({ name: file.name, type, size: file.size }),
+        }),
+      )
+
+  const chunkSize = Math.min(opts.chunkSize ?? DEFAULT_CHUNK_SIZE, session.chunk_max_bytes)
+  const isReceived = (start: number, end: number) =>
+    session.ranges.some(([from, to]) => from <= start && end <= to)
+
+  const pending: number[] = []
+  for (let offset = 0; offset < file.size; offset += chunkSize) {
+    if (!isReceived(offset, Math.min(offset + chunkSize, file.size))) pending.push(offset)
+  }
+
+  let received = session.received
+  const worker = async () => {
+    for (let offset = pending.shift(); offset !== undefined; offset = pending.shift()) {
+      const res = await fetch(`${API_BASE_URL}/files/uploads/${session.id}?offset=${offset}`, {
+        method: "PUT",
+        headers: { "Content-Type": "application/octet-stream" },
+        body: file.slice(offset, offset + chunkSize),
+      })
+      received = Math.max(received, (await handleResponse<UploadSession>(res)).received)
+      opts.onProgress?.(received, file.size)
+    }
+  }
+  await Promise.all(Array.from({ length: Math.max(1, opts.concurrency ?? 3) }, worker))
+
+  const res = await fetch(`${API_BASE_URL}/files/uploads/${session.id}/complete`, {
+    method: "POST",
+  })
+  return handleResponse<StoredFile>(res)
+}
+
+// magic(4) version(1) bits(1) sample rate(4) samples per bucket(4) buckets(4)
+const PEAKS_HEADER_SIZE = 18
+
+export async function getFilePeaks(
+  fileId: string,
+  opts: { buckets?: number } = {},
+): Promise<WaveformPeaks> {
+  const url = new URL(`${API_BASE_URL}/files/${fileId}/peaks`)
+  if (typeof opts.buckets === "number") url.searchParams.set("buckets", String(opts.buckets))
+
+  const res = await fetch(url.toString())
+  if (!res.ok) await handleResponse<never>(res)
+
+  const buffer = await res.arrayBuffer()
+  const view = new DataView(buffer)
+  const buckets = view.getUint32(14, true)
+  return {
+    sampleRate: view.getUint32(6, true),
+    samplesPerBucket: view.getUint32(10, true),
+    data: new Int8Array(buffer, PEAKS_HEADER_SIZE, buckets * 2),
+  }
+}
+
+export async function getStorageUsage(): Promise<StorageUsage> {
+  const res = await fetch(`${API_BASE_URL}/files/storage`)
+  return handleResponse<StorageUsage>(res)
+}
+
 export function getFileContentUrl(
   fileId: string,
   opts: { variant?: FileContentVariant } = {},
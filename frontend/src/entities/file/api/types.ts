@@ -7,9 +7,58 @@ export interface PaginatedFiles {
   offset: number
 }
 
+export type StreamFileType = "audio" | "video" | "image"
+
+export interface UploadSession {
+  id: string
+  name: string
+  type: StreamFileType
+  size: number
+  received: number
+  /** Merged [start, end) byte ranges already stored. */
+  ranges: [number, number][]
+  chunk_max_bytes: number
+  expires_at: string
+}
+
+export interface ResumableUploadOptions {
+  /** Resume an existing session instead of opening a new one. */
+  sessionId?: string
+  chunkSize?: number
+  concurrency?: number
+  onProgress?: (received: number, total: number) => void
+}
+
+export interface WaveformPeaks {
+  sampleRate: number
+  samplesPerBucket: number
+  /** Interleaved min/max pairs scaled to -128..127. */
+  data: Int8Array
+}
+
+export interface StorageScope {
+  scope: "total" | "type" | "tool"
+  name?: string | null
+  bytes: number
+  quota?: number | null
+}
+
+export interface StorageUsage {
+  total: StorageScope
+  /** Bytes of job inputs, which are never evicted. */
+  pinned_bytes: number
+  by_type: StorageScope[]
+  by_tool: StorageScope[]
+}
+
 export interface ListFilesParams {
   q?: string
   type?: string
+  bpm_min?: number
+  bpm_max?: number
+  key?: string
+  duration_min?: number
+  duration_max?: number
   limit?: number
   offset?: number
 }
@@ -1,5 +1,22 @@
-export type { StoredFile, FileVariant, JobFileRole, JobFileLink } from "./model"
-export type { PaginatedFiles, ListFilesParams } from "./api"
-export { listFiles, getFileContentUrl } from "./api"
+export type { StoredFile, FileAnalysis, FileVariant, JobFileRole, JobFileLink } from "./model"
+export type {
+  PaginatedFiles,
+  ListFilesParams,
+  ResumableUploadOptions,
+  StorageScope,
+  StorageUsage,
+  StreamFileType,
+  UploadSession,
+  WaveformPeaks,
+} from "./api"
+export {
+  listFiles,
+  getFileContentUrl,
+  getFilePeaks,
+  getStorageUsage,
+  getUploadSession,
+  uploadFileResumable,
+  uploadFileStream,
+} from "./api"
 export { cleanFileName, getFileLabel, getFileSuffixToken } from "./lib"
 export { FileLibraryModal, FileLibraryField, FileSelectionList } from "./ui"
@@ -1 +1 @@
-export type { StoredFile, FileVariant, JobFileRole, JobFileLink } from "./types"
+export type { StoredFile, FileAnalysis, FileVariant, JobFileRole, JobFileLink } from "./types"
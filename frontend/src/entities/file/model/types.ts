@@ -5,6 +5,13 @@ export type FileVariant = {
   quality?: string | number | null
 }
 
+export type FileAnalysis = {
+  bpm?: number | null
+  key?: string | null
+  duration?: number | null
+  engine?: string
+}
+
 export type StoredFile = {
   id: string
   type: string
@@ -13,9 +20,17 @@ export type StoredFile = {
   size: number
   path: string
   created_at: string
+  accessed_at?: string | null
+  /** Set when storage reconciliation found the blob missing. */
+  missing_at?: string | null
+  /** Cold-tier codec ("zstd", "flac"), or "identity" if kept uncompressed. */
+  storage_codec?: string | null
+  /** Bytes on disk while compressed; `size` stays the original size. */
+  stored_size?: number | null
   format?: string | null
   quality?: string | number | null
   variants?: FileVariant[] | null
+  analysis?: FileAnalysis | null
 }
 
 export type JobFileRole = "input" | "output"
@@ -1,3 +1,4 @@
 export { listJobs, getJob, deleteJob, retryJob, cancelJob } from "./queries"
 export { createJobStream } from "./jobStream"
+export type { JobProgress } from "./jobStream"
 export type { PaginatedJobs, ListJobsParams } from "./types"
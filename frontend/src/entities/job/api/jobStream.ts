@@ -5,11 +5,30 @@ export type JobStreamEvent =
   | { type: "job_created"; job: Job }
   | { type: "job_updated"; job: Job }
   | { type: "job_deleted"; job_id: string }
+  | {
+      type: "job_progress"
+      job_id: string
+      stage: string
+      current: number
+      total: number
+      file_id?: string
+      result?: Record<string, unknown>
+    }
+
+export type JobProgress = {
+  jobId: string
+  stage: string
+  current: number
+  total: number
+  fileId?: string
+  result?: Record<string, unknown>
+}
 
 export type JobStreamHandlers = {
   onCreated?: (job: Job) => void
   onUpdated?: (job: Job) => void
   onDeleted?: (jobId: string) => void
+  onProgress?: (progress: JobProgress) => void
   onError?: () => void
 }
 
@@ -31,6 +50,20 @@ export function createJobStream(handlers: JobStreamHandlers) {
     if ("job_id" in data) handlers.onDeleted?.(data.job_id)
   })
 
+  es.addEventListener("job_progress", (event) => {
+    const data = JSON.parse((event as MessageEvent).data) as JobStreamEvent
+    if (data.type === "job_progress") {
+      handlers.onProgress?.({
+        jobId: data.job_id,
+        stage: data.stage,
+        current: data.current,
+        total: data.total,
+        fileId: data.file_id,
+        result: data.result,
+      })
+    }
+  })
+
   es.onerror = () => {
     handlers.onError?.()
   }
@@ -16,6 +16,8 @@ export type JobTool =
 export type JobResult<TSummary = Record<string, unknown>> = {
   summary?: TSummary
   files?: JobFileLink[]
+  /** Output names evicted to stay within storage quotas; re-run to regenerate. */
+  evicted?: string[]
 }
 
 export interface Job<TParams = unknown, TResult = JobResult> {
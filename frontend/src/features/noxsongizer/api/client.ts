@@ -9,6 +9,9 @@ export async function createJob(
 
   payload.files?.forEach((file) => form.append("files", file))
   payload.file_ids?.forEach((fileId) => form.append("file_ids", fileId))
+  if (payload.profile) form.append("profile", payload.profile)
+  if (payload.two_stems) form.append("two_stems", "true")
+  if (payload.output_format) form.append("output_format", payload.output_format)
 
   const res = await fetch(`${API_BASE_URL}/noxsongizer/jobs`, {
     method: "POST",
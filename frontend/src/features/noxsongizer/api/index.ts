@@ -4,4 +4,6 @@ export type {
   CreateResponse,
   NoxsongizerSummary,
   NoxsongizerJob,
+  SeparationProfile,
+  StemFormat,
 } from "./types"
@@ -1,8 +1,15 @@
 import { type Job, type JobResult } from "@/entities/job"
 
+export type SeparationProfile = "fast" | "balanced" | "standard" | "best"
+
+export type StemFormat = "wav" | "flac" | "mp3" | "opus"
+
 export interface CreateRequest {
   files?: File[]
   file_ids?: string[]
+  profile?: SeparationProfile
+  two_stems?: boolean
+  output_format?: StemFormat
 }
 
 export interface CreateResponse {
@@ -11,6 +18,17 @@ export interface CreateResponse {
 
 export interface NoxsongizerSummary {
   stems?: string[]
+  profile?: SeparationProfile
+  model?: string
+  two_stems?: boolean
+  output_format?: StemFormat
+  threads?: number
+  batch_size?: number
+  timings?: {
+    separation_seconds?: number
+    encoding_seconds?: number
+    total_seconds?: number
+  }
 }
 
 export interface UploadItem {
@@ -1,6 +1,6 @@
 import { type PaginatedJobs, type ListJobsParams, listJobs as listEntityJobs } from "@/entities/job"
 import { API_BASE_URL, handleResponse } from "@/shared/api"
-import type { CreateRequest, CreateResponse } from "./types"
+import type { BatchRequest, CreateRequest, CreateResponse, UploadItem } from "./types"
 
 export async function createJob(
   payload: CreateRequest,
@@ -8,6 +8,7 @@ export async function createJob(
   const form = new FormData()
   payload.files?.forEach((file) => form.append("files", file))
   payload.file_ids?.forEach((fileId) => form.append("file_ids", fileId))
+  if (payload.engine) form.append("engine", payload.engine)
 
   const res = await fetch(`${API_BASE_URL}/noxtunizer/jobs`, {
     method: "POST",
@@ -17,6 +18,19 @@ export async function createJob(
   return handleResponse<CreateResponse>(res)
 }
 
+export async function createBatchJob(payload: BatchRequest): Promise<UploadItem> {
+  const form = new FormData()
+  payload.file_ids.forEach((fileId) => form.append("file_ids", fileId))
+  if (payload.engine) form.append("engine", payload.engine)
+
+  const res = await fetch(`${API_BASE_URL}/noxtunizer/batch`, {
+    method: "POST",
+    body: form,
+  })
+
+  return handleResponse<UploadItem>(res)
+}
+
 export async function listJobs(
   params: Omit<ListJobsParams, "tool"> = {},
 ): Promise<PaginatedJobs> {
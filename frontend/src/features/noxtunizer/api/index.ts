@@ -1,2 +1,10 @@
-export { createJob, listJobs, getSourceUrl } from "./client"
-export type { CreateRequest, CreateResponse, NoxtunizerSummary, NoxtunizerJob } from "./types"
+export { createJob, createBatchJob, listJobs, getSourceUrl } from "./client"
+export type {
+  AnalysisEngine,
+  BatchRequest,
+  BatchTrackResult,
+  CreateRequest,
+  CreateResponse,
+  NoxtunizerSummary,
+  NoxtunizerJob,
+} from "./types"
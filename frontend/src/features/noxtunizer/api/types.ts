@@ -1,8 +1,16 @@
 import { type Job, type JobResult } from "@/entities/job"
 
+export type AnalysisEngine = "essentia" | "numpy"
+
 export interface CreateRequest {
   files?: File[]
   file_ids?: string[]
+  engine?: AnalysisEngine
+}
+
+export interface BatchRequest {
+  file_ids: string[]
+  engine?: AnalysisEngine
 }
 
 export interface CreateResponse {
@@ -14,6 +22,26 @@ export interface NoxtunizerSummary {
   key?: string | null
   duration?: number | null
   duration_label?: string
+  engine?: AnalysisEngine
+  analyzer_version?: number
+  cached?: boolean
+  mode?: "batch"
+  total?: number
+  analyzed?: number
+  failed?: number
+  cached_tracks?: number
+  tracks?: BatchTrackResult[]
+}
+
+export interface BatchTrackResult {
+  file_id: string
+  name: string
+  bpm?: number | null
+  key?: string | null
+  duration?: number | null
+  duration_label?: string
+  cached?: boolean
+  error?: string
 }
 
 export interface UploadItem {